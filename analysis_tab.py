@@ -6,18 +6,82 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import os
 
+from data_sources import get_source_spec
+from figure_payload import plotly_chart
+from instrumentation import timed
 from map_tab import (
-    load_and_process_data,
-    calculate_global_stats,
+    load_dashboard_data,
+    show_data_filters,
     get_temperament,
     temperament_colors,
     type_colors,
     temperament_groups,
     temperament_descriptions
 )
+from significance import country_significance, show_significance_table
+from weighting import available_weightings, country_weights, global_averages, weighted_means, weighting_labels
+
+
+region_groups = {
+    'North America': ['United States', 'Canada', 'Mexico'],
+    'Europe': ['United Kingdom', 'Germany', 'France', 'Italy', 'Spain', 'Netherlands',
+               'Sweden', 'Norway', 'Finland', 'Denmark', 'Poland', 'Switzerland',
+               'Belgium', 'Austria', 'Portugal', 'Greece', 'Ireland'],
+    'East Asia': ['Japan', 'China', 'South Korea', 'Taiwan'],
+    'South Asia': ['India', 'Pakistan', 'Bangladesh', 'Sri Lanka', 'Nepal'],
+    'Latin America': ['Brazil', 'Argentina', 'Colombia', 'Chile', 'Peru', 'Venezuela',
+                      'Ecuador', 'Cuba', 'Dominican Republic', 'Costa Rica'],
+    'Middle East': ['Turkey', 'Saudi Arabia', 'Iran', 'Israel', 'United Arab Emirates',
+                    'Egypt', 'Iraq', 'Jordan', 'Lebanon', 'Qatar'],
+    'Africa': ['South Africa', 'Nigeria', 'Kenya', 'Morocco', 'Ghana', 'Ethiopia',
+               'Tanzania', 'Uganda', 'Zimbabwe', 'Algeria']
+}
+
+
+def calculate_regional_rollups(df, weighting='unweighted'):
+    weights = country_weights(df, weighting)
+    members = [(region, df['country'].isin(countries).to_numpy() & (weights > 0))
+               for region, countries in region_groups.items()]
+    members = [(region, mask) for region, mask in members if mask.any()]
+    if not members:
+        return []
+
+    # Every region at once: (regions x countries) membership times the weights, then one product with the shares
+    temp_cols = [f'temperament_{t.lower()}' for t in temperament_groups]
+    groups = np.array([mask for _, mask in members], dtype=np.float64)
+    means = weighted_means(df[temp_cols].to_numpy(dtype=np.float64), weights, groups)
 
+    region_data = []
+    for (region, mask), row in zip(members, means):
+        region_row = {'region': region, 'country_count': int(mask.sum())}
+        region_row.update({t: float(v) for t, v in zip(temperament_groups, row)})
+        region_data.append(region_row)
+
+    return region_data
+
+
+average_patterns = ['x', '/', '.']
+COMPARISON_ROW_HEIGHT = 30
+
+
+def selected_averages(countries, averages=None):
+    if averages is None:
+        averages = {'Global Average': st.session_state.global_stats} if 'global_stats' in st.session_state else {}
+    return [(label, stats) for label, stats in averages.items() if label in countries]
+
+
+def trait_percentages(type_shares):
+    # type_shares maps 'INTJ'-style names to percentages; returns E, N, T, J then their opposites
+    total = sum(type_shares.values())
+    if not total > 0:
+        return None
+    values = [sum(v for t, v in type_shares.items() if t[i] == letter) / total * 100
+              for i, letter in enumerate('ENTJ')]
+    return values + [100 - v for v in values]
 
-def create_country_comparison(df, countries, feature_type='temperament'):
+
+@timed('create_country_comparison', figure=True)
+def create_country_comparison(df, countries, feature_type='temperament', significance=None, averages=None):
     if df is None or df.empty or not countries:
         fig = go.Figure()
         fig.update_layout(
@@ -48,25 +112,43 @@ def create_country_comparison(df, countries, feature_type='temperament'):
 
         for country in filtered_df['country'].unique():
             country_data = filtered_df[filtered_df['country'] == country].iloc[0]
+            y = [country_data[col] for col in temp_cols.values()]
+
+            # Bootstrap intervals of the difference from the Global Average, drawn around the country's own share
+            extra = {}
+            if significance is not None and not significance.empty:
+                tests = significance[significance['country'] == country].set_index('category').reindex(list(temp_cols))
+                if tests['tested'].eq(True).all():
+                    extra = dict(
+                        error_y=dict(
+                            type='data',
+                            symmetric=False,
+                            array=(tests['ci_high'] - tests['difference']).tolist(),
+                            arrayminus=(tests['difference'] - tests['ci_low']).tolist()
+                        ),
+                        text=['*' if flag else '' for flag in tests['significant']],
+                        textposition='outside'
+                    )
 
             fig.add_trace(go.Bar(
                 x=list(temp_cols.keys()),
-                y=[country_data[col] for col in temp_cols.values()],
+                y=y,
                 name=country,
                 marker_color=[temperament_colors[t] for t in temp_cols.keys()],
-                opacity=0.7
+                opacity=0.7,
+                **extra
             ))
 
-        if 'global_stats' in st.session_state and 'Global Average' in countries:
-            global_temps = st.session_state.global_stats['temperaments']
+        for i, (label, stats) in enumerate(selected_averages(countries, averages)):
+            global_temps = stats['temperaments']
 
             fig.add_trace(go.Bar(
                 x=list(temp_cols.keys()),
                 y=[global_temps.get(t, 0) for t in temp_cols.keys()],
-                name="Global Average",
+                name=label,
                 marker_color=[temperament_colors[t] for t in temp_cols.keys()],
                 opacity=0.4,
-                marker_pattern_shape="x"
+                marker_pattern_shape=average_patterns[i % len(average_patterns)]
             ))
 
         fig.update_layout(
@@ -88,48 +170,18 @@ def create_country_comparison(df, countries, feature_type='temperament'):
     elif feature_type == 'personality_traits':
 
         categories = ['Extraversion', 'Intuition', 'Thinking', 'Judging']
+        categories_full = categories + ['Introversion', 'Sensing', 'Feeling', 'Perceiving']
         fig = go.Figure()
 
         for country in filtered_df['country'].unique():
             country_data = filtered_df[filtered_df['country'] == country].iloc[0]
 
-            e_percent = 0
-            n_percent = 0
-            t_percent = 0
-            j_percent = 0
-
-            total_percent = 0
-            for col in filtered_df.columns:
-                if col.startswith('type_'):
-                    type_name = col.replace('type_', '').upper()
-                    percent = country_data[col]
-                    total_percent += percent
-
-                    if 'E' in type_name[0]:
-                        e_percent += percent
-                    if 'N' in type_name[1]:
-                        n_percent += percent
-                    if 'T' in type_name[2]:
-                        t_percent += percent
-                    if 'J' in type_name[3]:
-                        j_percent += percent
-
-            if total_percent > 0:
-                values = [
-                    e_percent / total_percent * 100,
-                    n_percent / total_percent * 100,
-                    t_percent / total_percent * 100,
-                    j_percent / total_percent * 100
-                ]
-
-                categories_full = categories + ['Introversion', 'Sensing', 'Feeling', 'Perceiving']
-                values_full = values + [
-                    100 - values[0],
-                    100 - values[1],
-                    100 - values[2],
-                    100 - values[3]
-                ]
+            values_full = trait_percentages({
+                col.replace('type_', '').upper(): country_data[col]
+                for col in filtered_df.columns if col.startswith('type_')
+            })
 
+            if values_full is not None:
                 fig.add_trace(go.Scatterpolar(
                     r=values_full,
                     theta=categories_full,
@@ -137,6 +189,17 @@ def create_country_comparison(df, countries, feature_type='temperament'):
                     name=country
                 ))
 
+        for label, stats in selected_averages(countries, averages):
+            values_full = trait_percentages(stats['types'])
+            if values_full is not None:
+                fig.add_trace(go.Scatterpolar(
+                    r=values_full,
+                    theta=categories_full,
+                    fill='none',
+                    line_dash='dash',
+                    name=label
+                ))
+
         fig.update_layout(
             polar=dict(
                 radialaxis=dict(
@@ -154,15 +217,13 @@ def create_country_comparison(df, countries, feature_type='temperament'):
 
         data = []
 
-        if 'global_stats' in st.session_state and 'Global Average' in countries:
-            global_types = st.session_state.global_stats['types']
-
-            type_row = {'country': 'Global Average'}
-            for t, v in global_types.items():
+        for label, stats in selected_averages(countries, averages):
+            type_row = {'country': label}
+            for t, v in stats['types'].items():
                 type_row[t] = v
 
             data.append(type_row)
-            countries = [c for c in countries if c != 'Global Average']
+            countries = [c for c in countries if c != label]
 
         for country in filtered_df['country'].unique():
             country_data = filtered_df[filtered_df['country'] == country].iloc[0]
@@ -206,20 +267,22 @@ def create_country_comparison(df, countries, feature_type='temperament'):
             title="MBTI Type Distribution by Country",
             xaxis_title="MBTI Type",
             yaxis_title="Country",
-            height=400 + (len(countries) * 30),
+            height=400 + (len(countries) * COMPARISON_ROW_HEIGHT),
             margin=dict(l=20, r=20, t=50, b=20),
+            # The static site trims rows from this figure and shrinks it by the same amount per country
+            meta=dict(row_height=COMPARISON_ROW_HEIGHT)
         )
 
         fig.update_traces(
-            text=melt_df['percentage'].round(1).astype(str) + '%',
-            texttemplate='%{text}',
+            texttemplate='%{z:.1f}%',
             textfont={'size': 10}
         )
 
     return fig
 
 
-def create_correlation_analysis(df, analysis_type='temperament'):
+@timed('create_correlation_analysis', figure=True)
+def create_correlation_analysis(df, analysis_type='temperament', state=None):
     if df is None or df.empty:
         fig = go.Figure()
         fig.update_layout(
@@ -231,7 +294,7 @@ def create_correlation_analysis(df, analysis_type='temperament'):
     if analysis_type == 'temperament':
         temp_cols = ['temperament_nf', 'temperament_nt', 'temperament_sp', 'temperament_sj']
 
-        corr_df = df[temp_cols].corr()
+        corr_df = state.correlation_matrix(temp_cols) if state is not None else df[temp_cols].corr()
 
         fig = go.Figure(data=go.Heatmap(
             z=corr_df.values,
@@ -239,8 +302,7 @@ def create_correlation_analysis(df, analysis_type='temperament'):
             y=['NF', 'NT', 'SP', 'SJ'],
             colorscale='RdBu_r',
             zmid=0,
-            text=corr_df.round(2).values,
-            texttemplate='%{text}',
+            texttemplate='%{z:.2f}',
             colorbar=dict(title='Correlation')
         ))
 
@@ -256,7 +318,7 @@ def create_correlation_analysis(df, analysis_type='temperament'):
         if len(type_cols) > 16:
             type_cols = type_cols[:16]
 
-        corr_df = df[type_cols].corr()
+        corr_df = state.correlation_matrix(type_cols) if state is not None else df[type_cols].corr()
 
         display_cols = [col.replace('type_', '').upper() for col in type_cols]
 
@@ -279,7 +341,8 @@ def create_correlation_analysis(df, analysis_type='temperament'):
     return fig
 
 
-def create_regional_analysis(df):
+@timed('create_regional_analysis', figure=True)
+def create_regional_analysis(df, weighting='unweighted'):
     if df is None or df.empty:
         fig = go.Figure()
         fig.update_layout(
@@ -288,37 +351,7 @@ def create_regional_analysis(df):
         )
         return fig
 
-    regions = {
-        'North America': ['United States', 'Canada', 'Mexico'],
-        'Europe': ['United Kingdom', 'Germany', 'France', 'Italy', 'Spain', 'Netherlands',
-                   'Sweden', 'Norway', 'Finland', 'Denmark', 'Poland', 'Switzerland',
-                   'Belgium', 'Austria', 'Portugal', 'Greece', 'Ireland'],
-        'East Asia': ['Japan', 'China', 'South Korea', 'Taiwan'],
-        'South Asia': ['India', 'Pakistan', 'Bangladesh', 'Sri Lanka', 'Nepal'],
-        'Latin America': ['Brazil', 'Argentina', 'Colombia', 'Chile', 'Peru', 'Venezuela',
-                          'Ecuador', 'Cuba', 'Dominican Republic', 'Costa Rica'],
-        'Middle East': ['Turkey', 'Saudi Arabia', 'Iran', 'Israel', 'United Arab Emirates',
-                        'Egypt', 'Iraq', 'Jordan', 'Lebanon', 'Qatar'],
-        'Africa': ['South Africa', 'Nigeria', 'Kenya', 'Morocco', 'Ghana', 'Ethiopia',
-                   'Tanzania', 'Uganda', 'Zimbabwe', 'Algeria']
-    }
-
-    region_data = []
-
-    for region, countries in regions.items():
-        region_df = df[df['country'].isin(countries)]
-
-        if len(region_df) > 0:
-            region_row = {
-                'region': region,
-                'country_count': len(region_df),
-                'NF': region_df['temperament_nf'].mean(),
-                'NT': region_df['temperament_nt'].mean(),
-                'SP': region_df['temperament_sp'].mean(),
-                'SJ': region_df['temperament_sj'].mean()
-            }
-
-            region_data.append(region_row)
+    region_data = calculate_regional_rollups(df, weighting)
 
     region_df = pd.DataFrame(region_data)
 
@@ -342,7 +375,7 @@ def create_regional_analysis(df):
 
     fig.update_layout(
         barmode='group',
-        title="Temperament Distribution by Region",
+        title="Temperament Distribution by Region" + ("" if weighting == 'unweighted' else f" ({weighting_labels[weighting].lower()})"),
         xaxis_title="Region",
         yaxis_title="Percentage (%)",
         legend_title="Temperament",
@@ -366,26 +399,23 @@ def show_analysis_tab():
     st.markdown("<div class='dashboard-card'>", unsafe_allow_html=True)
     st.markdown("<div class='card-title'>MBTI Data Analysis</div>", unsafe_allow_html=True)
 
-    countries_file = 'data/countries.csv'
-    types_file = 'data/types.csv'
+    countries_file = get_source_spec('countries')
+    types_file = get_source_spec('types')
 
-    if 'df' not in st.session_state or 'types_info' not in st.session_state:
-        with st.spinner("Loading data..."):
-            df, types_info = load_and_process_data(countries_file, types_file)
+    filters = show_data_filters("analysis")
 
-            if df is None or types_info is None:
-                st.error("Failed to load data. Please ensure the CSV files are in the correct location.")
-                return
+    with st.spinner("Loading data..."):
+        df, types_info, global_stats, bundle = load_dashboard_data(countries_file, types_file, filters)
 
-            global_stats = calculate_global_stats(df)
+        if df is None or types_info is None:
+            st.error("Failed to load data. Please ensure the CSV files are in the correct location.")
+            return
 
-            st.session_state.df = df
-            st.session_state.types_info = types_info
-            st.session_state.global_stats = global_stats
-    else:
-        df = st.session_state.df
-        types_info = st.session_state.types_info
-        global_stats = st.session_state.global_stats
+        if df.empty:
+            st.warning("No countries match the selected data filters.")
+            return
+
+        st.session_state.global_stats = global_stats
 
     analysis_type = st.radio(
         "Select Analysis Type:",
@@ -398,9 +428,12 @@ def show_analysis_tab():
 
         col1, col2 = st.columns([3, 1])
 
+        version = bundle.version if bundle is not None else None
+        averages = global_averages(df, global_stats, available_weightings(df), version)
+
         with col1:
             default_countries = ["United States", "Japan", "Global Average"]
-            available_countries = ["Global Average"] + sorted(df['country'].unique())
+            available_countries = list(averages) + sorted(df['country'].unique())
 
             selected_countries = st.multiselect(
                 "Select countries to compare:",
@@ -418,8 +451,13 @@ def show_analysis_tab():
             feature_type = comparison_type.lower().replace(" ", "_")
 
         if selected_countries:
-            comparison_fig = create_country_comparison(df, selected_countries, feature_type)
-            st.plotly_chart(comparison_fig, use_container_width=True)
+            # Differences are tested against the selected average, preferring the unweighted one
+            reference = next((label for label in averages if label in selected_countries), "Global Average")
+            significance = country_significance(df, selected_countries, feature_type, averages[reference], version,
+                                                reference)
+            comparison_fig = create_country_comparison(df, selected_countries, feature_type, significance, averages)
+            plotly_chart(comparison_fig, f'country_comparison/{feature_type}', width='stretch')
+            show_significance_table(significance, reference)
 
             if feature_type == 'temperament':
                 st.markdown("""
@@ -462,8 +500,8 @@ def show_analysis_tab():
 
         corr_type = 'temperament' if correlation_type == "Temperament Groups" else 'type'
 
-        corr_fig = create_correlation_analysis(df, corr_type)
-        st.plotly_chart(corr_fig, use_container_width=True)
+        corr_fig = create_correlation_analysis(df, corr_type, bundle.state if bundle is not None else None)
+        plotly_chart(corr_fig, f'correlation_analysis/{corr_type}', width='stretch')
 
         st.markdown("""
         ### Understanding Correlations
@@ -480,8 +518,19 @@ def show_analysis_tab():
     else:
         st.markdown("### Regional Trends in MBTI Distribution")
 
-        region_fig = create_regional_analysis(df)
-        st.plotly_chart(region_fig, use_container_width=True)
+        weightings = available_weightings(df)
+        weighting = st.radio(
+            "Weight countries by:",
+            weightings,
+            format_func=lambda w: weighting_labels[w],
+            horizontal=True,
+            key="regional_weighting"
+        )
+
+        region_fig = create_regional_analysis(df, weighting)
+        plotly_chart(region_fig, f'regional_analysis/{weighting}', width='stretch')
+        if weighting == 'population':
+            st.caption("Population weights come from data/population.csv (approximate 2023 estimates).")
 
         st.markdown("""
         ### Regional Patterns
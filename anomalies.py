@@ -0,0 +1,271 @@
+import argparse
+import math
+import os
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+from cache_registry import observed_cache
+from instrumentation import timed
+from map_tab import mbti_types
+
+OUTLIER_ALPHA = float(os.environ.get('MBTI_OUTLIER_ALPHA', '0.001'))
+# Share given to a type nobody in a country picked, so its log-ratio stays finite
+ZERO_REPLACEMENT = 1e-4
+# Fraction of countries the robust centre and covariance are fitted on
+SUPPORT_FRACTION = 0.75
+MAX_ITERATIONS = 20
+# Countries within this chi-square quantile of the first fit are refitted on; the usual MCD reweighting step
+REWEIGHT_QUANTILE = 0.975
+# Share of the robust variance kept when projecting onto the leading directions
+PRINCIPAL_SHARE = 0.9
+NULL_SIMULATIONS = 200
+# Past this many countries the chi-square limit is close enough that simulating the null is not worth its cost
+NULL_MAX_ROWS = 2000
+NULL_SEED = 0
+TOP_DEVIATIONS = 3
+# Only the top of the ranking gets a written explanation; formatting 100k rows of text costs more than the fit
+DESCRIBED_ROWS = 200
+
+normal_cdf = np.vectorize(NormalDist().cdf, otypes=[np.float64])
+
+
+def clr_transform(shares, zero_replacement=ZERO_REPLACEMENT):
+    shares = np.where(shares > 0, shares, zero_replacement)
+    shares = shares / shares.sum(axis=1, keepdims=True)
+    logs = np.log(shares)
+    return logs - logs.mean(axis=1, keepdims=True)
+
+
+def mahalanobis_squared(values, center, precision):
+    deviations = values - center
+    return ((deviations @ precision) * deviations).sum(axis=1)
+
+
+def chi2_quantile(q, k):
+    # Wilson-Hilferty: (X/k)^(1/3) is close to normal, which is plenty for flagging thresholds
+    z = NormalDist().inv_cdf(q)
+    return k * (1 - 2 / (9 * k) + z * np.sqrt(2 / (9 * k))) ** 3
+
+
+def _paulson_terms(k, m):
+    # Paulson's normal approximation of F(k, m); an infinite m gives back Wilson-Hilferty for chi-square / k
+    a, b = 2 / (9 * m), 2 / (9 * k)
+    return 1 - a, 1 - b, a, b
+
+
+def f_sf(x, k, m=math.inf):
+    shrink, shift, a, b = _paulson_terms(k, m)
+    root = np.cbrt(np.asarray(x, dtype=np.float64))
+    return 1 - normal_cdf((shrink * root - shift) / np.sqrt(a * root ** 2 + b))
+
+
+def f_quantile(q, k, m=math.inf):
+    shrink, shift, a, b = _paulson_terms(k, m)
+    z = NormalDist().inv_cdf(q)
+    leading = shrink ** 2 - z ** 2 * a
+    if leading <= 0:
+        return math.inf
+    root = (shrink * shift + math.copysign(1, z) * math.sqrt(
+        max((shrink * shift) ** 2 - leading * (shift ** 2 - z ** 2 * b), 0))) / leading
+    return root ** 3
+
+
+def concentration_steps(values, support_fraction=SUPPORT_FRACTION, max_iterations=MAX_ITERATIONS):
+    n = len(values)
+    h = max(int(np.ceil(n * support_fraction)), values.shape[1] + 1)
+
+    # Refit on the h most central countries until that set stops changing
+    subset = np.arange(n)
+    for _ in range(max_iterations):
+        center = values[subset].mean(axis=0)
+        scatter = np.cov(values[subset], rowvar=False)
+        squared = mahalanobis_squared(values, center, np.linalg.pinv(scatter))
+        closest = np.sort(np.argpartition(squared, h - 1)[:h])
+        if len(closest) == len(subset) and (closest == subset).all():
+            break
+        subset = closest
+    return center, scatter, squared
+
+
+def reweighted_distances(values, support_fraction=SUPPORT_FRACTION):
+    dof = values.shape[1]
+    center, scatter, squared = concentration_steps(values, support_fraction)
+    # Fitting on the central subset shrinks the covariance; rescale so the median distance matches chi-square
+    squared = squared / (np.median(squared) / chi2_quantile(0.5, dof))
+
+    keep = squared <= chi2_quantile(REWEIGHT_QUANTILE, dof)
+    center = values[keep].mean(axis=0)
+    scatter = np.cov(values[keep], rowvar=False)
+    squared = mahalanobis_squared(values, center, np.linalg.pinv(scatter))
+    return squared / (np.median(squared) / chi2_quantile(0.5, dof))
+
+
+def robust_distances(values, support_fraction=SUPPORT_FRACTION, principal_share=PRINCIPAL_SHARE):
+    if len(values) < values.shape[1] + 2:
+        return None
+
+    center, scatter, squared = concentration_steps(values, support_fraction)
+    # Log-ratio coordinates sum to zero, so the covariance has one fewer dimension than there are types
+    rank = int(np.linalg.matrix_rank(scatter))
+    scatter = scatter * np.median(squared) / chi2_quantile(0.5, rank)
+
+    # Real differences between countries sit in a few directions; the rest of the spectrum is mostly sampling
+    # noise that is tiny for big countries and large for small ones, and whitening it flags every small country
+    eigenvalues, vectors = np.linalg.eigh(scatter)
+    eigenvalues, vectors = eigenvalues[::-1], vectors[:, ::-1]
+    explained = np.cumsum(eigenvalues) / eigenvalues.sum()
+    dof = min(int(np.searchsorted(explained, principal_share)) + 1, rank)
+    scores = (values - center) @ vectors[:, :dof]
+
+    squared = reweighted_distances(scores, support_fraction)
+    return squared, center, scatter, dof
+
+
+@observed_cache(max_entries=32)
+def null_distribution(n, dof, simulations=NULL_SIMULATIONS, seed=NULL_SEED):
+    if n > NULL_MAX_ROWS:
+        return 1.0, math.inf
+
+    # Run clean Gaussian tables of the same shape through the same estimator, then match a scaled F(dof, m)
+    # to their distances: Hardin and Rocke's form for robust distances in small samples
+    rng = np.random.default_rng(seed)
+    pooled = np.concatenate([reweighted_distances(rng.standard_normal((n, dof))) for _ in range(simulations)])
+    ratio = pooled.var() / pooled.mean() ** 2 * dof
+    m = (4 * ratio + 2 * dof - 4) / (ratio - 2) if ratio > 2 else math.inf
+    scale = pooled.mean() / dof * ((m - 2) / m if math.isfinite(m) else 1.0)
+    return float(scale), float(m)
+
+
+@timed('detect_outliers')
+def detect_outliers(df, alpha=OUTLIER_ALPHA):
+    if df is None or df.empty:
+        return None
+
+    type_cols = [f'type_{t.lower()}' for t in mbti_types]
+    shares = np.nan_to_num(df.reindex(columns=type_cols).to_numpy(dtype=np.float64))
+    valid = shares.sum(axis=1) > 0
+    values = clr_transform(shares[valid])
+
+    fitted = robust_distances(values)
+    if fitted is None:
+        return None
+    squared, center, scatter, dof = fitted
+
+    scale, m = null_distribution(len(values), dof)
+    p_values = f_sf(squared / (scale * dof), dof, m)
+    # Every country is one test, so the cut-off is Bonferroni-corrected to keep false flags rare on big tables
+    threshold = scale * dof * f_quantile(1 - alpha / len(values), dof, m)
+
+    result = pd.DataFrame({
+        'country': df['country'].to_numpy()[valid],
+        'country_code': df['country_code'].to_numpy()[valid] if 'country_code' in df.columns else None,
+        'distance': np.sqrt(squared),
+        'p_value': p_values,
+        'outlier': squared > threshold
+    })
+    order = np.argsort(-squared, kind='stable')
+    result = result.iloc[order].reset_index(drop=True)
+
+    # Per-type deviations in robust standard deviations explain what makes a country stand out
+    described = order[:DESCRIBED_ROWS]
+    z = (values[described] - center) / np.sqrt(np.diag(scatter))
+    top = np.argsort(-np.abs(z), axis=1)[:, :TOP_DEVIATIONS]
+    scores = np.take_along_axis(z, top, axis=1)
+    deviations = [
+        ", ".join(f"{mbti_types[j]} {'↑' if s > 0 else '↓'}{abs(s):.1f}σ" for j, s in zip(idx, row))
+        for idx, row in zip(top, scores)
+    ]
+    result['most_unusual'] = deviations + [''] * (len(result) - len(deviations))
+    result.insert(0, 'rank', np.arange(1, len(result) + 1))
+    result.attrs.update(threshold=float(np.sqrt(threshold)), dof=dof, alpha=alpha)
+    return result
+
+
+@observed_cache(max_entries=8)
+def _cached_outliers(version, alpha, _df):
+    return detect_outliers(_df, alpha)
+
+
+def country_outliers(df, version=None, bundle=None, alpha=OUTLIER_ALPHA):
+    # The refresher already ran the detector once for its data version
+    if bundle is not None and alpha == OUTLIER_ALPHA:
+        return bundle.outliers
+    if df is None or df.empty:
+        return None
+    from weighting import dataset_version
+    return _cached_outliers(version or dataset_version(df), alpha, df)
+
+
+def add_outlier_highlight(fig, outliers):
+    flagged = outliers[outliers['outlier'] & outliers['country_code'].notna()]
+    if flagged.empty:
+        return fig
+    fig.add_trace(
+        go.Choropleth(
+            locations=flagged['country_code'].tolist(),
+            z=[1] * len(flagged),
+            colorscale=[[0, 'rgba(0,0,0,0)'], [1, 'rgba(0,0,0,0)']],
+            showscale=False,
+            marker_line_color='#D50000',
+            marker_line_width=2.5,
+            customdata=np.round(flagged['distance'].to_numpy(), 2),
+            hovertext=flagged['country'].tolist(),
+            hovertemplate='<b>%{hovertext}</b><br>Outlier, distance %{customdata:.2f}<extra></extra>',
+            name='Outliers'
+        )
+    )
+    return fig
+
+
+def show_outlier_table(outliers, max_rows=20):
+    if outliers is None or outliers.empty:
+        st.caption("Not enough countries to estimate what a typical distribution looks like.")
+        return
+
+    flagged = int(outliers['outlier'].sum())
+    st.markdown(f"**{flagged} of {len(outliers)} countries have an unusual type distribution** "
+                f"(robust Mahalanobis distance along the main directions of log-ratio type shares, "
+                f"α = {outliers.attrs['alpha']} Bonferroni-corrected)")
+    table = outliers.head(max_rows).rename(columns={
+        'rank': 'Rank',
+        'country': 'Country',
+        'distance': 'Distance',
+        'p_value': 'p',
+        'outlier': 'Outlier',
+        'most_unusual': 'Most unusual types'
+    }).drop(columns=['country_code'])
+    table['Distance'] = table['Distance'].round(2)
+    table['p'] = table['p'].map(lambda p: f"{p:.2g}")
+    table['Outlier'] = table['Outlier'].map(lambda o: "⚠️" if o else "")
+    st.dataframe(table, hide_index=True, width='stretch')
+    st.caption(f"Countries past a distance of {outliers.attrs['threshold']:.2f} are flagged. "
+               f"Very large distances often point to ingestion problems such as a missing or scrambled type column.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank countries by how unusual their MBTI type distribution is")
+    parser.add_argument('countries', nargs='?', default='data/countries.csv')
+    parser.add_argument('--types', default='data/types.csv')
+    parser.add_argument('--alpha', type=float, default=OUTLIER_ALPHA)
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--fail-on-outliers', action='store_true', help="Exit with status 1 if any country is flagged")
+    args = parser.parse_args()
+
+    from map_tab import load_and_process_data
+
+    df, _ = load_and_process_data(args.countries, args.types)
+    outliers = detect_outliers(df, args.alpha)
+    if outliers is None:
+        raise SystemExit("Not enough countries to fit a typical distribution")
+
+    print(f"{int(outliers['outlier'].sum())} of {len(outliers)} countries flagged "
+          f"(distance > {outliers.attrs['threshold']:.2f}, {outliers.attrs['dof']} degrees of freedom)")
+    for row in outliers.head(args.top).itertuples():
+        print(f"{row.rank:>4} {'!' if row.outlier else ' '} {row.country:<32} {row.distance:>7.2f}  "
+              f"p={row.p_value:.2g}  {row.most_unusual}")
+    if args.fail_on_outliers and outliers['outlier'].any():
+        raise SystemExit(1)
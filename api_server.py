@@ -0,0 +1,317 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from analysis_tab import calculate_regional_rollups
+from cache_registry import get_cache_stats
+from data_refresh import REFRESH_INTERVAL
+from data_sources import get_source_spec
+from export_figures import slugify
+from incremental import IncrementalStore
+from map_tab import mbti_types, temperament_groups
+from weighting import available_weightings, weighted_global_stats
+
+API_HOST = os.environ.get('MBTI_API_HOST', '127.0.0.1')
+API_PORT = int(os.environ.get('MBTI_API_PORT', '8600'))
+DEFAULT_SIMILAR = 5
+MAX_SIMILAR = 25
+GZIP_MIN_BYTES = 256
+
+
+class Response:
+    __slots__ = ('status', 'body', 'gzip_body', 'etag', 'gzip_etag')
+
+    def __init__(self, payload, status=200):
+        self.status = status
+        self.body = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        self.gzip_body = gzip.compress(self.body, compresslevel=6, mtime=0) if len(self.body) >= GZIP_MIN_BYTES else None
+        digest = hashlib.sha1(self.body).hexdigest()[:20]
+        # Each encoding is its own representation, so a cache never pairs one validator with the other body
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gzip"'
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    # A list of tags, each possibly weak; If-None-Match always uses the weak comparison
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return any(tag == '*' or (tag[2:] if tag.startswith('W/') else tag) == etag for tag in tags)
+
+
+def _round(value):
+    return round(float(value), 3) if value == value else None
+
+
+def country_payload(row, version):
+    return {
+        'country': row['country'],
+        'country_code': row['country_code'],
+        'dominant_type': row['dominant_type'],
+        'dominant_temperament': row['dominant_temperament'],
+        'temperaments': {t: _round(row[f'temperament_{t.lower()}']) for t in temperament_groups},
+        'types': {t: _round(row[f'type_{t.lower()}']) for t in mbti_types if f'type_{t.lower()}' in row},
+        'variants': {'A': _round(row['variant_a']), 'T': _round(row['variant_t'])},
+        'sample_size': int(row['sample_size']) if 'sample_size' in row and pd.notna(row['sample_size']) else None,
+        'version': version
+    }
+
+
+def subnational_payload(country, version):
+    from regions import load_region_data
+
+    regions_df = load_region_data(get_source_spec('regions'))
+    if regions_df.empty:
+        return None
+    country_df = regions_df[regions_df['country'] == country]
+    if country_df.empty:
+        return None
+    return {
+        'country': country,
+        'regions': [
+            {
+                'region': row['region'],
+                'dominant_type': row['dominant_type'],
+                'dominant_temperament': row['dominant_temperament'],
+                'temperaments': {t: _round(row[f'temperament_{t.lower()}']) for t in temperament_groups},
+                'variants': {'A': _round(row['variant_a']), 'T': _round(row['variant_t'])}
+            }
+            for row in country_df.to_dict('records')
+        ],
+        'version': version
+    }
+
+
+def region_payload(df, weighting='unweighted'):
+    return [{k: _round(v) if isinstance(v, (float, np.floating)) else v for k, v in region.items()}
+            for region in calculate_regional_rollups(df, weighting)]
+
+
+class ApiResponses:
+    # Every response for one data version, serialized, compressed and tagged up front
+    def __init__(self, state):
+        start = time.perf_counter()
+        self.state = state
+        self.version = state.version
+        self.routes = {}
+        self.aliases = {}
+        self.lazy = {}
+        self.lock = threading.Lock()
+        self.stats = get_cache_stats('api.lazy_responses')
+
+        df = state.df
+        records = df.to_dict('records')
+        for row in records:
+            key = slugify(row['country'])
+            for alias in (key, row['country'].lower(), str(row['country_code']).lower()):
+                self.aliases.setdefault(alias, key)
+            self.routes[f'/api/countries/{key}'] = Response(country_payload(row, self.version))
+
+        self.routes['/api/countries'] = Response({
+            'countries': [{'country': r['country'], 'country_code': r['country_code'], 'id': slugify(r['country'])}
+                          for r in records],
+            'version': self.version
+        })
+        weightings = [w for w in available_weightings(df) if w != 'unweighted']
+        self.routes['/api/global'] = Response(dict(
+            state.global_stats,
+            weighted={w: weighted_global_stats(df, w, self.version) for w in weightings},
+            countries=len(df),
+            version=self.version
+        ))
+        self.routes['/api/regions'] = Response({
+            'regions': region_payload(df),
+            'weighted': {w: region_payload(df, w) for w in weightings},
+            'version': self.version
+        })
+        self.routes['/api/version'] = Response({'version': self.version})
+
+        self.countries = {slugify(r['country']): r['country'] for r in records}
+        for key in self.countries:
+            self.similar_response(key, DEFAULT_SIMILAR)
+        self.build_seconds = time.perf_counter() - start
+
+    def resolve(self, name):
+        name = unquote(name).strip().lower()
+        return self.aliases.get(name) or self.aliases.get(slugify(name))
+
+    def similar_response(self, key, k):
+        cache_key = (key, k)
+        response = self.lazy.get(cache_key)
+        if response is None:
+            self.stats.miss()
+            country = self.countries[key]
+            response = Response({
+                'country': country,
+                'k': k,
+                'similar': [{'country': c, 'similarity': round(s, 4)} for c, s in self.state.similar_countries(country, k)],
+                'version': self.version
+            })
+            with self.lock:
+                self.lazy[cache_key] = response
+                self.stats.resize(len(self.lazy))
+        else:
+            self.stats.hit()
+        return response
+
+    def subnational_response(self, key):
+        cache_key = (key, 'regions')
+        response = self.lazy.get(cache_key)
+        if response is None:
+            self.stats.miss()
+            payload = subnational_payload(self.countries[key], self.version)
+            response = Response(payload) if payload else not_found(f"No regional data for {self.countries[key]}")
+            with self.lock:
+                self.lazy[cache_key] = response
+                self.stats.resize(len(self.lazy))
+        else:
+            self.stats.hit()
+        return response
+
+    def lookup(self, path, query):
+        path = path.rstrip('/') or '/'
+        response = self.routes.get(path)
+        if response is not None:
+            return response
+
+        parts = path.split('/')
+        if len(parts) == 4 and parts[1] == 'api' and parts[2] in ('countries', 'similar', 'regions'):
+            key = self.resolve(parts[3])
+            if key is None:
+                return not_found(f"Unknown country: {unquote(parts[3])}")
+            if parts[2] == 'countries':
+                return self.routes[f'/api/countries/{key}']
+            if parts[2] == 'regions':
+                return self.subnational_response(key)
+            try:
+                k = int(query.get('k', [DEFAULT_SIMILAR])[0])
+            except ValueError:
+                return bad_request("k must be an integer")
+            return self.similar_response(key, max(1, min(k, MAX_SIMILAR)))
+        return not_found(f"Unknown endpoint: {path}")
+
+
+def not_found(message):
+    return Response({'error': message}, status=404)
+
+
+def bad_request(message):
+    return Response({'error': message}, status=400)
+
+
+class ApiService:
+    def __init__(self, countries_spec, interval=REFRESH_INTERVAL):
+        self.store = IncrementalStore(countries_spec)
+        self.interval = interval
+        self.current = None
+        self.stop_event = threading.Event()
+        self.refresh()
+
+    def refresh(self):
+        state = self.store.refresh()
+        if self.current is not None and self.current.version == state.version:
+            return False
+        responses = ApiResponses(state)
+        # Handlers read self.current once per request, so a swap never mixes versions
+        self.current = responses
+        print(f"Serving data version {responses.version} ({len(responses.routes)} responses "
+              f"prebuilt in {responses.build_seconds:.2f}s)")
+        return True
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"API data refresh failed, keeping version {self.current.version}: {str(e)}")
+
+    def start(self):
+        if self.interval > 0:
+            threading.Thread(target=self._run, name='mbti-api-refresh', daemon=True).start()
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out as separate writes; without this each keep-alive request waits on a delayed ACK
+    disable_nagle_algorithm = True
+    service = None
+    quiet = True
+
+    def do_GET(self):
+        self._respond(send_body=True)
+
+    def do_HEAD(self):
+        self._respond(send_body=False)
+
+    def _respond(self, send_body):
+        url = urlsplit(self.path)
+        response = self.service.current.lookup(url.path, parse_qs(url.query))
+
+        gzipped = response.gzip_body is not None and 'gzip' in self.headers.get('Accept-Encoding', '')
+        body = response.gzip_body if gzipped else response.body
+        etag = response.gzip_etag if gzipped else response.etag
+
+        if response.status == 200 and etag_matches(self.headers.get('If-None-Match'), etag):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            if response.gzip_body is not None:
+                self.send_header('Vary', 'Accept-Encoding')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(response.status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if response.status == 200:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+        if response.gzip_body is not None:
+            self.send_header('Vary', 'Accept-Encoding')
+        if gzipped:
+            self.send_header('Content-Encoding', 'gzip')
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+def run_api_server(host=API_HOST, port=API_PORT, interval=REFRESH_INTERVAL, quiet=True):
+    service = ApiService(get_source_spec('countries'), interval)
+    service.start()
+    handler = type('Handler', (ApiHandler,), {'service': service, 'quiet': quiet})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    print(f"MBTI data API on http://{host}:{port}/api/ "
+          f"(countries, countries/<name>, similar/<name>?k=, regions, regions/<name>, global, version)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop_event.set()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the processed MBTI dataset as a JSON API")
+    parser.add_argument('--host', default=API_HOST)
+    parser.add_argument('--port', type=int, default=API_PORT)
+    parser.add_argument('--refresh-interval', type=float, default=REFRESH_INTERVAL,
+                        help="Seconds between data file checks, 0 to disable")
+    parser.add_argument('--verbose', action='store_true', help="Log every request")
+    args = parser.parse_args()
+
+    run_api_server(args.host, args.port, args.refresh_interval, quiet=not args.verbose)
@@ -5,12 +5,13 @@ from show_nlp_data import show_nlp_data
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from setup_data import setup_data_directory, verify_csv_structure
-
-setup_data_directory()
+from cache_registry import observed_cache, show_cache_panel
+from instrumentation import begin_rerun, show_profiling_panel
+from setup_data import run_startup_checks
 
 from map_tab import show_map_tab
 from analysis_tab import show_analysis_tab
+from playground_tab import show_playground_tab
 
 st.set_page_config(
     page_title="MBTI Personality Distribution",
@@ -19,6 +20,24 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
+begin_rerun()
+
+
+# Data directory setup and structural validation run once per server process, not on every rerun
+@observed_cache(st.cache_resource, show_spinner=False)
+def get_startup_manifest():
+    return run_startup_checks()
+
+
+startup_manifest = get_startup_manifest()
+
+if startup_manifest['degraded']:
+    st.error(
+        "⚠️ **Degraded mode:** the dashboard data failed validation at startup, so the map and analysis tabs are "
+        "disabled. Fix the issues below and restart the app.\n\n"
+        + "\n".join(f"- {message}" for message in startup_manifest['errors'])
+    )
+
 st.markdown("""
 <style>
     @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
@@ -333,72 +352,27 @@ with tab1:
     
 
 with tab2:
-    show_map_tab()
+    if startup_manifest['degraded']:
+        st.warning("The world map is unavailable in degraded mode.")
+    else:
+        show_map_tab()
     
 with tab3:
-    show_analysis_tab()
+    if startup_manifest['degraded']:
+        st.warning("The data analysis is unavailable in degraded mode.")
+    else:
+        show_analysis_tab()
     
 with tab4:
-    show_nlp_data()
+    show_nlp_data(startup_manifest['missing_nlp_assets'])
 
 with tab5:
-    st.markdown("## Word Cloud Playground")
-    st.write("""
-    Create your own word cloud! Enter your text below and see it transformed into a beautiful visualization.
-    """)
-    
-    user_text = st.text_area(
-        "Enter your text here:",
-        height=200,
-        placeholder="Type or paste your text here...",
-        help="The more text you enter, the more interesting your word cloud will be!"
-    )
-    
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        max_words = st.slider("Maximum number of words", 50, 500, 200)
-        background_color = st.color_picker("Background color", "#FFFFFF")
-    
-    with col2:
-        colormap = st.selectbox(
-            "Color scheme",
-            ["viridis", "plasma", "inferno", "magma", "cividis"]
-        )
-        width = st.slider("Width", 400, 1200, 800)
-    
-    if user_text:
-        try:
-            from wordcloud import WordCloud
-            import matplotlib.pyplot as plt
-            
-            wordcloud = WordCloud(
-                width=width,
-                height=width//2,
-                background_color=background_color,
-                max_words=max_words,
-                colormap=colormap
-            ).generate(user_text)
-            
-            fig, ax = plt.subplots()
-            ax.imshow(wordcloud, interpolation='bilinear')
-            ax.axis('off')
-            st.pyplot(fig)
-            
-            st.download_button(
-                label="Download Word Cloud",
-                data=fig,
-                file_name="wordcloud.png",
-                mime="image/png"
-            )
-            
-        except Exception as e:
-            st.error(f"An error occurred: {str(e)}")
-            st.write("Please make sure you have entered valid text.")
-    else:
-        st.info("👆 Enter some text above to generate your word cloud!")
+    show_playground_tab()
 
 st.markdown("<div class='footer'>", unsafe_allow_html=True)
 st.markdown("© 2025 Team_C_TBD | Columbia University | QMSS Program", unsafe_allow_html=True)
 st.markdown("A class project for QMSS GR 5063: Data Visualization", unsafe_allow_html=True)
 st.markdown("</div>", unsafe_allow_html=True)
+
+show_profiling_panel()
+show_cache_panel()
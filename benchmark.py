@@ -0,0 +1,329 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from incremental import CACHE_DIR
+from synthetic_data import SYNTHETIC_DIR, load_synthetic_codes, write_countries, write_respondents
+
+BENCH_DIR = os.path.join(CACHE_DIR, 'benchmarks')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+BASELINE_PATH = 'benchmark_baseline.json'
+TYPES_PATH = 'data/types.csv'
+MIN_SECONDS = 0.5
+MAX_REPEAT = 20
+REGRESSION_THRESHOLD = 0.25
+SNAPSHOT_PERIODS = 12
+COMPARISON_COUNTRIES = 10
+
+scales = {'158': 158, '5k': 5000, '100k': 100_000}
+respondent_scales = {'1m': 1_000_000}
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True)
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True, text=True)
+        return commit.stdout.strip(), bool(dirty.stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def measure(func, min_seconds=MIN_SECONDS, max_repeat=MAX_REPEAT, setup=None):
+    if setup is None:
+        # One untimed call first, so lazy imports and plotly template loading stay out of the numbers
+        func()
+    times = []
+    while len(times) < max_repeat and (not times or sum(times) < min_seconds):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {
+        'runs': len(times),
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.fmean(times)
+    }
+
+
+def synthetic_regions(df, size=1.0):
+    # One square per row, laid out on a grid, so create_region_map gets a geometry for every location
+    columns = int(np.ceil(np.sqrt(len(df))))
+    features = []
+    for i, region in enumerate(df['country']):
+        x, y = (i % columns) * size, (i // columns) * size
+        features.append({
+            'type': 'Feature',
+            'id': region,
+            'geometry': {'type': 'Polygon', 'coordinates': [[[x, y], [x + size, y], [x + size, y + size], [x, y + size], [x, y]]]}
+        })
+    return df.assign(region=df['country']), {'type': 'FeatureCollection', 'features': features}
+
+
+def synthetic_snapshots(df, periods=SNAPSHOT_PERIODS, seed=0):
+    from map_tab import variant_columns
+    from timeseries import SnapshotCube
+
+    rng = np.random.default_rng(seed)
+    shares = df[[f'type_{c.split("-")[0].lower()}' for c in variant_columns]].to_numpy(dtype=np.float32) / 2
+    values = np.stack([shares * rng.uniform(0.9, 1.1, shares.shape).astype(np.float32) for _ in range(periods)])
+    return SnapshotCube([f'2024-{m:02d}' for m in range(1, periods + 1)], df['country'], df['country_code'], values)
+
+
+def pipeline_cases(countries_path):
+    from map_tab import calculate_global_stats, load_and_process_data, load_processed_dataset
+
+    holder = {}
+
+    def cold_load():
+        holder['df'] = load_and_process_data(countries_path, TYPES_PATH)[0]
+
+    def frame():
+        # -k can skip the cold load, so the frame is loaded on first use instead
+        if 'df' not in holder:
+            holder['df'] = load_and_process_data(countries_path, TYPES_PATH)[0]
+        return holder['df']
+
+    def clear_global_stats():
+        frame()
+        calculate_global_stats.clear()
+
+    cases = [
+        ('load_and_process_data/cold', cold_load, load_processed_dataset.clear),
+        ('load_and_process_data/warm', lambda: load_and_process_data(countries_path, TYPES_PATH), None),
+        ('calculate_global_stats/cold', lambda: calculate_global_stats(frame()), clear_global_stats),
+        ('calculate_global_stats/warm', lambda: calculate_global_stats(frame()), None),
+    ]
+    return cases, holder
+
+
+def figure_cases(df):
+    from analysis_tab import create_correlation_analysis, create_country_comparison, create_regional_analysis
+    from map_tab import add_country_highlight, create_region_map, create_temperament_chart, create_world_map
+
+    countries = df['country'].iloc[:COMPARISON_COUNTRIES].tolist()
+    row = df.iloc[0]
+    regions_df, geojson = synthetic_regions(df)
+    snapshots = synthetic_snapshots(df)
+
+    return [
+        ('create_world_map/dominant_temperament', lambda: create_world_map(df, 'dominant_temperament')),
+        ('create_world_map/dominant_type', lambda: create_world_map(df, 'dominant_type')),
+        ('add_country_highlight', lambda: add_country_highlight(create_world_map(df), df, row['country'])),
+        ('create_animated_world_map/dominant_temperament',
+         lambda: create_world_map(df, 'dominant_temperament', snapshots=snapshots)),
+        ('create_animated_world_map/temperament_nf_delta',
+         lambda: create_world_map(df, 'temperament_nf', snapshots=snapshots, show_delta=True)),
+        ('create_region_map', lambda: create_region_map(regions_df, geojson)),
+        ('create_temperament_chart/pie', lambda: create_temperament_chart(row, 'pie')),
+        ('create_temperament_chart/bar', lambda: create_temperament_chart(row, 'bar')),
+        ('create_country_comparison/temperament', lambda: create_country_comparison(df, countries, 'temperament')),
+        ('create_country_comparison/type_distribution',
+         lambda: create_country_comparison(df, countries, 'type_distribution')),
+        ('create_country_comparison/personality_traits',
+         lambda: create_country_comparison(df, countries, 'personality_traits')),
+        ('create_correlation_analysis/temperament', lambda: create_correlation_analysis(df, 'temperament')),
+        ('create_correlation_analysis/type', lambda: create_correlation_analysis(df, 'type')),
+        ('create_regional_analysis', lambda: create_regional_analysis(df)),
+    ]
+
+
+def respondent_cases(respondents_path):
+    from ingest import aggregate_respondents
+    from validate_data import validate_source
+
+    return [
+        ('aggregate_respondents', lambda: aggregate_respondents(respondents_path, variant_col='variant', workers=1)),
+        ('validate_respondents', lambda: validate_source(respondents_path, 'respondents', use_cache=False,
+                                                         variant_col='variant')),
+    ]
+
+
+def ensure_data(data_dir, scale_names, respondent_names):
+    paths = {}
+    for name in scale_names:
+        path = os.path.join(data_dir, f'countries_{scales[name]}.csv')
+        if not os.path.exists(path):
+            print(f"Generating {scales[name]} synthetic regions")
+            write_countries(data_dir, scales[name])
+        paths[name] = path
+    for name in respondent_names:
+        path = os.path.join(data_dir, f'respondents_{respondent_scales[name]}.csv')
+        if not os.path.exists(path):
+            print(f"Generating {respondent_scales[name]} synthetic respondents")
+            write_respondents(data_dir, respondent_scales[name])
+        paths[name] = path
+    return paths
+
+
+def run_benchmarks(scale_names, respondent_names, data_dir=SYNTHETIC_DIR, pattern=None, min_seconds=MIN_SECONDS):
+    from map_tab import get_country_code_cache
+
+    paths = ensure_data(data_dir, scale_names, respondent_names)
+    results = {}
+
+    def run(key, func, setup=None):
+        if pattern and pattern not in key:
+            return
+        stats = measure(func, min_seconds, setup=setup)
+        results[key] = stats
+        print(f"  {key:<60} {stats['median'] * 1000:>10.2f} ms  (min {stats['min'] * 1000:.2f}, {stats['runs']} runs)")
+
+    for name in scale_names:
+        print(f"Scale {name} ({scales[name]} regions)")
+        # Synthetic region names resolve through the same persisted code cache warm_cache.py fills
+        get_country_code_cache().update(load_synthetic_codes(paths[name]))
+        cases, holder = pipeline_cases(paths[name])
+        for case, func, setup in cases:
+            run(f'{name}/{case}', func, setup)
+        df = holder.get('df')
+        if df is None:
+            from map_tab import load_and_process_data
+            df = load_and_process_data(paths[name], TYPES_PATH)[0]
+        for case, func in figure_cases(df):
+            run(f'{name}/{case}', func)
+
+    for name in respondent_names:
+        print(f"Respondents {name} ({respondent_scales[name]} rows)")
+        for case, func in respondent_cases(paths[name]):
+            run(f'{name}/{case}', func)
+
+    commit, dirty = git_commit()
+    return {
+        'commit': commit,
+        'dirty': dirty,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs",
+        'results': results
+    }
+
+
+def save_run(run, results_dir=RESULTS_DIR):
+    os.makedirs(results_dir, exist_ok=True)
+    name = f"{run['created_at'].replace(':', '')}_{run['commit'] or 'nogit'}{'_dirty' if run['dirty'] else ''}.json"
+    path = os.path.join(results_dir, name)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(run, f, indent=1)
+    return path
+
+
+def load_run(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def same_environment(run, other):
+    # Timings from another machine or interpreter say nothing about this change
+    return run.get('machine') == other.get('machine') and run.get('python') == other.get('python')
+
+
+def latest_matching_run(run, results_dir=RESULTS_DIR):
+    if not os.path.isdir(results_dir):
+        return None
+    for name in sorted(os.listdir(results_dir), reverse=True):
+        if not name.endswith('.json'):
+            continue
+        other = load_run(os.path.join(results_dir, name))
+        if other.get('created_at') != run.get('created_at') and same_environment(run, other):
+            return other
+    return None
+
+
+def select_baseline(run, baseline_path=BASELINE_PATH, results_dir=RESULTS_DIR):
+    if os.path.exists(baseline_path):
+        baseline = load_run(baseline_path)
+        if same_environment(run, baseline):
+            return baseline
+        print(f"Baseline {baseline_path} was recorded on {baseline.get('machine')} with Python {baseline.get('python')}, "
+              f"this run is {run['machine']} with Python {run['python']}; not comparing against it")
+    previous = latest_matching_run(run, results_dir)
+    if previous is None:
+        print("No earlier run from this machine to compare with; run with --save-baseline to record one")
+    return previous
+
+
+def compare_runs(run, baseline, threshold=REGRESSION_THRESHOLD):
+    regressions = []
+    print(f"Compared with baseline {baseline.get('commit')} ({baseline.get('created_at')}, {baseline.get('machine')})")
+    for key, stats in run['results'].items():
+        base = baseline['results'].get(key)
+        if base is None:
+            print(f"  {key:<60} {'new':>10}")
+            continue
+        # Minimums are the least noisy on shared machines
+        ratio = stats['min'] / base['min'] if base['min'] else float('inf')
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = '  REGRESSION'
+            regressions.append(key)
+        elif ratio < 1 / (1 + threshold):
+            flag = '  faster'
+        print(f"  {key:<60} {ratio:>9.2f}x{flag}")
+    return regressions
+
+
+def show_history(results_dir=RESULTS_DIR, pattern=None):
+    if not os.path.isdir(results_dir):
+        print(f"No saved runs in {results_dir}")
+        return
+    runs = [load_run(os.path.join(results_dir, f)) for f in sorted(os.listdir(results_dir)) if f.endswith('.json')]
+    keys = sorted({k for r in runs for k in r['results'] if not pattern or pattern in k})
+    labels = [f"{r['commit'] or '?'}{'*' if r['dirty'] else ''}" for r in runs]
+    print(f"{'min ms':<60} " + " ".join(f"{label:>10}" for label in labels))
+    for key in keys:
+        cells = [f"{r['results'][key]['min'] * 1000:>10.2f}" if key in r['results'] else f"{'-':>10}" for r in runs]
+        print(f"{key:<60} " + " ".join(cells))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the data pipeline and figure builders on synthetic data")
+    parser.add_argument('--scale', nargs='*', choices=scales, default=['158', '5k'])
+    parser.add_argument('--respondents', nargs='*', choices=respondent_scales, default=[])
+    parser.add_argument('--all', action='store_true', help="Every region and respondent scale, including 100k and 1M")
+    parser.add_argument('-k', dest='pattern', default=None, help="Only run benchmarks whose name contains this")
+    parser.add_argument('--min-time', type=float, default=MIN_SECONDS, help="Repeat each benchmark for at least this long")
+    parser.add_argument('--data-dir', default=SYNTHETIC_DIR)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help="Store this run as the baseline")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    parser.add_argument('--fail-on-regression', action='store_true')
+    parser.add_argument('--history', action='store_true', help="Show medians of every saved run and exit")
+    args = parser.parse_args()
+
+    if args.history:
+        show_history(pattern=args.pattern)
+        sys.exit(0)
+
+    scale_names = list(scales) if args.all else args.scale
+    respondent_names = list(respondent_scales) if args.all else args.respondents
+    run = run_benchmarks(scale_names, respondent_names, args.data_dir, args.pattern, args.min_time)
+    print(f"Saved to {save_run(run)}")
+
+    regressions = []
+    baseline = None if args.save_baseline else select_baseline(run, args.baseline)
+    if baseline is not None:
+        regressions = compare_runs(run, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmarks slower than baseline by more than {args.threshold:.0%}")
+
+    if args.save_baseline:
+        baseline = load_run(args.baseline) if os.path.exists(args.baseline) else {'results': {}}
+        if not same_environment(run, baseline):
+            # Mixing machines in one baseline would make every comparison against it meaningless
+            baseline = {'results': {}}
+        baseline.update({k: v for k, v in run.items() if k != 'results'})
+        baseline['results'].update(run['results'])
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=1, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+
+    sys.exit(1 if regressions and args.fail_on_regression else 0)
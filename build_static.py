@@ -0,0 +1,124 @@
+import argparse
+import json
+import os
+import shutil
+import time
+
+from plotly.offline import get_plotlyjs
+from plotly.utils import PlotlyJSONEncoder
+
+from analysis_tab import create_country_comparison
+from data_sources import get_source_spec
+from export_figures import build_figure, global_charts, slugify
+from figure_payload import minimize_figure
+from incremental import IncrementalStore
+from map_tab import load_types_info, temperament_colors, temperament_descriptions, type_colors, variant_colors
+from show_nlp_data import nlp_assets, nlp_image
+
+STATIC_DIR = 'site'
+# index.html, style.css and app.js are kept as ordinary files next to this script and copied into every build
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static_site')
+# Written into every build so a rebuild only ever clears a directory this script created
+SITE_MARKER = '.mbti-static'
+
+# Values of the Country Comparison selector in static_site/index.html
+comparison_types = ['temperament', 'type_distribution', 'personality_traits']
+
+record_columns = ['country', 'country_code', 'dominant_type', 'dominant_temperament',
+                  'temperament_nf', 'temperament_nt', 'temperament_sp', 'temperament_sj', 'variant_a', 'variant_t']
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def country_records(df):
+    records = []
+    for row in df.itertuples(index=False):
+        row = row._asdict()
+        record = {col: row[col] for col in record_columns}
+        for col in record_columns[4:]:
+            record[col] = round(float(record[col]), 3)
+        record['slug'] = slugify(row['country'])
+        records.append(record)
+    return records
+
+
+def clear_output_dir(output_dir):
+    if not os.path.exists(output_dir):
+        return
+    if not os.path.isdir(output_dir):
+        raise FileExistsError(f"{output_dir} exists and is not a directory")
+    if os.path.exists(os.path.join(output_dir, SITE_MARKER)):
+        shutil.rmtree(output_dir)
+    elif os.listdir(output_dir):
+        raise FileExistsError(f"{output_dir} is not empty and was not built by build_static.py; "
+                              f"choose another --output or remove it yourself")
+
+
+def build_static_site(output_dir=STATIC_DIR):
+    start = time.perf_counter()
+    state = IncrementalStore(get_source_spec('countries')).refresh()
+    df = state.df
+    types_info = load_types_info(get_source_spec('types'))
+
+    clear_output_dir(output_dir)
+    _write(os.path.join(output_dir, SITE_MARKER), state.version)
+
+    for chart in global_charts:
+        _write(os.path.join(output_dir, 'figures', f'{chart}.json'), minimize_figure(build_figure(df, chart)).to_json())
+    # One figure per comparison type holds every country; app.js keeps the traces of the selected ones
+    countries = ['Global Average'] + df['country'].tolist()
+    for feature_type in comparison_types:
+        fig = create_country_comparison(df, countries, feature_type, averages={'Global Average': state.global_stats})
+        # Plain JSON arrays rather than typed arrays, so the page can slice heatmap rows without decoding them
+        _write(os.path.join(output_dir, 'figures', f'comparison_{feature_type}.json'),
+               json.dumps(minimize_figure(fig).to_plotly_json(), cls=PlotlyJSONEncoder, separators=(',', ':')))
+    for country in df['country']:
+        fig = build_figure(df, 'temperament_pie', country)
+        _write(os.path.join(output_dir, 'figures', 'countries', f'{slugify(country)}.json'), minimize_figure(fig).to_json())
+
+    nlp = []
+    for path in nlp_assets:
+        if not os.path.exists(path):
+            continue
+        # The downscaled variant from warm_cache.py is used when present
+        name = os.path.basename(path)
+        target = os.path.join(output_dir, 'nlp', name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.copy(nlp_image(path) if path.endswith('.png') else path, target)
+        nlp.append({'title': os.path.splitext(name)[0], 'path': f'nlp/{name}'})
+
+    site_data = {
+        'countries': country_records(df),
+        'temperament_colors': temperament_colors,
+        'temperament_descriptions': temperament_descriptions,
+        'type_colors': type_colors,
+        'variant_colors': variant_colors,
+        'nlp': nlp
+    }
+    _write(os.path.join(output_dir, 'data', 'countries.json'), json.dumps(site_data, separators=(',', ':')))
+    _write(os.path.join(output_dir, 'data', 'types.json'), json.dumps(types_info, separators=(',', ':'), default=str))
+
+    with open(os.path.join(ASSETS_DIR, 'index.html'), encoding='utf-8') as f:
+        index = f.read().replace('__BUILT_AT__', time.strftime('%Y-%m-%d %H:%M')).replace('__VERSION__', state.version)
+    _write(os.path.join(output_dir, 'index.html'), index)
+    for name in ('style.css', 'app.js'):
+        shutil.copy(os.path.join(ASSETS_DIR, name), os.path.join(output_dir, name))
+    _write(os.path.join(output_dir, 'plotly.min.js'), get_plotlyjs())
+
+    total = sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(output_dir) for f in files)
+    print(f"Static dashboard for {len(df)} countries written to {output_dir} "
+          f"({total / 1024 / 1024:.1f} MB) in {time.perf_counter() - start:.1f}s")
+    print(f"Serve it with any static file server, e.g. python -m http.server --directory {output_dir}")
+    return output_dir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the map, analysis and NLP views into a static HTML/JS bundle")
+    parser.add_argument('--output', default=STATIC_DIR)
+    args = parser.parse_args()
+
+    build_static_site(args.output)
@@ -0,0 +1,202 @@
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+
+import streamlit as st
+
+CACHE_STATS_PATH = os.environ.get('MBTI_CACHE_STATS')
+
+registry = {}
+registry_lock = threading.Lock()
+computing = threading.local()
+
+
+class CacheStats:
+    __slots__ = ('name', 'kind', 'max_entries', 'hits', 'misses', 'evictions', 'entries', 'bytes',
+                 'hit_seconds', 'miss_seconds', 'lock')
+
+    def __init__(self, name, kind, max_entries=None):
+        self.name = name
+        self.kind = kind
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.entries = None
+        self.bytes = None
+        self.hit_seconds = 0.0
+        self.miss_seconds = 0.0
+        self.lock = threading.Lock()
+
+    def hit(self, seconds=0.0):
+        with self.lock:
+            self.hits += 1
+            self.hit_seconds += seconds
+
+    def miss(self, seconds=0.0):
+        with self.lock:
+            self.misses += 1
+            self.miss_seconds += seconds
+
+    def evict(self, count=1):
+        with self.lock:
+            self.evictions += count
+
+    def resize(self, entries, nbytes=None):
+        with self.lock:
+            self.entries = entries
+            self.bytes = nbytes
+
+    def to_dict(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'name': self.name,
+                'kind': self.kind,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'entries': self.entries,
+                'max_entries': self.max_entries,
+                'bytes': self.bytes,
+                # For st.cache_* a hit is argument hashing plus lookup (and unpickling for cache_data)
+                'mean_hit_ms': round(self.hit_seconds * 1000 / self.hits, 4) if self.hits else None,
+                'mean_miss_ms': round(self.miss_seconds * 1000 / self.misses, 4) if self.misses else None
+            }
+
+
+def get_cache_stats(name, kind='custom', max_entries=None):
+    stats = registry.get(name)
+    if stats is None:
+        with registry_lock:
+            stats = registry.setdefault(name, CacheStats(name, kind, max_entries))
+    return stats
+
+
+def observed_cache(cache=st.cache_data, **cache_kwargs):
+    def decorator(func):
+        name = f"{func.__module__}.{func.__qualname__}"
+        kind = 'st_cache_resource' if cache is st.cache_resource else 'st_cache_data'
+        stats = get_cache_stats(name, kind, cache_kwargs.get('max_entries'))
+
+        # Only runs on a miss, so the wrapper below can tell hits from misses
+        @functools.wraps(func)
+        def compute(*args, **kwargs):
+            computing.names.add(name)
+            return func(*args, **kwargs)
+
+        cached = cache(**cache_kwargs)(compute)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not hasattr(computing, 'names'):
+                computing.names = set()
+            computing.names.discard(name)
+            start = time.perf_counter()
+            result = cached(*args, **kwargs)
+            seconds = time.perf_counter() - start
+            if name in computing.names:
+                computing.names.discard(name)
+                stats.miss(seconds)
+            else:
+                stats.hit(seconds)
+            return result
+
+        wrapper.clear = cached.clear
+        return wrapper
+    return decorator
+
+
+def _streamlit_entries():
+    # Entry counts and sizes come from Streamlit's own cache stats when a server runtime exists
+    try:
+        from streamlit.runtime import Runtime
+        if not Runtime.exists():
+            return {}
+        cache_stats = Runtime.instance().stats_mgr.get_stats()
+    except Exception:
+        return {}
+
+    entries = {}
+    for family in cache_stats.values():
+        for stat in family:
+            name = getattr(stat, 'cache_name', None)
+            if name is None:
+                continue
+            count, nbytes = entries.get(name, (0, 0))
+            if getattr(stat, 'category_name', '') == 'st_cache_resource':
+                # Resource caches report a single item-count proxy rather than one stat per entry
+                entries[name] = (stat.byte_length, None)
+            else:
+                entries[name] = (count + 1, nbytes + stat.byte_length)
+    return entries
+
+
+def cache_snapshot():
+    entries = _streamlit_entries()
+    with registry_lock:
+        caches = list(registry.values())
+
+    rows = []
+    for stats in caches:
+        if stats.name in entries:
+            stats.resize(*entries[stats.name])
+        row = stats.to_dict()
+        if stats.kind != 'custom' and row['entries'] is not None:
+            # Every miss stores one entry, so misses beyond the live entries were evicted (max_entries/ttl)
+            row['evictions'] = max(row['misses'] - row['entries'], 0)
+        rows.append(row)
+    return sorted(rows, key=lambda r: r['name'])
+
+
+def dump_cache_stats(path=None):
+    path = path or CACHE_STATS_PATH
+    if path is None:
+        from incremental import CACHE_DIR
+        path = os.path.join(CACHE_DIR, 'cache_stats.json')
+
+    rows = cache_snapshot()
+    if not any(r['hits'] or r['misses'] for r in rows):
+        return None
+    try:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump({'pid': os.getpid(), 'dumped_at': time.time(), 'caches': rows}, f, indent=1)
+        os.replace(f"{path}.tmp", path)
+    except OSError as e:
+        print(f"Could not write cache stats to {path}: {str(e)}")
+        return None
+    return path
+
+
+def _dump_at_exit():
+    # Only the app server (or an explicit MBTI_CACHE_STATS) dumps; CLI tools exit quietly
+    from streamlit.runtime import Runtime
+    if CACHE_STATS_PATH or Runtime.exists():
+        dump_cache_stats()
+
+
+atexit.register(_dump_at_exit)
+
+
+def show_cache_panel():
+    from instrumentation import PROFILE_ENABLED
+    if not PROFILE_ENABLED:
+        return
+
+    import pandas as pd
+
+    rows = cache_snapshot()
+    with st.sidebar.expander("🗄️ Caches", expanded=False):
+        if not rows:
+            st.caption("No cache lookups yet")
+            return
+        table = pd.DataFrame(rows).drop(columns=['kind'])
+        table['name'] = table['name'].str.replace(r'^[a-z_]+\.', '', regex=True)
+        st.dataframe(table, hide_index=True, width='stretch')
+        st.download_button("Cache stats (JSON)", json.dumps(rows, indent=1), file_name="mbti_cache_stats.json",
+                           mime="application/json", key="cache_stats_json")
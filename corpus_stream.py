@@ -0,0 +1,174 @@
+import io
+import json
+import multiprocessing
+import os
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import pandas as pd
+
+from mbti_predictor import tokenize
+
+CHUNK_BYTES = 4 * 1024 * 1024
+CHUNK_ROWS = 1000
+MAX_GROUPS = 64
+MAX_VOCAB_PER_GROUP = 100_000
+NO_GROUP = 'All text'
+WORD_BREAKS = ' \t\r\f\v'
+
+CORPUS_FORMATS = {
+    '.txt': 'txt',
+    '.csv': 'csv',
+    '.jsonl': 'jsonl',
+    '.json': 'jsonl'
+}
+
+
+def corpus_format(filename):
+    return CORPUS_FORMATS.get(os.path.splitext(filename)[1].lower())
+
+
+def preview_columns(fileobj, fmt):
+    fileobj.seek(0)
+    try:
+        if fmt == 'csv':
+            return pd.read_csv(fileobj, nrows=20).columns.tolist()
+        if fmt == 'jsonl':
+            first_line = fileobj.readline()
+            return list(json.loads(first_line).keys())
+        return []
+    finally:
+        fileobj.seek(0)
+
+
+def _text_reader(fileobj):
+    fileobj.seek(0)
+    return io.TextIOWrapper(fileobj, encoding='utf-8', errors='replace', newline='')
+
+
+def iter_chunks(fileobj, fmt, text_col=None, group_col=None):
+    reader = _text_reader(fileobj)
+    try:
+        if fmt == 'txt':
+            tail = ''
+            while True:
+                block = reader.read(CHUNK_BYTES)
+                if not block:
+                    break
+                block = tail + block
+                cut = block.rfind('\n')
+                if cut == -1:
+                    # Minified or single-line text: split between words instead, so the tail never holds the file
+                    cut = max(block.rfind(c) for c in WORD_BREAKS)
+                if cut == -1:
+                    if len(block) < CHUNK_BYTES:
+                        tail = block
+                        continue
+                    tail = ''
+                    yield {NO_GROUP: [block]}
+                    continue
+                tail = block[cut + 1:]
+                yield {NO_GROUP: [block[:cut]]}
+            if tail:
+                yield {NO_GROUP: [tail]}
+
+        elif fmt == 'csv':
+            usecols = [text_col] if not group_col else [text_col, group_col]
+            for chunk in pd.read_csv(reader, usecols=usecols, chunksize=CHUNK_ROWS, dtype=str):
+                yield _group_texts(chunk[text_col], chunk[group_col] if group_col else None)
+
+        elif fmt == 'jsonl':
+            texts, groups = [], []
+            for line in reader:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                texts.append(record.get(text_col))
+                groups.append(record.get(group_col) if group_col else None)
+                if len(texts) >= CHUNK_ROWS:
+                    yield _group_texts(texts, groups if group_col else None)
+                    texts, groups = [], []
+            if texts:
+                yield _group_texts(texts, groups if group_col else None)
+    finally:
+        reader.detach()
+
+
+def _group_texts(texts, groups=None):
+    grouped = {}
+    if groups is None:
+        groups = [NO_GROUP] * len(texts)
+    for text, group in zip(texts, groups):
+        if text is None or pd.isna(text):
+            continue
+        group = NO_GROUP if group is None or pd.isna(group) else str(group).strip()
+        grouped.setdefault(group, []).append(str(text))
+    return grouped
+
+
+def count_chunk(grouped_texts):
+    from wordcloud import STOPWORDS
+
+    counts = {}
+    for group, texts in grouped_texts.items():
+        counter = Counter()
+        for text in texts:
+            counter.update(word for word in tokenize(text) if word not in STOPWORDS)
+        counts[group] = counter
+    return counts
+
+
+def _prune(counter, limit):
+    if len(counter) > limit:
+        return Counter(dict(counter.most_common(limit)))
+    return counter
+
+
+def merge_counts(totals, partial, max_groups=MAX_GROUPS, max_vocab=MAX_VOCAB_PER_GROUP):
+    for group, counter in partial.items():
+        if group not in totals:
+            if len(totals) >= max_groups:
+                continue
+            totals[group] = Counter()
+        totals[group].update(counter)
+        # Pruning slack keeps the rare-word tail from growing without bound on huge corpora
+        if len(totals[group]) > 2 * max_vocab:
+            totals[group] = _prune(totals[group], max_vocab)
+    return totals
+
+
+def count_corpus(fileobj, fmt, text_col=None, group_col=None, executor=None, max_in_flight=8,
+                 progress=None):
+    totals = {}
+    total_size = getattr(fileobj, 'size', None)
+
+    if executor is None:
+        for grouped in iter_chunks(fileobj, fmt, text_col, group_col):
+            merge_counts(totals, count_chunk(grouped))
+    else:
+        pending = set()
+        for grouped in iter_chunks(fileobj, fmt, text_col, group_col):
+            pending.add(executor.submit(count_chunk, grouped))
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    merge_counts(totals, future.result())
+                if progress and total_size:
+                    progress(min(fileobj.tell() / total_size, 1.0))
+        for future in pending:
+            merge_counts(totals, future.result())
+
+    if progress:
+        progress(1.0)
+
+    return {group: _prune(counter, MAX_VOCAB_PER_GROUP) for group, counter in totals.items()}
+
+
+def create_corpus_pool(workers=None):
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+    # The Streamlit server is multithreaded, and forking it can copy a lock some other thread holds
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
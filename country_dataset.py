@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+
+# pandas 3 always tracks shared blocks; older versions only with the copy_on_write option, else frames get a copy
+COPY_ON_WRITE = int(pd.__version__.split('.')[0]) >= 3 or pd.get_option('mode.copy_on_write') is True
+
+
+def _smallest_code_dtype(n_categories):
+    # Signed so pandas' -1 missing code still fits
+    return np.min_scalar_type(-max(n_categories, 1))
+
+
+def _pack_strings(values):
+    # One UTF-8 buffer plus end offsets instead of one Python str per value
+    encoded = [str(v).encode('utf-8') for v in values]
+    offsets = np.cumsum([len(e) for e in encoded], dtype=np.int64).astype(np.int32)
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def _unpack_strings(buffer, offsets):
+    data = buffer.tobytes()
+    starts = np.concatenate([[0], offsets[:-1]])
+    return np.array([data[a:b].decode('utf-8') for a, b in zip(starts, offsets)], dtype=object)
+
+
+class CountryDataset:
+    __slots__ = ('columns', 'value_columns', 'values', 'label_categories', 'label_codes', 'integer_columns',
+                 '_base')
+
+    def __init__(self, columns, value_columns, values, label_categories, label_codes, integer_columns=None):
+        self.columns = columns
+        self.value_columns = value_columns
+        self.values = values
+        self.label_categories = label_categories
+        self.label_codes = label_codes
+        # Counts such as sample_size stay integers: column -> (values, missing mask)
+        self.integer_columns = integer_columns or {}
+        self._base = None
+        self._freeze()
+
+    def _freeze(self):
+        self.values.setflags(write=False)
+        for data, missing in self.integer_columns.values():
+            data.setflags(write=False)
+            missing.setflags(write=False)
+
+    @classmethod
+    def from_frame(cls, df):
+        label_columns = [c for c in df.columns if not pd.api.types.is_numeric_dtype(df[c])]
+        integer_names = [c for c in df.columns if c not in label_columns and pd.api.types.is_integer_dtype(df[c])]
+        value_columns = [c for c in df.columns if c not in label_columns and c not in integer_names]
+        values = np.ascontiguousarray(df[value_columns].to_numpy(dtype=np.float32))
+
+        integer_columns = {}
+        for col in integer_names:
+            column = df[col].astype('Int64')
+            missing = column.isna().to_numpy()
+            integer_columns[col] = (column.to_numpy(dtype=np.int64, na_value=0), missing)
+
+        label_categories, label_codes = {}, {}
+        for col in label_columns:
+            codes, uniques = pd.factorize(df[col])
+            label_categories[col] = _pack_strings(uniques)
+            label_codes[col] = codes.astype(_smallest_code_dtype(len(uniques)))
+
+        return cls(list(df.columns), value_columns, values, label_categories, label_codes, integer_columns)
+
+    def __len__(self):
+        return self.values.shape[0]
+
+    def __getstate__(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__ if slot != '_base'}
+
+    def __setstate__(self, state):
+        state.setdefault('integer_columns', {})
+        for slot, value in state.items():
+            setattr(self, slot, value)
+        self._base = None
+        self._freeze()
+
+    @property
+    def nbytes(self):
+        return (self.values.nbytes
+                + sum(buffer.nbytes + offsets.nbytes for buffer, offsets in self.label_categories.values())
+                + sum(c.nbytes for c in self.label_codes.values())
+                + sum(data.nbytes + missing.nbytes for data, missing in self.integer_columns.values()))
+
+    def categories(self, col):
+        return _unpack_strings(*self.label_categories[col])
+
+    def labels(self, col):
+        # The trailing None is what a -1 (missing) code indexes
+        decoded = np.append(self.categories(col), None)
+        return decoded[self.label_codes[col]]
+
+    def column(self, col):
+        if col in self.label_codes:
+            return self.labels(col)
+        if col in self.integer_columns:
+            return pd.arrays.IntegerArray(*self.integer_columns[col]).astype('Int64')
+        return self.values[:, self.value_columns.index(col)]
+
+    def to_frame(self):
+        # The float32 block is shared with this dataset through a frame kept on it. Copy-on-write sees that
+        # reference, so a caller writing into its frame gets its own copy instead of hitting the read-only block.
+        if not COPY_ON_WRITE:
+            frame = pd.DataFrame(self.values, columns=self.value_columns, copy=True)
+        else:
+            if self._base is None:
+                self._base = pd.DataFrame(self.values, columns=self.value_columns, copy=False)
+            frame = self._base.copy(deep=False)
+        for position, col in enumerate(self.columns):
+            if col in self.label_codes or col in self.integer_columns:
+                frame.insert(position, col, self.column(col))
+        return frame
@@ -0,0 +1,163 @@
+import hashlib
+import inspect
+import os
+import threading
+import time
+
+import plotly
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from anomalies import detect_outliers
+from cache_registry import get_cache_stats
+from data_sources import open_source
+from incremental import CACHE_DIR, IncrementalStore
+from map_tab import (add_country_highlight, create_world_map, get_counts_path, process_types_df, temperament_colors,
+                     type_colors, types_columns)
+from timeseries import SNAPSHOTS_PATH, get_index_path, read_snapshots
+
+REFRESH_INTERVAL = float(os.environ.get('MBTI_REFRESH_INTERVAL', '10'))
+
+FIGURE_DIR = os.path.join(CACHE_DIR, 'figures')
+
+map_modes = ['dominant_temperament', 'dominant_type']
+
+
+def _file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def builder_fingerprint(builders=(create_world_map, add_country_highlight)):
+    # A changed figure builder, palette or plotly release must not keep serving figures built by the old one.
+    # builders can be functions or whole modules.
+    digest = hashlib.sha1(plotly.__version__.encode('utf-8'))
+    for builder in builders:
+        digest.update(inspect.getsource(builder).encode('utf-8'))
+    digest.update(repr(sorted(temperament_colors.items())).encode('utf-8'))
+    digest.update(repr(sorted(type_colors.items())).encode('utf-8'))
+    return digest.hexdigest()[:12]
+
+
+FIGURE_FINGERPRINT = builder_fingerprint()
+
+
+def get_figure_path(version, color_by, figure_dir=FIGURE_DIR):
+    return os.path.join(figure_dir, f'world_map_{color_by}_{version}_{FIGURE_FINGERPRINT}.json')
+
+
+def load_world_map(df, version, color_by, figure_dir=FIGURE_DIR):
+    # Figures serialized by warm_cache.py for this data version skip the plotly express build
+    path = get_figure_path(version, color_by, figure_dir)
+    stats = get_cache_stats('figures.world_map')
+    if os.path.exists(path):
+        try:
+            fig = pio.read_json(path)
+            stats.hit()
+            return fig
+        except Exception:
+            pass
+    stats.miss()
+    return create_world_map(df, color_by=color_by)
+
+
+class DataBundle:
+    def __init__(self, state, types_info, snapshots=None, stamps=None):
+        self.state = state
+        self.dataset = state.dataset
+        self.version = state.version
+        self.types_info = types_info
+        self.global_stats = state.global_stats
+        self.snapshots = snapshots
+        self.stamps = stamps
+        df = self.df
+        self.world_maps = {color_by: load_world_map(df, self.version, color_by) for color_by in map_modes}
+        self.outliers = detect_outliers(df)
+        self.created_at = time.time()
+
+    @property
+    def df(self):
+        return self.dataset.to_frame()
+
+    def world_map(self, color_by):
+        # Callers add highlight traces, so hand out a copy of the prebuilt figure
+        return go.Figure(self.world_maps[color_by])
+
+
+class DataRefresher:
+    def __init__(self, countries_spec, types_spec, snapshots_path=SNAPSHOTS_PATH, interval=REFRESH_INTERVAL):
+        self.countries_spec = countries_spec
+        self.types_spec = types_spec
+        self.snapshots_path = snapshots_path
+        self.interval = interval
+        self.store = IncrementalStore(countries_spec)
+        self.current = None
+        self.last_error = None
+        self.build_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def _stamps(self):
+        countries_path = open_source(self.countries_spec).path
+        return (
+            _file_stamp(countries_path),
+            _file_stamp(open_source(self.types_spec).path),
+            _file_stamp(get_counts_path(countries_path)),
+            _file_stamp(self.snapshots_path),
+            _file_stamp(get_index_path(self.snapshots_path))
+        )
+
+    def _build(self, stamps):
+        state = self.store.refresh()
+        types_info = process_types_df(open_source(self.types_spec).read(columns=types_columns))
+        snapshots = read_snapshots(self.snapshots_path)
+        return DataBundle(state, types_info, snapshots, stamps)
+
+    def refresh(self):
+        stamps = self._stamps()
+        if self.current is not None and self.current.stamps == stamps:
+            return False
+
+        with self.build_lock:
+            if self.current is not None and self.current.stamps == stamps:
+                return False
+
+            start = time.perf_counter()
+            bundle = self._build(stamps)
+            # Single reference assignment: readers see either the old bundle or the new one, never a mix
+            self.current = bundle
+            self.last_error = None
+            print(f"Data refreshed to version {bundle.version} in {time.perf_counter() - start:.2f}s")
+            if bundle.outliers is not None and bundle.outliers['outlier'].any():
+                flagged = bundle.outliers[bundle.outliers['outlier']]
+                print(f"{len(flagged)} countries with unusual type distributions, most unusual: "
+                      f"{', '.join(flagged['country'].head(5))}")
+            return True
+
+    def get(self):
+        if self.current is None or self.thread is None:
+            self.refresh()
+        return self.current
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                self.last_error = e
+                print(f"Background data refresh failed, keeping version "
+                      f"{self.current.version if self.current else None}: {str(e)}")
+
+    def start(self):
+        if self.interval <= 0 or (self.thread is not None and self.thread.is_alive()):
+            return
+        self.thread = threading.Thread(target=self._run, name='mbti-data-refresh', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
@@ -0,0 +1,227 @@
+import argparse
+import json
+import os
+import sqlite3
+from abc import ABC, abstractmethod
+
+import pandas as pd
+
+SOURCES_CONFIG = os.environ.get('MBTI_DATA_SOURCES', 'data/sources.json')
+
+DEFAULT_SOURCES = {
+    'countries': {'path': 'data/countries.csv'},
+    'types': {'path': 'data/types.csv'},
+    'regions': {'path': 'data/regions.csv'}
+}
+
+FORMAT_EXTENSIONS = {
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.pq': 'parquet',
+    '.feather': 'feather',
+    '.arrow': 'feather',
+    '.db': 'sqlite',
+    '.sqlite': 'sqlite',
+    '.sqlite3': 'sqlite'
+}
+
+CSV_CHUNK_ROWS = 100_000
+
+
+class DataSource(ABC):
+    def __init__(self, path, table=None):
+        self.path = path
+        self.table = table
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    @abstractmethod
+    def column_names(self):
+        pass
+
+    @abstractmethod
+    def read(self, columns=None, filters=None):
+        pass
+
+    @abstractmethod
+    def write(self, df):
+        pass
+
+    def _project(self, columns):
+        if columns is None:
+            return None
+        wanted = set(columns)
+        return [c for c in self.column_names() if c in wanted]
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.path!r})"
+
+
+class CSVSource(DataSource):
+    def column_names(self):
+        return pd.read_csv(self.path, nrows=0).columns.tolist()
+
+    def read(self, columns=None, filters=None):
+        usecols = None
+        if columns is not None:
+            wanted = set(columns)
+            usecols = lambda c: c in wanted
+
+        if not filters:
+            return pd.read_csv(self.path, usecols=usecols)
+
+        # CSV has no row index, so the predicate is applied chunk by chunk to keep memory bounded
+        chunks = []
+        for chunk in pd.read_csv(self.path, usecols=usecols, chunksize=CSV_CHUNK_ROWS):
+            chunks.append(_apply_filters(chunk, filters))
+        if not chunks:
+            # A header-only file yields no chunks at all
+            return pd.read_csv(self.path, usecols=usecols, nrows=0)
+        return pd.concat(chunks, ignore_index=True)
+
+    def write(self, df):
+        df.to_csv(self.path, index=False)
+
+
+class ParquetSource(DataSource):
+    def column_names(self):
+        import pyarrow.parquet as pq
+        return pq.read_schema(self.path).names
+
+    def read(self, columns=None, filters=None):
+        pa_filters = [(col, 'in', list(values)) for col, values in (filters or {}).items()] or None
+        return pd.read_parquet(self.path, columns=self._project(columns), filters=pa_filters)
+
+    def write(self, df):
+        df.to_parquet(self.path, index=False)
+
+
+class FeatherSource(DataSource):
+    def _dataset(self):
+        import pyarrow.dataset as ds
+        return ds.dataset(self.path, format='feather')
+
+    def column_names(self):
+        return self._dataset().schema.names
+
+    def read(self, columns=None, filters=None):
+        import pyarrow.dataset as ds
+
+        expression = None
+        for col, values in (filters or {}).items():
+            condition = ds.field(col).isin(list(values))
+            expression = condition if expression is None else expression & condition
+
+        table = self._dataset().to_table(columns=self._project(columns), filter=expression)
+        return table.to_pandas()
+
+    def write(self, df):
+        df.reset_index(drop=True).to_feather(self.path)
+
+
+class SQLiteSource(DataSource):
+    def __init__(self, path, table=None):
+        super().__init__(path, table or os.path.splitext(os.path.basename(path))[0])
+
+    def _connect(self):
+        return sqlite3.connect(f"file:{os.path.abspath(self.path)}?mode=ro", uri=True)
+
+    def column_names(self):
+        conn = self._connect()
+        try:
+            return [row[1] for row in conn.execute(f'PRAGMA table_info("{self.table}")')]
+        finally:
+            conn.close()
+
+    def read(self, columns=None, filters=None):
+        projected = self._project(columns)
+        select = ', '.join(f'"{c}"' for c in projected) if projected is not None else '*'
+
+        where, params = [], []
+        for col, values in (filters or {}).items():
+            values = list(values)
+            where.append(f'"{col}" IN ({", ".join("?" * len(values))})')
+            params.extend(values)
+
+        sql = f'SELECT {select} FROM "{self.table}"'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+
+        conn = self._connect()
+        try:
+            return pd.read_sql_query(sql, conn, params=params)
+        finally:
+            conn.close()
+
+    def write(self, df):
+        conn = sqlite3.connect(self.path)
+        try:
+            df.to_sql(self.table, conn, if_exists='replace', index=False)
+            for col in ('Country', 'Type'):
+                if col in df.columns:
+                    conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{self.table}_{col.lower()}" ON "{self.table}" ("{col}")')
+            conn.commit()
+        finally:
+            conn.close()
+
+
+SOURCE_TYPES = {
+    'csv': CSVSource,
+    'parquet': ParquetSource,
+    'feather': FeatherSource,
+    'sqlite': SQLiteSource
+}
+
+
+def _apply_filters(df, filters):
+    mask = pd.Series(True, index=df.index)
+    for col, values in filters.items():
+        if col in df.columns:
+            mask &= df[col].isin(list(values))
+    return df[mask]
+
+
+def open_source(spec):
+    if isinstance(spec, str):
+        spec = {'path': spec}
+
+    path = spec['path']
+    fmt = spec.get('format') or FORMAT_EXTENSIONS.get(os.path.splitext(path)[1].lower(), 'csv')
+    if fmt not in SOURCE_TYPES:
+        raise ValueError(f"Unsupported data format '{fmt}' for {path}. Supported: {', '.join(SOURCE_TYPES)}")
+
+    return SOURCE_TYPES[fmt](path, table=spec.get('table'))
+
+
+def load_source_config(config_path=SOURCES_CONFIG):
+    sources = {name: dict(spec) for name, spec in DEFAULT_SOURCES.items()}
+    if config_path and os.path.exists(config_path):
+        with open(config_path, 'r', encoding='utf-8') as f:
+            for name, spec in json.load(f).items():
+                sources[name] = {'path': spec} if isinstance(spec, str) else dict(spec)
+    return sources
+
+
+def get_source_spec(name, config_path=SOURCES_CONFIG):
+    return load_source_config(config_path)[name]
+
+
+def convert(src, dst, src_format=None, dst_format=None, table=None):
+    source = open_source({'path': src, 'format': src_format})
+    target = open_source({'path': dst, 'format': dst_format, 'table': table})
+    df = source.read()
+    target.write(df)
+    print(f"Converted {len(df)} rows from {source} to {target}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert MBTI data files between supported storage formats")
+    parser.add_argument('src')
+    parser.add_argument('dst')
+    parser.add_argument('--src-format', choices=SOURCE_TYPES, default=None)
+    parser.add_argument('--dst-format', choices=SOURCE_TYPES, default=None)
+    parser.add_argument('--table', default=None, help="Table name for SQLite targets")
+    args = parser.parse_args()
+
+    convert(args.src, args.dst, args.src_format, args.dst_format, args.table)
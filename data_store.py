@@ -0,0 +1,254 @@
+import argparse
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+from map_tab import variant_columns
+
+STORE_PATH = os.environ.get('MBTI_STORE_PATH', 'data/mbti.db')
+CHUNK_ROWS = 200_000
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS respondents (
+        country TEXT NOT NULL,
+        type TEXT NOT NULL,
+        variant TEXT NOT NULL,
+        response_date DATE
+    )""",
+    """CREATE TABLE IF NOT EXISTS daily_counts (
+        country TEXT NOT NULL,
+        type TEXT NOT NULL,
+        variant TEXT NOT NULL,
+        response_date DATE,
+        n INTEGER NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS country_distribution (
+        country TEXT NOT NULL,
+        type TEXT NOT NULL,
+        variant TEXT NOT NULL,
+        fraction DOUBLE NOT NULL,
+        n INTEGER
+    )""",
+]
+
+INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_respondents_country ON respondents (country)",
+    "CREATE INDEX IF NOT EXISTS idx_respondents_type ON respondents (type, variant)",
+    "CREATE INDEX IF NOT EXISTS idx_respondents_date ON respondents (response_date)",
+    "CREATE INDEX IF NOT EXISTS idx_daily_counts_country ON daily_counts (country)",
+    "CREATE INDEX IF NOT EXISTS idx_daily_counts_type ON daily_counts (type, variant)",
+    "CREATE INDEX IF NOT EXISTS idx_daily_counts_date ON daily_counts (response_date)",
+    "CREATE INDEX IF NOT EXISTS idx_distribution_country ON country_distribution (country)",
+    "CREATE INDEX IF NOT EXISTS idx_distribution_type ON country_distribution (type, variant)",
+]
+
+
+def store_available(path=STORE_PATH):
+    return bool(path) and os.path.exists(path)
+
+
+def connect(path=STORE_PATH, read_only=False):
+    if path.endswith('.duckdb'):
+        import duckdb
+        return duckdb.connect(path, read_only=read_only)
+
+    if read_only:
+        return sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True, check_same_thread=False)
+    return sqlite3.connect(path)
+
+
+def create_schema(conn):
+    for statement in SCHEMA:
+        conn.execute(statement)
+
+
+def create_indexes(conn):
+    for statement in INDEXES:
+        conn.execute(statement)
+
+
+def _split_variant(keys):
+    return keys.str[:4], keys.str[5:]
+
+
+def import_respondents(conn, path, country_col='country', type_col='type', variant_col=None, date_col=None,
+                       chunk_rows=CHUNK_ROWS):
+    from ingest import normalize_variant_keys
+
+    usecols = [country_col, type_col] + [c for c in [variant_col, date_col] if c]
+    total = 0
+
+    conn.execute("DELETE FROM respondents")
+    for chunk in pd.read_csv(path, usecols=usecols, dtype=str, chunksize=chunk_rows):
+        chunk = chunk.dropna(subset=[country_col, type_col])
+        keys = normalize_variant_keys(chunk, type_col, variant_col)
+        valid = keys.isin(variant_columns)
+        chunk, keys = chunk[valid], keys[valid]
+
+        types, variants = _split_variant(keys)
+        if date_col:
+            dates = pd.to_datetime(chunk[date_col], errors='coerce').dt.strftime('%Y-%m-%d')
+            dates = dates.astype(object).where(dates.notna(), None)
+        else:
+            dates = [None] * len(chunk)
+
+        rows = zip(chunk[country_col].str.strip(), types, variants, dates)
+        conn.executemany("INSERT INTO respondents VALUES (?, ?, ?, ?)", rows)
+        total += len(chunk)
+
+    conn.execute("DELETE FROM daily_counts")
+    conn.execute("""
+        INSERT INTO daily_counts
+        SELECT country, type, variant, response_date, COUNT(*)
+        FROM respondents
+        GROUP BY country, type, variant, response_date
+    """)
+    return total
+
+
+def import_distribution(conn, countries_path, counts_path=None):
+    countries_df = pd.read_csv(countries_path)
+    cols = [c for c in variant_columns if c in countries_df.columns]
+    long_df = countries_df.melt(id_vars=['Country'], value_vars=cols, var_name='key', value_name='fraction')
+    long_df = long_df.dropna(subset=['fraction'])
+
+    n = pd.Series(dtype='float64')
+    if counts_path and os.path.exists(counts_path):
+        n = pd.read_csv(counts_path, usecols=['Country', 'n']).set_index('Country')['n']
+
+    types, variants = _split_variant(long_df['key'])
+    sizes = long_df['Country'].map(n).astype(object)
+    sizes = sizes.where(sizes.notna(), None)
+
+    conn.execute("DELETE FROM country_distribution")
+    conn.executemany(
+        "INSERT INTO country_distribution VALUES (?, ?, ?, ?, ?)",
+        zip(long_df['Country'], types, variants, long_df['fraction'].astype(float),
+            [None if v is None else int(v) for v in sizes])
+    )
+    return len(countries_df)
+
+
+def build_store(path=STORE_PATH, respondents_path=None, countries_path=None, counts_path=None, **respondent_cols):
+    conn = connect(path)
+    try:
+        create_schema(conn)
+        if respondents_path:
+            n = import_respondents(conn, respondents_path, **respondent_cols)
+            print(f"Imported {n} respondents from {respondents_path}")
+        if countries_path:
+            n = import_distribution(conn, countries_path, counts_path)
+            print(f"Imported {n} country distributions from {countries_path}")
+        create_indexes(conn)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _has_rows(conn, table):
+    return conn.execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() is not None
+
+
+def available_years(path=STORE_PATH):
+    conn = connect(path, read_only=True)
+    try:
+        rows = conn.execute("""
+            SELECT DISTINCT CAST(substr(CAST(response_date AS TEXT), 1, 4) AS INTEGER)
+            FROM daily_counts
+            WHERE response_date IS NOT NULL
+        """).fetchall()
+    finally:
+        conn.close()
+    return sorted(r[0] for r in rows if r[0])
+
+
+def query_country_distribution(path=STORE_PATH, year=None, start_date=None, end_date=None, min_n=None,
+                               countries=None):
+    if year:
+        start_date, end_date = f"{int(year)}-01-01", f"{int(year)}-12-31"
+
+    conn = connect(path, read_only=True)
+    try:
+        if _has_rows(conn, 'daily_counts'):
+            where, params = [], []
+            if start_date:
+                where.append("response_date >= ?")
+                params.append(str(start_date))
+            if end_date:
+                where.append("response_date <= ?")
+                params.append(str(end_date))
+            if countries:
+                where.append(f"country IN ({', '.join('?' * len(countries))})")
+                params.extend(countries)
+
+            sql = f"""
+                WITH filtered AS (
+                    SELECT country, type, variant, SUM(n) AS n
+                    FROM daily_counts
+                    {'WHERE ' + ' AND '.join(where) if where else ''}
+                    GROUP BY country, type, variant
+                ),
+                totals AS (
+                    SELECT country, SUM(n) AS total
+                    FROM filtered
+                    GROUP BY country
+                    HAVING SUM(n) >= ?
+                )
+                SELECT f.country, f.type, f.variant, CAST(f.n AS DOUBLE) / t.total, t.total
+                FROM filtered f JOIN totals t ON f.country = t.country
+            """
+            params.append(int(min_n or 1))
+        else:
+            where, params = [], []
+            if min_n:
+                where.append("n >= ?")
+                params.append(int(min_n))
+            if countries:
+                where.append(f"country IN ({', '.join('?' * len(countries))})")
+                params.extend(countries)
+
+            sql = f"""
+                SELECT country, type, variant, fraction, n
+                FROM country_distribution
+                {'WHERE ' + ' AND '.join(where) if where else ''}
+            """
+
+        rows = conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+    long_df = pd.DataFrame(rows, columns=['Country', 'type', 'variant', 'fraction', 'n'])
+    if long_df.empty:
+        return pd.DataFrame(columns=['Country'] + variant_columns), pd.Series(dtype='Int64', name='n')
+
+    long_df['key'] = long_df['type'] + '-' + long_df['variant']
+    countries_df = long_df.pivot_table(index='Country', columns='key', values='fraction', aggfunc='sum', fill_value=0)
+    countries_df = countries_df.reindex(columns=[c for c in variant_columns if c in countries_df.columns])
+    sample_sizes = long_df.groupby('Country')['n'].first().astype('Int64')
+
+    return countries_df.reset_index(), sample_sizes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the embedded MBTI analytical store")
+    parser.add_argument('--store', default=STORE_PATH, help="SQLite file, or a .duckdb file if duckdb is installed")
+    parser.add_argument('--respondents', help="Respondent-level CSV with one test result per row")
+    parser.add_argument('--country-col', default='country')
+    parser.add_argument('--type-col', default='type')
+    parser.add_argument('--variant-col', default=None)
+    parser.add_argument('--date-col', default=None)
+    parser.add_argument('--countries', help="Aggregated countries.csv to import")
+    parser.add_argument('--counts', help="Optional country_counts.csv with sample sizes")
+    args = parser.parse_args()
+
+    if not args.respondents and not args.countries:
+        parser.error("Provide --respondents and/or --countries")
+
+    start = time.perf_counter()
+    build_store(
+        args.store, args.respondents, args.countries, args.counts,
+        country_col=args.country_col, type_col=args.type_col, variant_col=args.variant_col, date_col=args.date_col
+    )
+    print(f"Store written to {args.store} in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,211 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import plotly
+from plotly.offline import get_plotlyjs
+
+from data_refresh import builder_fingerprint, map_modes
+from data_sources import get_source_spec
+from incremental import IncrementalStore
+
+EXPORT_DIR = 'exports'
+EXPORT_VERSION = 2
+EXPORT_FORMATS = ['png', 'svg', 'html']
+EXPORT_WORKERS = min(8, os.cpu_count() or 1)
+JOBS_PER_TASK = 16
+
+global_charts = [f'world_map_{mode}' for mode in map_modes] + [
+    'correlation_temperament', 'correlation_types', 'regional_analysis'
+]
+country_charts = ['temperament_pie', 'temperament_bar', 'comparison_temperament', 'comparison_traits']
+
+worker_df = None
+worker_plotly_js = None
+
+
+def slugify(name):
+    return re.sub(r'[^a-z0-9]+', '_', name.lower()).strip('_')
+
+
+def build_figure(df, chart, country=None):
+    from analysis_tab import create_correlation_analysis, create_country_comparison, create_regional_analysis
+    from map_tab import create_temperament_chart, create_world_map
+
+    if chart.startswith('world_map_'):
+        return create_world_map(df, color_by=chart[len('world_map_'):])
+    if chart == 'correlation_temperament':
+        return create_correlation_analysis(df, 'temperament')
+    if chart == 'correlation_types':
+        return create_correlation_analysis(df, 'type')
+    if chart == 'regional_analysis':
+        return create_regional_analysis(df)
+
+    row = df[df['country'] == country].iloc[0]
+    if chart == 'temperament_pie':
+        return create_temperament_chart(row, 'pie')
+    if chart == 'temperament_bar':
+        return create_temperament_chart(row, 'bar')
+    if chart == 'comparison_temperament':
+        return create_country_comparison(df, [country], 'temperament')
+    if chart == 'comparison_traits':
+        return create_country_comparison(df, [country], 'personality_traits')
+    raise ValueError(f"Unknown chart: {chart}")
+
+
+def get_plotly_js_path(output_dir):
+    # Versioned, so HTML re-exported after a plotly upgrade never loads the old bundle
+    return os.path.join(output_dir, f'plotly-{plotly.__version__}.min.js')
+
+
+def write_plotly_js(output_dir):
+    path = get_plotly_js_path(output_dir)
+    if not os.path.exists(path):
+        os.makedirs(output_dir, exist_ok=True)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            f.write(get_plotlyjs())
+        os.replace(f"{path}.tmp", path)
+    return path
+
+
+def write_figure(fig, path, fmt, plotly_js=None):
+    tmp_path = f"{path}.tmp.{fmt}"
+    if fmt == 'html':
+        # One shared plotly.js next to the exports keeps every page working offline without embedding 4 MB each
+        include = os.path.relpath(plotly_js, os.path.dirname(path)).replace(os.sep, '/') if plotly_js else True
+        fig.write_html(tmp_path, include_plotlyjs=include, full_html=True)
+    else:
+        fig.write_image(tmp_path, format=fmt, scale=2 if fmt == 'png' else 1)
+    os.replace(tmp_path, path)
+
+
+def _init_worker(dataset, plotly_js=None):
+    global worker_df, worker_plotly_js
+    # Each worker rebuilds its frame once from the compact dataset instead of receiving it per task
+    worker_df = dataset.to_frame()
+    worker_plotly_js = plotly_js
+
+
+def _export_batch(jobs):
+    results = []
+    for chart, country, fmt, path in jobs:
+        start = time.perf_counter()
+        fig = build_figure(worker_df, chart, country)
+        write_figure(fig, path, fmt, worker_plotly_js)
+        results.append((path, os.path.getsize(path), time.perf_counter() - start))
+    return results
+
+
+def _fingerprint(*parts):
+    digest = hashlib.sha1(str(EXPORT_VERSION).encode('utf-8'))
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def export_builders_fingerprint():
+    # Every chart goes through build_figure into these modules, so any edit to them re-exports
+    import analysis_tab
+    import map_tab
+    import weighting
+    return builder_fingerprint([build_figure, map_tab, analysis_tab, weighting])
+
+
+def plan_exports(df, version, output_dir, formats, countries=None):
+    # Global charts depend on every country; per-country charts only on their own row
+    builders = export_builders_fingerprint()
+    row_hashes = pd.util.hash_pandas_object(df.set_index('country'), index=True)
+    jobs = []
+    for chart in global_charts:
+        for fmt in formats:
+            jobs.append((chart, None, fmt, os.path.join(output_dir, '_global', f'{chart}.{fmt}'),
+                         _fingerprint(chart, fmt, version, builders)))
+
+    for country in countries or df['country'].tolist():
+        row_hash = row_hashes[country]
+        for chart in country_charts:
+            for fmt in formats:
+                jobs.append((chart, country, fmt, os.path.join(output_dir, slugify(country), f'{chart}.{fmt}'),
+                             _fingerprint(chart, fmt, country, row_hash, builders)))
+    return jobs
+
+
+def load_export_manifest(output_dir):
+    path = os.path.join(output_dir, 'manifest.json')
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_export_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, 'manifest.json')
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+
+def export_figures(output_dir=EXPORT_DIR, formats=('png',), countries=None, workers=EXPORT_WORKERS, force=False):
+    if any(fmt != 'html' for fmt in formats):
+        try:
+            import kaleido
+        except ImportError:
+            raise RuntimeError("PNG and SVG export need kaleido: pip install kaleido") from None
+
+    start = time.perf_counter()
+    state = IncrementalStore(get_source_spec('countries')).refresh()
+    df = state.df
+    if countries:
+        unknown = sorted(set(countries) - set(df['country']))
+        if unknown:
+            raise ValueError(f"Unknown countries: {', '.join(unknown)}")
+
+    manifest = {} if force else load_export_manifest(output_dir)
+    jobs = plan_exports(df, state.version, output_dir, formats, countries)
+    pending = [job for job in jobs if manifest.get(job[3]) != job[4] or not os.path.exists(job[3])]
+    fingerprints = {job[3]: job[4] for job in jobs}
+
+    for job in pending:
+        os.makedirs(os.path.dirname(job[3]), exist_ok=True)
+    plotly_js = write_plotly_js(output_dir) if 'html' in formats else None
+
+    exported, total_bytes, render_seconds = 0, 0, 0.0
+    batches = [
+        [job[:4] for job in pending[i:i + JOBS_PER_TASK]]
+        for i in range(0, len(pending), JOBS_PER_TASK)
+    ]
+    if batches:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(state.dataset, plotly_js)) as executor:
+            for results in executor.map(_export_batch, batches):
+                for path, size, seconds in results:
+                    manifest[path] = fingerprints[path]
+                    exported += 1
+                    total_bytes += size
+                    render_seconds += seconds
+                # Save as batches finish so an interrupted run resumes where it stopped
+                save_export_manifest(output_dir, manifest)
+
+    elapsed = time.perf_counter() - start
+    print(f"Exported {exported} figures, skipped {len(jobs) - len(pending)} unchanged, to {output_dir}")
+    if exported:
+        print(f"{elapsed:.1f}s wall, {exported / elapsed:.1f} figures/s with {workers} workers, "
+              f"{render_seconds / exported * 1000:.0f} ms per figure, {total_bytes / 1024 / 1024:.1f} MB written")
+    return {'exported': exported, 'skipped': len(jobs) - len(pending), 'seconds': elapsed, 'bytes': total_bytes}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export every dashboard figure for every country as static files")
+    parser.add_argument('--output', default=EXPORT_DIR)
+    parser.add_argument('--format', nargs='+', choices=EXPORT_FORMATS, default=['png'])
+    parser.add_argument('--country', nargs='*', default=None, help="Limit per-country charts to these countries")
+    parser.add_argument('--workers', type=int, default=EXPORT_WORKERS)
+    parser.add_argument('--force', action='store_true', help="Re-export figures even if their inputs are unchanged")
+    args = parser.parse_args()
+
+    export_figures(args.output, args.format, args.country, args.workers, args.force)
@@ -0,0 +1,276 @@
+import argparse
+import base64
+import json
+import os
+import re
+import time
+
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+import streamlit as st
+
+from instrumentation import PROFILE_ENABLED, record
+
+MINIMIZE_ENABLED = os.environ.get('MBTI_FIGURE_MINIMIZE', '1').lower() in ('1', 'true', 'yes')
+# Values without a display format keep this many significant digits
+SIGNIFICANT_DIGITS = 4
+TEMPLATE_FIELD_PATTERN = re.compile(r'%\{([A-Za-z_]+)(?:\[\d+\])?(?:\.[A-Za-z_.]+)?(?::([^}]*))?\}')
+FORMAT_DECIMALS_PATTERN = re.compile(r'\.(\d+)([a-z%]?)')
+
+# Trace attributes that never go into a shared template: identity, subplot references and per-trace arrays
+unhoistable_keys = {'type', 'name', 'uid', 'legendgroup', 'legendrank', 'showlegend', 'visible', 'ids',
+                    'xaxis', 'yaxis', 'geo', 'subplot', 'coloraxis', 'meta'}
+int_dtypes = [np.int8, np.uint8, np.int16, np.uint16, np.int32, np.uint32]
+
+
+def template_fields(trace):
+    fields = {}
+    for key in ('hovertemplate', 'texttemplate'):
+        template = trace.get(key)
+        if not isinstance(template, str):
+            continue
+        for field, spec in TEMPLATE_FIELD_PATTERN.findall(template):
+            match = FORMAT_DECIMALS_PATTERN.search(spec or '')
+            if match is None:
+                # An unformatted reference prints the raw value, so it must stay exact enough to read
+                fields[field] = None
+            elif fields.get(field, 0) is not None:
+                decimals = int(match.group(1)) + (2 if match.group(2) == '%' else 0)
+                fields[field] = max(fields.get(field, 0), decimals)
+    return fields
+
+
+def strip_unused_hover(trace):
+    hovertemplate = trace.get('hovertemplate')
+    texttemplate = trace.get('texttemplate')
+    templates = ' '.join(t for t in (hovertemplate, texttemplate) if isinstance(t, str))
+
+    if trace.get('hoverinfo') in ('skip', 'none'):
+        trace.pop('hovertemplate', None)
+        templates = texttemplate if isinstance(texttemplate, str) else ''
+        if 'hovertext' not in templates:
+            trace.pop('hovertext', None)
+
+    # px stores every hover_data column in customdata, even ones the final hovertemplate no longer shows
+    if 'customdata' in trace and 'customdata' not in templates:
+        trace.pop('customdata')
+    if 'hovertext' in trace and hovertemplate and 'hovertext' not in templates:
+        trace.pop('hovertext')
+    if 'text' in trace and isinstance(texttemplate, str) and texttemplate and '%{text' not in templates:
+        trace.pop('text')
+
+
+def display_decimals(values, decimals=None):
+    if decimals is not None:
+        return decimals
+    finite = np.abs(values[np.isfinite(values)])
+    largest = float(finite.max()) if finite.size else 0.0
+    if largest == 0:
+        return 0
+    return max(0, SIGNIFICANT_DIGITS - 1 - int(np.floor(np.log10(largest))))
+
+
+def binary_size(array):
+    return 4 * -(-array.nbytes // 3) + 30
+
+
+def compact_array(value, decimals=None, formatted=False):
+    try:
+        values = np.asarray(value)
+    except (TypeError, ValueError):
+        return value
+    if values.dtype.kind not in 'iuf' or values.size == 0:
+        return value
+
+    if values.dtype.kind == 'f':
+        values = np.round(values.astype(np.float64), display_decimals(values, decimals))
+
+    finite = np.isfinite(values) if values.dtype.kind == 'f' else None
+    if finite is None or (finite.all() and (values == np.trunc(values)).all()):
+        # Whole numbers go out as the narrowest typed array that holds them
+        low, high = values.min(), values.max()
+        for dtype in int_dtypes:
+            info = np.iinfo(dtype)
+            if info.min <= low and high <= info.max:
+                return values.astype(dtype)
+        return values
+
+    if not finite.all():
+        # Gaps (NaN) rule out integer arrays, but whole numbers with gaps are still exact as float32
+        whole = finite.any() and (values[finite] == np.trunc(values[finite])).all() and np.abs(values[finite]).max() < 2 ** 24
+        return values.astype(np.float32) if formatted or whole else values
+    if formatted:
+        # Every place this array is shown has its own number format, so float32 loses nothing visible
+        return values.astype(np.float32)
+
+    as_list = values.tolist()
+    return values if binary_size(values) < len(json.dumps(as_list, separators=(',', ':'))) else as_list
+
+
+def decode_typed_array(value):
+    values = np.frombuffer(base64.b64decode(value['bdata']), dtype=np.dtype(value['dtype']))
+    if 'shape' in value:
+        values = values.reshape([int(n) for n in str(value['shape']).split(',')])
+    return values
+
+
+def compact_trace(trace, fields):
+    for key, value in list(trace.items()):
+        if isinstance(value, dict) and 'bdata' in value:
+            # Figure.to_dict already hands numpy arrays over as base64 typed-array specs
+            value = decode_typed_array(value)
+        if isinstance(value, dict):
+            if key not in ('geojson', 'colorbar'):
+                compact_trace(value, {})
+        elif isinstance(value, (list, tuple, np.ndarray)):
+            decimals = fields.get(key)
+            trace[key] = compact_array(value, decimals, formatted=key in fields and decimals is not None)
+
+
+def _is_array(value):
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return True
+    return isinstance(value, dict) and any(_is_array(v) for v in value.values())
+
+
+def _merge(target, source):
+    for key, value in source.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        else:
+            target[key] = value
+
+
+def hoist_shared_attributes(spec):
+    template = spec.setdefault('layout', {}).setdefault('template', {})
+    template_data = template.setdefault('data', {})
+
+    by_type = {}
+    for trace in spec.get('data', []):
+        by_type.setdefault(trace.get('type', 'scatter'), []).append(trace)
+
+    for trace_type, traces in by_type.items():
+        existing = template_data.get(trace_type)
+        if len(traces) < 2 or (existing and len(existing) > 1):
+            continue
+        first = traces[0]
+        shared = {
+            key: value for key, value in first.items()
+            if key not in unhoistable_keys and not _is_array(value)
+            and all(key in t and t[key] == value for t in traces[1:])
+        }
+        if not shared:
+            continue
+        # A single template entry applies to every trace of that type, so each attribute is sent once
+        for trace in traces:
+            for key in shared:
+                del trace[key]
+        if existing:
+            _merge(existing[0], shared)
+        else:
+            template_data[trace_type] = [shared]
+
+
+def prune_template(spec):
+    template = spec.get('layout', {}).get('template')
+    if not isinstance(template, dict) or 'data' not in template:
+        return
+    used = {t.get('type', 'scatter') for t in spec.get('data', [])}
+    used |= {t.get('type', 'scatter') for frame in spec.get('frames', []) for t in frame.get('data', [])}
+    template['data'] = {k: v for k, v in template['data'].items() if k in used}
+
+
+def minimize_spec(spec):
+    data = spec.get('data', [])
+    fields = []
+    for trace in data:
+        strip_unused_hover(trace)
+        fields.append(template_fields(trace))
+        compact_trace(trace, fields[-1])
+
+    for frame in spec.get('frames', []):
+        indices = frame.get('traces') or range(len(frame.get('data', [])))
+        for trace, index in zip(frame.get('data', []), indices):
+            compact_trace(trace, fields[index] if index < len(fields) else {})
+
+    prune_template(spec)
+    hoist_shared_attributes(spec)
+    return spec
+
+
+def payload_bytes(fig):
+    return len(pio.to_json(fig, validate=False))
+
+
+def minimize_figure(fig, name=None):
+    if not MINIMIZE_ENABLED:
+        return fig
+
+    start = time.perf_counter()
+    minimized = go.Figure(minimize_spec(fig.to_dict()))
+    seconds = time.perf_counter() - start
+
+    if name is not None and PROFILE_ENABLED:
+        # Serializing twice costs as much as the minimizing itself, so sizes are only taken while profiling
+        before, after = payload_bytes(fig), payload_bytes(minimized)
+        record(f'payload.{name}', seconds, after, detail=f"{before} -> {after} bytes")
+    return minimized
+
+
+def plotly_chart(fig, name, **kwargs):
+    return st.plotly_chart(minimize_figure(fig, name), **kwargs)
+
+
+def payload_report(cases):
+    rows = []
+    for name, build in cases:
+        fig = build()
+        start = time.perf_counter()
+        minimized = go.Figure(minimize_spec(fig.to_dict()))
+        seconds = time.perf_counter() - start
+        before, after = payload_bytes(fig), payload_bytes(minimized)
+        rows.append({
+            'figure': name,
+            'before_bytes': before,
+            'after_bytes': after,
+            'saved_percent': round((1 - after / before) * 100, 1) if before else 0.0,
+            'gzip_before_bytes': len(_gzip(pio.to_json(fig, validate=False))),
+            'gzip_after_bytes': len(_gzip(pio.to_json(minimized, validate=False))),
+            'minimize_ms': round(seconds * 1000, 2)
+        })
+    return rows
+
+
+def _gzip(text):
+    import gzip
+    return gzip.compress(text.encode('utf-8'), compresslevel=6)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report serialized Plotly payload sizes before and after minimizing")
+    parser.add_argument('--countries', default='data/countries.csv')
+    parser.add_argument('--types', default='data/types.csv')
+    parser.add_argument('-k', dest='pattern', default=None, help="Only figures whose name contains this")
+    parser.add_argument('--json', default=None, help="Also write the report to this file")
+    args = parser.parse_args()
+
+    from benchmark import figure_cases
+    from map_tab import load_and_process_data
+
+    df, _ = load_and_process_data(args.countries, args.types)
+    cases = [(n, b) for n, b in figure_cases(df) if args.pattern is None or args.pattern in n]
+    rows = payload_report(cases)
+
+    print(f"{'figure':<48} {'before':>10} {'after':>10} {'saved':>7} {'gz before':>10} {'gz after':>10} {'ms':>7}")
+    for r in rows:
+        print(f"{r['figure']:<48} {r['before_bytes']:>10,} {r['after_bytes']:>10,} {r['saved_percent']:>6.1f}% "
+              f"{r['gzip_before_bytes']:>10,} {r['gzip_after_bytes']:>10,} {r['minimize_ms']:>7.1f}")
+    total_before = sum(r['before_bytes'] for r in rows)
+    total_after = sum(r['after_bytes'] for r in rows)
+    print(f"{'total':<48} {total_before:>10,} {total_after:>10,} "
+          f"{(1 - total_after / total_before) * 100 if total_before else 0:>6.1f}%")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(rows, f, indent=1)
@@ -0,0 +1,279 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from cache_registry import get_cache_stats
+from country_dataset import CountryDataset
+from data_sources import open_source
+from map_tab import get_counts_path, mbti_types, process_countries_df, temperament_groups, variant_columns
+
+CACHE_DIR = os.environ.get('MBTI_CACHE_DIR', '.cache')
+STATE_FORMAT = 2
+INCREMENTAL_ENABLED = os.environ.get('MBTI_INCREMENTAL', '1') != '0'
+
+temperament_cols = [f'temperament_{t.lower()}' for t in temperament_groups]
+type_cols = [f'type_{t.lower()}' for t in mbti_types]
+variant_cols = ['variant_a', 'variant_t']
+stat_cols = temperament_cols + type_cols + variant_cols
+
+
+def get_state_path(countries_spec, cache_dir=CACHE_DIR):
+    key = hashlib.sha1(json.dumps([STATE_FORMAT, countries_spec], sort_keys=True).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(cache_dir, f'processed_state_{key}.pkl')
+
+
+def compute_row_hashes(countries_df):
+    raw = countries_df.set_index('Country').reindex(columns=variant_columns)
+    return pd.util.hash_pandas_object(raw, index=True)
+
+
+def _stat_matrix(df):
+    return df.reindex(columns=stat_cols).to_numpy(dtype=np.float64)
+
+
+def _compact(df):
+    # Round through float32 once so the running sums match the values that are kept
+    return CountryDataset.from_frame(df).to_frame()
+
+
+def _unit_type_vectors(df):
+    vectors = np.nan_to_num(df.reindex(columns=type_cols).to_numpy(dtype=np.float64))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+class ProcessedState:
+    def __init__(self, row_hashes, df, sums, counts, cross, similarity, source_stamp=None):
+        self.row_hashes = row_hashes
+        self.dataset = CountryDataset.from_frame(df)
+        self.sums = sums
+        self.counts = counts
+        self.cross = cross
+        self.similarity = similarity
+        self.source_stamp = source_stamp
+        self.version = self._compute_version()
+        self.last_update = {}
+
+    def _compute_version(self):
+        digest = hashlib.sha1(self.row_hashes.to_numpy().tobytes())
+        if 'sample_size' in self.dataset.columns:
+            # New respondent counts change significance tests and respondent weighting, so they are a new version
+            digest.update(self.dataset.column('sample_size').to_numpy(dtype=np.float64, na_value=np.nan).tobytes())
+        return digest.hexdigest()[:16]
+
+    @property
+    def df(self):
+        return self.dataset.to_frame()
+
+    @df.setter
+    def df(self, df):
+        self.dataset = CountryDataset.from_frame(df)
+        self.version = self._compute_version()
+
+    @classmethod
+    def build(cls, countries_df, source_stamp=None):
+        row_hashes = compute_row_hashes(countries_df)
+        df = _compact(process_countries_df(countries_df))
+        values = _stat_matrix(df)
+        filled = np.nan_to_num(values)
+        unit = _unit_type_vectors(df)
+
+        state = cls(
+            row_hashes=row_hashes,
+            df=df,
+            sums=np.nansum(values, axis=0),
+            counts=np.sum(~np.isnan(values), axis=0),
+            cross=filled.T @ filled,
+            similarity=unit @ unit.T,
+            source_stamp=source_stamp
+        )
+        state.last_update = {'mode': 'full', 'changed': len(df), 'removed': 0}
+        return state
+
+    def update(self, countries_df, source_stamp=None):
+        new_hashes = compute_row_hashes(countries_df)
+        old_hashes = self.row_hashes
+
+        common = new_hashes.index.intersection(old_hashes.index)
+        changed = set(common[new_hashes[common].to_numpy() != old_hashes[common].to_numpy()])
+        added = set(new_hashes.index.difference(old_hashes.index))
+        removed = set(old_hashes.index.difference(new_hashes.index))
+
+        if not changed and not added and not removed:
+            self.source_stamp = source_stamp
+            return self
+
+        stale = changed | removed
+        touched = changed | added
+
+        old_df = self.df
+        stale_mask = old_df['country'].isin(stale).to_numpy()
+        stale_rows = old_df[stale_mask]
+        kept = old_df[~stale_mask]
+
+        fresh = process_countries_df(countries_df[countries_df['Country'].isin(touched)])
+        fresh = old_df.iloc[0:0] if fresh.empty else _compact(fresh)
+
+        # Patch the running sums and cross-products rather than rescanning every country
+        old_values = _stat_matrix(stale_rows)
+        new_values = _stat_matrix(fresh)
+        sums = self.sums - np.nansum(old_values, axis=0) + np.nansum(new_values, axis=0)
+        counts = self.counts - np.sum(~np.isnan(old_values), axis=0) + np.sum(~np.isnan(new_values), axis=0)
+        old_filled, new_filled = np.nan_to_num(old_values), np.nan_to_num(new_values)
+        cross = self.cross - old_filled.T @ old_filled + new_filled.T @ new_filled
+
+        order = {country: i for i, country in enumerate(countries_df['Country'])}
+        df = pd.concat([kept, fresh], ignore_index=True)
+        df = df.reindex(columns=list(old_df.columns) + [c for c in df.columns if c not in old_df.columns])
+        df = df.iloc[np.argsort(df['country'].map(order).to_numpy(), kind='stable')].reset_index(drop=True)
+
+        similarity = self._patch_similarity(kept, df, fresh)
+
+        state = ProcessedState(new_hashes, df, sums, counts, cross, similarity, source_stamp)
+        state.last_update = {'mode': 'incremental', 'changed': len(touched), 'removed': len(removed)}
+        return state
+
+    def _patch_similarity(self, kept, df, fresh):
+        old_positions = pd.Series(np.arange(len(self.dataset)), index=self.dataset.column('country'))
+        unit = _unit_type_vectors(df)
+        similarity = np.empty((len(df), len(df)), dtype=np.float64)
+
+        # Copy the block of unchanged countries, then recompute only the rows and columns of changed ones
+        new_positions = pd.Series(np.arange(len(df)), index=df['country'])
+        kept_new = new_positions[kept['country']].to_numpy()
+        kept_old = old_positions[kept['country']].to_numpy()
+        similarity[np.ix_(kept_new, kept_new)] = self.similarity[np.ix_(kept_old, kept_old)]
+
+        fresh_pos = new_positions[fresh['country']].to_numpy()
+        if len(fresh_pos):
+            rows = unit[fresh_pos] @ unit.T
+            similarity[fresh_pos, :] = rows
+            similarity[:, fresh_pos] = rows.T
+        return similarity
+
+    @property
+    def global_stats(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.where(self.counts > 0, self.sums / np.maximum(self.counts, 1), 0.0)
+        by_col = dict(zip(stat_cols, means.astype(float)))
+        present_types = [c for c in self.dataset.columns if c.startswith('type_')]
+        return {
+            'temperaments': {t: by_col[f'temperament_{t.lower()}'] for t in temperament_groups},
+            'types': {c.replace('type_', '').upper(): by_col[c] for c in present_types if c in by_col},
+            'variants': {'A': by_col['variant_a'], 'T': by_col['variant_t']}
+        }
+
+    def correlation_matrix(self, cols):
+        idx = [stat_cols.index(c) for c in cols]
+        n = len(self.dataset)
+        s = self.sums[idx]
+        cov = self.cross[np.ix_(idx, idx)] - np.outer(s, s) / n
+        std = np.sqrt(np.diag(cov))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = cov / np.outer(std, std)
+        labels = [c.split('_', 1)[1].upper() for c in cols]
+        return pd.DataFrame(corr, index=labels, columns=labels)
+
+    def similar_countries(self, country, k=5):
+        countries = self.dataset.column('country')
+        positions = np.flatnonzero(countries == country)
+        if not len(positions):
+            return []
+        row = self.similarity[positions[0]].copy()
+        row[positions[0]] = -np.inf
+        top = np.argpartition(-row, min(k, len(row) - 1))[:k]
+        top = top[np.argsort(-row[top])]
+        return [(countries[i], float(row[i])) for i in top]
+
+
+def _file_stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _source_stamp(source):
+    # Sample sizes come from country_counts.csv, which can change without countries.csv changing
+    stat = os.stat(source.path)
+    return (stat.st_mtime_ns, stat.st_size), _file_stamp(get_counts_path(source.path))
+
+
+def _attach_sample_sizes(df, countries_path):
+    counts_path = get_counts_path(countries_path)
+    # A removed counts file must not leave the previous sample sizes behind
+    df = df.drop(columns=['sample_size'], errors='ignore')
+    if os.path.exists(counts_path) and not df.empty:
+        counts_df = pd.read_csv(counts_path, usecols=['Country', 'n'], dtype={'n': 'Int64'})
+        counts_df = counts_df.rename(columns={'Country': 'country', 'n': 'sample_size'})
+        df = df.merge(counts_df, on='country', how='left')
+    return df
+
+
+class IncrementalStore:
+    def __init__(self, countries_spec, cache_dir=CACHE_DIR):
+        self.countries_spec = countries_spec
+        self.state_path = get_state_path(countries_spec, cache_dir)
+        self.state = None
+        self.lock = threading.Lock()
+
+    def _load_persisted(self):
+        if not os.path.exists(self.state_path):
+            return None
+        try:
+            with open(self.state_path, 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            return None
+
+    def _persist(self, state):
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.state_path)
+
+    def refresh(self):
+        source = open_source(self.countries_spec)
+        stamp = _source_stamp(source)
+
+        stats = get_cache_stats('incremental.state')
+        state = self.state
+        if state is not None and state.source_stamp == stamp:
+            stats.hit()
+            return state
+
+        with self.lock:
+            if self.state is not None and self.state.source_stamp == stamp:
+                stats.hit()
+                return self.state
+
+            previous = self.state or self._load_persisted()
+            if previous is not None and previous.source_stamp == stamp:
+                stats.hit()
+                self.state = previous
+                return previous
+
+            stats.miss()
+
+            start = time.perf_counter()
+            countries_df = source.read(columns=['Country'] + variant_columns)
+            if previous is None:
+                state = ProcessedState.build(countries_df, stamp)
+            else:
+                state = previous.update(countries_df, stamp)
+
+            state.df = _attach_sample_sizes(state.df, source.path)
+            state.last_update['seconds'] = time.perf_counter() - start
+
+            self._persist(state)
+            self.state = state
+            return state
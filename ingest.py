@@ -0,0 +1,205 @@
+import argparse
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from map_tab import get_counts_path, mbti_types, variant_colors, variant_columns
+
+CHUNK_ROWS = 500_000
+SCAN_BLOCK_BYTES = 16 * 1024 * 1024
+
+variant_index = {col: i for i, col in enumerate(variant_columns)}
+
+
+class ByteRangeReader:
+    def __init__(self, path, start, end):
+        self.handle = open(path, 'rb')
+        self.handle.seek(start)
+        self.remaining = end - start
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.handle.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.handle.close()
+
+
+def record_boundaries(path, data_start, targets, block_bytes=SCAN_BLOCK_BYTES):
+    # A newline only ends a record outside quotes. Escaped quotes ("") come in pairs, so the parity of the
+    # quote count since the header tells whether a byte sits inside a quoted field.
+    boundaries = []
+    pending = sorted(targets)
+    inside = 0
+    offset = data_start
+    with open(path, 'rb') as handle:
+        handle.seek(data_start)
+        while pending:
+            block = handle.read(block_bytes)
+            if not block:
+                break
+            data = np.frombuffer(block, dtype=np.uint8)
+            quotes = np.cumsum(data == ord('"'))
+            newlines = np.flatnonzero(data == ord('\n'))
+            ends = offset + newlines[(inside + quotes[newlines]) % 2 == 0] + 1
+            while pending:
+                found = np.searchsorted(ends, pending[0], side='left')
+                if found == len(ends):
+                    break
+                if not boundaries or ends[found] > boundaries[-1]:
+                    boundaries.append(int(ends[found]))
+                pending.pop(0)
+            inside = (inside + int(quotes[-1])) % 2
+            offset += len(block)
+    return boundaries
+
+
+def split_byte_ranges(path, parts):
+    size = os.path.getsize(path)
+    with open(path, 'rb') as handle:
+        header = handle.readline()
+        data_start = handle.tell()
+
+    targets = [data_start + (size - data_start) * i // parts for i in range(1, parts)]
+    boundaries = [data_start] + [b for b in record_boundaries(path, data_start, targets) if b < size] + [size]
+
+    column_names = pd.read_csv(io.BytesIO(header), nrows=0).columns.tolist()
+    ranges = [(start, end) for start, end in zip(boundaries[:-1], boundaries[1:]) if end > start]
+    return column_names, ranges
+
+
+def normalize_variant_keys(chunk, type_col, variant_col):
+    types = chunk[type_col].astype(str).str.strip().str.upper()
+    if variant_col:
+        variants = chunk[variant_col].astype(str).str.strip().str.upper().str[:1]
+        keys = types.str[:4] + '-' + variants
+    else:
+        keys = types.str.replace(r'\s+', '', regex=True)
+    return keys
+
+
+def count_range(path, column_names, start, end, country_col, type_col, variant_col, chunk_rows=CHUNK_ROWS):
+    usecols = [country_col, type_col] + ([variant_col] if variant_col else [])
+    countries = {}
+    counts = []
+    skipped = 0
+
+    reader = ByteRangeReader(path, start, end)
+    try:
+        for chunk in pd.read_csv(reader, names=column_names, header=None, usecols=usecols,
+                                 dtype=str, chunksize=chunk_rows):
+            chunk = chunk.dropna(subset=usecols)
+            codes = normalize_variant_keys(chunk, type_col, variant_col).map(variant_index)
+            valid = codes.notna()
+            skipped += int((~valid).sum())
+
+            country_codes, country_names = pd.factorize(chunk.loc[valid, country_col].str.strip())
+            local = np.zeros((len(country_names), len(variant_columns)), dtype=np.int64)
+            np.add.at(local, (country_codes, codes[valid].to_numpy(dtype=np.int64)), 1)
+
+            for i, name in enumerate(country_names):
+                if name not in countries:
+                    countries[name] = len(countries)
+                    counts.append(np.zeros(len(variant_columns), dtype=np.int64))
+                counts[countries[name]] += local[i]
+    finally:
+        reader.close()
+
+    matrix = np.vstack(counts) if counts else np.zeros((0, len(variant_columns)), dtype=np.int64)
+    return list(countries), matrix, skipped
+
+
+def merge_partial_counts(partials):
+    merged = {}
+    skipped = 0
+    for names, matrix, partial_skipped in partials:
+        skipped += partial_skipped
+        for name, row in zip(names, matrix):
+            if name in merged:
+                merged[name] += row
+            else:
+                merged[name] = row.copy()
+
+    names = sorted(merged)
+    matrix = np.vstack([merged[n] for n in names]) if names else np.zeros((0, len(variant_columns)), dtype=np.int64)
+    return pd.DataFrame(matrix, index=pd.Index(names, name='Country'), columns=variant_columns), skipped
+
+
+def aggregate_respondents(path, country_col='country', type_col='type', variant_col=None, workers=None,
+                          chunk_rows=CHUNK_ROWS):
+    workers = workers or os.cpu_count() or 1
+    column_names, ranges = split_byte_ranges(path, workers * 4)
+
+    for col in [country_col, type_col] + ([variant_col] if variant_col else []):
+        if col not in column_names:
+            raise ValueError(f"Column '{col}' not found in {path}. Found columns: {column_names}")
+
+    args = [(path, column_names, start, end, country_col, type_col, variant_col, chunk_rows) for start, end in ranges]
+
+    if workers == 1 or len(ranges) == 1:
+        partials = [count_range(*a) for a in args]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            partials = list(executor.map(count_range, *zip(*args)))
+
+    return merge_partial_counts(partials)
+
+
+def counts_to_distribution(counts_df, min_n=1):
+    n = counts_df.sum(axis=1)
+    counts_df = counts_df[n >= min_n]
+    n = n[n >= min_n]
+
+    fractions = counts_df.div(n, axis=0).astype(np.float64)
+    countries_df = fractions.reset_index()
+
+    counts_out = counts_df.copy()
+    counts_out.insert(0, 'n', n.astype(np.int64))
+    counts_out = counts_out.reset_index()
+
+    return countries_df, counts_out
+
+
+def ingest(path, output_path='data/countries.csv', country_col='country', type_col='type', variant_col=None,
+           workers=None, min_n=1):
+    start = time.perf_counter()
+    counts_df, skipped = aggregate_respondents(path, country_col, type_col, variant_col, workers)
+    countries_df, counts_out = counts_to_distribution(counts_df, min_n)
+
+    countries_df.to_csv(output_path, index=False)
+    counts_path = get_counts_path(output_path)
+    counts_out.to_csv(counts_path, index=False)
+
+    elapsed = time.perf_counter() - start
+    total = int(counts_out['n'].sum())
+    print(f"Aggregated {total} respondents into {len(countries_df)} countries in {elapsed:.1f}s")
+    if skipped:
+        print(f"Skipped {skipped} rows with an unrecognised type or variant")
+    print(f"Distributions written to {output_path}")
+    print(f"Sample sizes written to {counts_path}")
+    return countries_df, counts_out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Aggregate respondent-level MBTI results into per-country distributions")
+    parser.add_argument('respondents', help="CSV file with one test result per row")
+    parser.add_argument('--output', default='data/countries.csv')
+    parser.add_argument('--country-col', default='country')
+    parser.add_argument('--type-col', default='type',
+                        help=f"4-letter type such as {mbti_types[0]}, or a full variant such as {variant_columns[0]}")
+    parser.add_argument('--variant-col', default=None,
+                        help=f"Separate variant column ({'/'.join(variant_colors)}), if not part of the type")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--min-n', type=int, default=1, help="Drop countries with fewer respondents")
+    args = parser.parse_args()
+
+    ingest(args.respondents, args.output, args.country_col, args.type_col, args.variant_col, args.workers, args.min_n)
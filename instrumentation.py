@@ -0,0 +1,177 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+PROFILE_ENABLED = os.environ.get('MBTI_PROFILE', '0').lower() in ('1', 'true', 'yes')
+PROFILE_LOG = os.environ.get('MBTI_PROFILE_LOG')
+RECENT_RUNS = 50
+
+metrics = {}
+recent_runs = deque(maxlen=RECENT_RUNS)
+metrics_lock = threading.Lock()
+run_context = threading.local()
+
+
+def record(name, seconds, nbytes=None, detail=None):
+    with metrics_lock:
+        entry = metrics.setdefault(name, {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'bytes': None})
+        entry['count'] += 1
+        entry['seconds'] += seconds
+        entry['max_seconds'] = max(entry['max_seconds'], seconds)
+        if nbytes is not None:
+            entry['bytes'] = nbytes
+
+    # Work on background threads (word cloud workers, data refresh) only reaches the process totals
+    run = getattr(run_context, 'run', None)
+    if run is not None:
+        run['events'].append({
+            'name': name,
+            'ms': round(seconds * 1000, 3),
+            'bytes': nbytes,
+            'detail': detail
+        })
+
+
+def figure_bytes(fig):
+    try:
+        return len(fig.to_json())
+    except Exception:
+        return None
+
+
+def timed(name, figure=False):
+    def decorator(func):
+        # Disabled profiling hands back the undecorated function, so hot paths pay nothing
+        if not PROFILE_ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            seconds = time.perf_counter() - start
+            record(name, seconds, figure_bytes(result) if figure else None)
+            return result
+        return wrapper
+    return decorator
+
+
+class _Timer:
+    __slots__ = ('name', 'detail', 'start')
+
+    def __init__(self, name, detail):
+        self.name = name
+        self.detail = detail
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start, detail=self.detail)
+        return False
+
+
+disabled_timer = nullcontext()
+
+
+def timer(name, detail=None):
+    return _Timer(name, detail) if PROFILE_ENABLED else disabled_timer
+
+
+def begin_rerun():
+    if not PROFILE_ENABLED:
+        return
+    run_context.run = {
+        'started_at': time.time(),
+        'start': time.perf_counter(),
+        'events': []
+    }
+
+
+def end_rerun():
+    run = getattr(run_context, 'run', None)
+    if run is None:
+        return None
+    run_context.run = None
+
+    seconds = time.perf_counter() - run.pop('start')
+    run['total_ms'] = round(seconds * 1000, 3)
+    record('rerun', seconds)
+    with metrics_lock:
+        recent_runs.append(run)
+
+    if PROFILE_LOG:
+        try:
+            with open(PROFILE_LOG, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(run) + '\n')
+        except OSError as e:
+            print(f"Could not write profile log {PROFILE_LOG}: {str(e)}")
+    return run
+
+
+def to_jsonl(runs=None):
+    with metrics_lock:
+        runs = list(recent_runs if runs is None else runs)
+    return ''.join(json.dumps(run) + '\n' for run in runs)
+
+
+def to_prometheus():
+    with metrics_lock:
+        snapshot = {name: dict(entry) for name, entry in metrics.items()}
+
+    lines = [
+        '# HELP mbti_hotpath_seconds Time spent in instrumented dashboard hot paths',
+        '# TYPE mbti_hotpath_seconds summary'
+    ]
+    for name, entry in sorted(snapshot.items()):
+        lines.append(f'mbti_hotpath_seconds_sum{{name="{name}"}} {entry["seconds"]:.6f}')
+        lines.append(f'mbti_hotpath_seconds_count{{name="{name}"}} {entry["count"]}')
+
+    lines += ['# HELP mbti_hotpath_max_seconds Slowest single call per hot path',
+              '# TYPE mbti_hotpath_max_seconds gauge']
+    for name, entry in sorted(snapshot.items()):
+        lines.append(f'mbti_hotpath_max_seconds{{name="{name}"}} {entry["max_seconds"]:.6f}')
+
+    lines += ['# HELP mbti_figure_payload_bytes Serialized JSON size of the last figure built',
+              '# TYPE mbti_figure_payload_bytes gauge']
+    for name, entry in sorted(snapshot.items()):
+        if entry['bytes'] is not None:
+            lines.append(f'mbti_figure_payload_bytes{{name="{name}"}} {entry["bytes"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def show_profiling_panel():
+    if not PROFILE_ENABLED:
+        return
+
+    import pandas as pd
+    import streamlit as st
+
+    run = end_rerun()
+    with st.sidebar.expander("⏱️ Profiling", expanded=False):
+        if run is not None:
+            st.metric("This rerun", f"{run['total_ms']:.0f} ms")
+            if run['events']:
+                events = pd.DataFrame(run['events'])
+                events['bytes'] = events['bytes'].map(lambda b: f"{b / 1024:.1f} KB" if b == b and b is not None else "")
+                st.dataframe(events.fillna(''), hide_index=True, width='stretch')
+
+        with metrics_lock:
+            totals = pd.DataFrame([
+                {'name': name, 'calls': e['count'], 'total ms': e['seconds'] * 1000,
+                 'mean ms': e['seconds'] * 1000 / e['count'], 'max ms': e['max_seconds'] * 1000}
+                for name, e in sorted(metrics.items())
+            ])
+        if not totals.empty:
+            st.caption("Since server start")
+            st.dataframe(totals.round(2), hide_index=True, width='stretch')
+
+        st.download_button("Recent reruns (JSON lines)", to_jsonl(), file_name="mbti_profile.jsonl",
+                           mime="application/x-ndjson", key="profile_jsonl")
+        st.download_button("Metrics (Prometheus)", to_prometheus(), file_name="mbti_metrics.prom",
+                           mime="text/plain", key="profile_prometheus")
@@ -0,0 +1,307 @@
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+import numpy as np
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+RERUN_TIMEOUT = 120
+SAMPLE_INTERVAL = 0.1
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+session_countries = ['United States', 'Japan', 'Germany', 'Brazil', 'India', 'France', 'Canada', 'Australia',
+                     'South Korea', 'Mexico', 'Italy', 'Spain', 'Sweden', 'Nigeria', 'Egypt', 'Argentina']
+comparison_types = ["Temperament", "Type Distribution", "Personality Traits"]
+
+# AppTest swaps in a process-wide Runtime and patches config for every run, so runs on different threads
+# corrupt each other; sessions keep their own AppTest and widget state but take turns rerunning
+apptest_lock = threading.Lock()
+
+
+def process_rss(pid='self'):
+    try:
+        with open(f'/proc/{pid}/statm', 'r') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def process_cpu_seconds(pid='self'):
+    if pid == 'self':
+        return time.process_time()
+    with open(f'/proc/{pid}/stat', 'r') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+class ResourceMonitor:
+    def __init__(self, pid='self', interval=SAMPLE_INTERVAL):
+        self.pid = pid
+        self.interval = interval
+        self.peak_rss = 0
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='load-test-monitor', daemon=True)
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, process_rss(self.pid))
+
+    def __enter__(self):
+        self.start_rss = process_rss(self.pid)
+        self.peak_rss = self.start_rss
+        self.start_cpu = process_cpu_seconds(self.pid)
+        self.start_wall = time.perf_counter()
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop_event.set()
+        self.thread.join()
+        self.wall = time.perf_counter() - self.start_wall
+        self.cpu = process_cpu_seconds(self.pid) - self.start_cpu
+        self.end_rss = process_rss(self.pid)
+        self.peak_rss = max(self.peak_rss, self.end_rss)
+        return False
+
+
+def _widget(widgets, label=None, key=None):
+    for widget in widgets:
+        if (key is not None and widget.key == key) or (label is not None and widget.label == label):
+            return widget
+    return None
+
+
+# Each step changes one widget the way a user would and triggers a rerun; None means the widget is not on screen
+def step_map_mode(at, rng):
+    widget = _widget(at.radio, key='map_view')
+    return widget and widget.set_value(rng.choice(["Dominant Temperament", "Dominant Type"]))
+
+
+def step_country(at, rng):
+    widget = _widget(at.selectbox, key='country_details_selector')
+    return widget and widget.set_value(rng.choice([c for c in session_countries if c in widget.options]))
+
+
+def step_highlight(at, rng):
+    widget = _widget(at.checkbox, key='show_selected')
+    return widget and widget.set_value(not widget.value)
+
+
+def step_compare(at, rng):
+    widget = _widget(at.multiselect, label="Select countries to compare:")
+    options = [c for c in session_countries if c in widget.options] if widget else []
+    return widget and widget.set_value(rng.sample(options, 3) + ["Global Average"])
+
+
+def step_comparison_type(at, rng):
+    widget = _widget(at.selectbox, label="Comparison Type:")
+    return widget and widget.set_value(rng.choice(comparison_types))
+
+
+def step_analysis_type(at, rng):
+    widget = _widget(at.radio, label="Select Analysis Type:")
+    return widget and widget.set_value(rng.choice(["Country Comparison", "Correlation Analysis", "Regional Trends"]))
+
+
+session_steps = [
+    ('map_mode', step_map_mode),
+    ('country', step_country),
+    ('highlight', step_highlight),
+    ('compare', step_compare),
+    ('comparison_type', step_comparison_type),
+    ('analysis_type', step_analysis_type),
+]
+
+
+def run_apptest_session(session_id, iterations, seed, latencies, errors, app_path=APP_PATH):
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed + session_id)
+    at = AppTest.from_file(app_path, default_timeout=RERUN_TIMEOUT)
+
+    def timed_run(name, target):
+        with apptest_lock:
+            start = time.perf_counter()
+            try:
+                target.run()
+                failure = at.exception[0].value if at.exception else None
+            except Exception as e:
+                failure = str(e)
+            seconds = time.perf_counter() - start
+        # A failed rerun still counts towards the totals and percentiles, with the time it took to fail
+        latencies.append((name, seconds, failure is None))
+        if failure is not None:
+            errors.append(f"session {session_id} {name}: {failure}")
+
+    timed_run('initial_load', at)
+    for _ in range(iterations):
+        for name, step in session_steps:
+            target = step(at, rng)
+            if target:
+                timed_run(name, target)
+
+
+def run_websocket_session(session_id, iterations, url, latencies, errors):
+    import asyncio
+
+    import websockets
+    from streamlit.proto import BackMsg_pb2, ForwardMsg_pb2
+
+    async def rerun(ws):
+        msg = BackMsg_pb2.BackMsg()
+        msg.rerun_script.query_string = ''
+        await ws.send(msg.SerializeToString())
+        while True:
+            forward = ForwardMsg_pb2.ForwardMsg()
+            forward.ParseFromString(await asyncio.wait_for(ws.recv(), RERUN_TIMEOUT))
+            if forward.WhichOneof('type') == 'script_finished':
+                return
+
+    async def session():
+        async with websockets.connect(url, max_size=None, subprotocols=['streamlit']) as ws:
+            for i in range(iterations + 1):
+                name = 'initial_load' if i == 0 else 'rerun'
+                start = time.perf_counter()
+                try:
+                    await rerun(ws)
+                except Exception:
+                    latencies.append((name, time.perf_counter() - start, False))
+                    raise
+                latencies.append((name, time.perf_counter() - start, True))
+
+    try:
+        asyncio.run(session())
+    except Exception as e:
+        errors.append(f"session {session_id}: {str(e)}")
+
+
+def summarize(sessions, latencies, errors, monitor):
+    values = np.array([seconds for _, seconds, _ in latencies]) * 1000
+    reruns = [seconds for name, seconds, _ in latencies if name != 'initial_load']
+    summary = {
+        'sessions': sessions,
+        'reruns': len(latencies),
+        'failed_reruns': sum(not ok for _, _, ok in latencies),
+        'errors': len(errors),
+        'wall_seconds': round(monitor.wall, 3),
+        'reruns_per_second': round(len(latencies) / monitor.wall, 2) if monitor.wall else None,
+        'cpu_seconds': round(monitor.cpu, 3),
+        'cpu_percent': round(monitor.cpu / monitor.wall * 100, 1) if monitor.wall else None,
+        'rss_start_mb': round(monitor.start_rss / 1024 / 1024, 1),
+        'rss_peak_mb': round(monitor.peak_rss / 1024 / 1024, 1),
+        'rss_per_session_mb': round((monitor.peak_rss - monitor.start_rss) / 1024 / 1024 / sessions, 2),
+        'initial_load_ms': round(float(np.median([s for n, s, _ in latencies if n == 'initial_load'] or [0])) * 1000, 1)
+    }
+    if len(values):
+        for p in (50, 90, 95, 99):
+            summary[f'p{p}_ms'] = round(float(np.percentile(values, p)), 1)
+        summary['max_ms'] = round(float(values.max()), 1)
+    if reruns:
+        summary['rerun_p50_ms'] = round(float(np.percentile(reruns, 50)) * 1000, 1)
+        summary['rerun_p95_ms'] = round(float(np.percentile(reruns, 95)) * 1000, 1)
+    summary['error_examples'] = errors[:3]
+    return summary
+
+
+def run_level(sessions, iterations, seed=0, url=None, server_pid='self'):
+    latencies, errors = [], []
+    if url:
+        targets = [(run_websocket_session, (i, iterations, url, latencies, errors)) for i in range(sessions)]
+    else:
+        targets = [(run_apptest_session, (i, iterations, seed, latencies, errors)) for i in range(sessions)]
+
+    with ResourceMonitor(server_pid) as monitor:
+        threads = [threading.Thread(target=target, args=args, name=f'load-session-{i}')
+                   for i, (target, args) in enumerate(targets)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return summarize(sessions, latencies, errors, monitor)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_app_server(app_path=APP_PATH, port=None, timeout=60):
+    port = port or _free_port()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', app_path, '--server.headless', 'true',
+         '--server.port', str(port), '--server.address', '127.0.0.1', '--browser.gatherUsageStats', 'false'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, cwd=os.path.dirname(app_path)
+    )
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/_stcore/health', timeout=1) as response:
+                if response.status == 200:
+                    return process, f'ws://127.0.0.1:{port}/_stcore/stream'
+        except OSError:
+            time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f"Streamlit server did not start on port {port} within {timeout}s")
+
+
+def print_summary(summary):
+    print(f"{summary['sessions']:>4} sessions: {summary['reruns']} reruns in {summary['wall_seconds']:.1f}s "
+          f"({summary['reruns_per_second']}/s), p50 {summary.get('p50_ms', 0):.0f} ms, "
+          f"p90 {summary.get('p90_ms', 0):.0f} ms, p99 {summary.get('p99_ms', 0):.0f} ms, "
+          f"max {summary.get('max_ms', 0):.0f} ms | CPU {summary['cpu_percent']}% | "
+          f"RSS {summary['rss_peak_mb']} MB peak, +{summary['rss_per_session_mb']} MB/session"
+          + (f" | {summary['failed_reruns']} failed reruns, {summary['errors']} errors: {summary['error_examples']}"
+             if summary['errors'] else ""))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate concurrent dashboard sessions and report rerun latency")
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--iterations', type=int, default=3, help="Passes over the scripted interactions per session")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--websocket', action='store_true',
+                        help="Drive a local `streamlit run` server over its websocket instead of AppTest")
+    parser.add_argument('--url', default=None, help="Websocket URL of an already running local server")
+    parser.add_argument('--json', default=None, help="Also write the summaries to this file")
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    server_pid = 'self'
+    if args.websocket and url is None:
+        server, url = start_app_server()
+        server_pid = server.pid
+        print(f"Started Streamlit server (pid {server.pid}) at {url}")
+
+    try:
+        if url is not None and server_pid == 'self':
+            print("Resource figures are for this client process; pass --websocket to measure a server it starts")
+        if url is None:
+            print("AppTest sessions rerun one at a time; pass --websocket to measure truly concurrent reruns")
+        # Imports, startup checks and process-wide caches are paid once here, not by the first measured level
+        warmup = run_level(1, 0, args.seed, url, server_pid)
+        print(f"Warm-up session: first load {warmup['initial_load_ms']:.0f} ms, RSS {warmup['rss_peak_mb']} MB")
+        summaries = []
+        for sessions in args.sessions:
+            summary = run_level(sessions, args.iterations, args.seed, url, server_pid)
+            print_summary(summary)
+            summaries.append(summary)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'mode': 'websocket' if url else 'apptest', 'iterations': args.iterations,
+                       'cpu_count': os.cpu_count(), 'levels': summaries}, f, indent=1)
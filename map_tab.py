@@ -5,8 +5,19 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import pycountry
+import json
 import os
 
+from cache_registry import get_cache_stats, observed_cache
+from country_dataset import CountryDataset
+from data_sources import get_source_spec, open_source
+from figure_payload import plotly_chart
+from instrumentation import timed
+
+# Dominant-category maps send only changed countries per frame while at most this share of cells differ from the
+# latest period; past that, a country code per change costs more than the full one-byte-per-country z array
+SPARSE_FRAME_SHARE = 0.1
+
 # Define color schemes
 temperament_colors = {
     'NF': '#4CAF50',  # Green for Idealists
@@ -38,6 +49,12 @@ temperament_groups = {
     'SJ': ['ISTJ', 'ISFJ', 'ESTJ', 'ESFJ']
 }
 
+mbti_types = [t for types in temperament_groups.values() for t in types]
+
+variant_columns = [f'{t}-{v}' for t in mbti_types for v in variant_colors]
+
+types_columns = ['Type', 'Nickname', 'Description', 'E', 'N', 'T', 'J']
+
 temperament_descriptions = {
     'NF': "**Idealists (NF)** are abstract and cooperative. They focus on personal growth, relationships, and meaningful connections.",
     'NT': "**Rationals (NT)** are abstract and utilitarian. They value competence, logic, and strategic problem-solving.",
@@ -54,7 +71,43 @@ def get_temperament(mbti_type):
     return None
 
 
+country_code_cache = None
+
+
+def get_country_codes_path():
+    from incremental import CACHE_DIR
+    return os.path.join(CACHE_DIR, 'country_codes.json')
+
+
+def get_country_code_cache():
+    global country_code_cache
+    if country_code_cache is None:
+        codes = {}
+        path = get_country_codes_path()
+        if os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    codes = json.load(f)
+            except Exception:
+                codes = {}
+        country_code_cache = codes
+        get_cache_stats('country_codes').resize(len(codes))
+    return country_code_cache
+
+
 def get_country_code(country_name):
+    cache = get_country_code_cache()
+    stats = get_cache_stats('country_codes')
+    if country_name not in cache:
+        stats.miss()
+        cache[country_name] = lookup_country_code(country_name)
+        stats.resize(len(cache))
+    else:
+        stats.hit()
+    return cache[country_name]
+
+
+def lookup_country_code(country_name):
     try:
         special_cases = {
             'United States': 'USA',
@@ -80,23 +133,56 @@ def get_country_code(country_name):
     return None
 
 
-@st.cache_data
-def load_and_process_data(countries_path, types_path):
-    if not os.path.exists(countries_path):
-        st.error(f"File not found: {countries_path}")
+def get_counts_path(countries_path):
+    return os.path.join(os.path.dirname(countries_path), 'country_counts.csv')
+
+
+@timed('load_and_process_data')
+def load_and_process_data(countries_path, types_path, countries=None):
+    dataset, types_info = load_processed_dataset(countries_path, types_path, countries)
+    return (dataset.to_frame() if dataset is not None else None), types_info
+
+
+# Cached results are pickled on every hit, so they hold the compact float32 dataset rather than the frame
+@observed_cache()
+def load_processed_dataset(countries_path, types_path, countries=None):
+    countries_source = open_source(countries_path)
+    types_source = open_source(types_path)
+
+    if not countries_source.exists():
+        st.error(f"File not found: {countries_source.path}")
         return None, None
 
-    if not os.path.exists(types_path):
-        st.error(f"File not found: {types_path}")
+    if not types_source.exists():
+        st.error(f"File not found: {types_source.path}")
         return None, None
 
     try:
-        countries_df = pd.read_csv(countries_path)
-        types_df = pd.read_csv(types_path)
+        countries_df = countries_source.read(
+            columns=['Country'] + variant_columns,
+            filters={'Country': countries} if countries else None
+        )
+        types_df = types_source.read(columns=types_columns)
     except Exception as e:
         st.error(f"Error loading data: {str(e)}")
         return None, None
 
+    result_df = process_countries_df(countries_df)
+    types_info = process_types_df(types_df)
+
+    counts_path = get_counts_path(countries_source.path)
+    if os.path.exists(counts_path) and not result_df.empty:
+        try:
+            counts_df = pd.read_csv(counts_path, usecols=['Country', 'n'], dtype={'n': 'Int64'})
+            counts_df = counts_df.rename(columns={'Country': 'country', 'n': 'sample_size'})
+            result_df = result_df.merge(counts_df, on='country', how='left')
+        except Exception as e:
+            st.warning(f"Could not load sample sizes from {counts_path}: {str(e)}")
+
+    return CountryDataset.from_frame(result_df), types_info
+
+
+def process_countries_df(countries_df):
     mbti_cols = [col for col in countries_df.columns if col != 'Country']
 
     results = []
@@ -167,6 +253,10 @@ def load_and_process_data(countries_path, types_path):
 
         results.append(result)
 
+    return pd.DataFrame(results)
+
+
+def process_types_df(types_df):
     types_info = {}
     for _, row in types_df.iterrows():
         mbti_type = row['Type']
@@ -183,10 +273,109 @@ def load_and_process_data(countries_path, types_path):
             'temperament': get_temperament(mbti_type)
         }
 
-    return pd.DataFrame(results), types_info
+    return types_info
+
+
+@observed_cache()
+def load_types_info(types_path):
+    return process_types_df(open_source(types_path).read(columns=types_columns))
+
 
+def load_store_data(store_path, types_path, year=None, min_n=None):
+    dataset, types_info = load_store_dataset(store_path, types_path, year, min_n)
+    return (dataset.to_frame() if dataset is not None else None), types_info
 
-@st.cache_data
+
+@observed_cache()
+def load_store_dataset(store_path, types_path, year=None, min_n=None):
+    from data_store import query_country_distribution
+
+    try:
+        countries_df, sample_sizes = query_country_distribution(store_path, year=year, min_n=min_n)
+        types_info = load_types_info(types_path)
+    except Exception as e:
+        st.error(f"Error querying data store: {str(e)}")
+        return None, None
+
+    result_df = process_countries_df(countries_df)
+    if not result_df.empty:
+        result_df['sample_size'] = result_df['country'].map(sample_sizes).astype('Int64')
+
+    return CountryDataset.from_frame(result_df), types_info
+
+
+@observed_cache()
+def get_store_years(store_path):
+    from data_store import available_years
+
+    return available_years(store_path)
+
+
+def show_data_filters(key):
+    from data_store import STORE_PATH, store_available
+
+    if not store_available(STORE_PATH):
+        return None
+
+    with st.expander("Data filters"):
+        col1, col2 = st.columns(2)
+
+        with col1:
+            year = st.selectbox(
+                "Responses from:",
+                ["All years"] + get_store_years(STORE_PATH),
+                key=f"{key}_filter_year"
+            )
+
+        with col2:
+            min_n = st.number_input(
+                "Only countries with at least this many responses:",
+                min_value=0,
+                value=0,
+                step=100,
+                key=f"{key}_filter_min_n"
+            )
+
+    if year == "All years" and not min_n:
+        return None
+
+    return {
+        'year': None if year == "All years" else int(year),
+        'min_n': int(min_n) or None
+    }
+
+
+@observed_cache(st.cache_resource)
+def get_data_refresher(countries_path, types_path):
+    from data_refresh import DataRefresher
+
+    refresher = DataRefresher(countries_path, types_path)
+    refresher.start()
+    return refresher
+
+
+@timed('load_dashboard_data')
+def load_dashboard_data(countries_path, types_path, filters=None):
+    from data_store import STORE_PATH
+    from incremental import INCREMENTAL_ENABLED
+
+    if filters:
+        df, types_info = load_store_data(STORE_PATH, types_path, filters['year'], filters['min_n'])
+        return df, types_info, calculate_global_stats(df), None
+
+    if INCREMENTAL_ENABLED and open_source(countries_path).exists() and open_source(types_path).exists():
+        try:
+            bundle = get_data_refresher(countries_path, types_path).get()
+            return bundle.df, bundle.types_info, bundle.global_stats, bundle
+        except Exception as e:
+            st.warning(f"Incremental update failed, reloading all data: {str(e)}")
+
+    df, types_info = load_and_process_data(countries_path, types_path)
+    return df, types_info, calculate_global_stats(df), None
+
+
+@timed('calculate_global_stats')
+@observed_cache()
 def calculate_global_stats(df):
     if df is None or df.empty:
         return {
@@ -229,7 +418,159 @@ def calculate_global_stats(df):
     return global_stats
 
 
-def create_world_map(df, color_by='dominant_temperament', selected_country=None):
+def get_metric_label(metric):
+    if metric == 'dominant_temperament':
+        return 'Dominant Temperament'
+    if metric == 'dominant_type':
+        return 'Dominant Type'
+    prefix, name = metric.split('_', 1)
+    if prefix == 'variant':
+        return 'Assertive (%)' if name == 'a' else 'Turbulent (%)'
+    return f"{name.upper()} (%)"
+
+
+def create_animated_world_map(snapshots, color_by='dominant_temperament', show_delta=False):
+    if color_by in ('dominant_temperament', 'dominant_type'):
+        show_delta = False
+        categories = list(temperament_groups) if color_by == 'dominant_temperament' else mbti_types
+        colors = temperament_colors if color_by == 'dominant_temperament' else type_colors
+        values = snapshots.metric(color_by)
+
+        n = len(categories)
+        colorscale = []
+        for i, name in enumerate(categories):
+            colorscale.append([i / n, colors[name]])
+            colorscale.append([(i + 1) / n, colors[name]])
+
+        scale = dict(
+            colorscale=colorscale,
+            zmin=-0.5,
+            zmax=n - 0.5,
+            colorbar=dict(title=get_metric_label(color_by), tickvals=list(range(n)), ticktext=categories)
+        )
+        hovertemplate = '<b>%{hovertext}</b><extra></extra>'
+    else:
+        values = snapshots.deltas(color_by) if show_delta else snapshots.metric(color_by)
+        label = get_metric_label(color_by)
+
+        if show_delta:
+            limit = float(np.nanmax(np.abs(values))) if np.isfinite(values).any() else 1.0
+            scale = dict(colorscale='RdBu', zmid=0, zmin=-limit, zmax=limit,
+                         colorbar=dict(title=f"Change in {label}"))
+            hovertemplate = '<b>%{hovertext}</b><br>%{z:+.2f} pts<extra></extra>'
+        else:
+            scale = dict(colorscale='Viridis', zmin=float(np.nanmin(values)), zmax=float(np.nanmax(values)),
+                         colorbar=dict(title=label))
+            hovertemplate = '<b>%{hovertext}</b><br>%{z:.2f}%<extra></extra>'
+
+    z = np.round(np.asarray(values, dtype=np.float64), 2)
+    base = go.Choropleth(
+        locations=snapshots.country_codes,
+        z=z[-1],
+        hovertext=snapshots.countries,
+        hovertemplate=hovertemplate,
+        marker_line_color='white',
+        marker_line_width=0.5,
+        **scale
+    )
+
+    changed = ~((z == z[-1]) | (np.isnan(z) & np.isnan(z[-1])))
+    if color_by.startswith('dominant_') and changed.mean() <= SPARSE_FRAME_SHARE:
+        # plotly.js replaces a frame's arrays wholesale, so a frame cannot patch single z values of the base trace.
+        # Instead the latest period stays on the base trace and each frame fills an overlay trace with only the
+        # countries whose dominant category differs from it. The overlay skips hover, so the base trace still
+        # names the country, which is all these maps show on hover.
+        codes = np.asarray(snapshots.country_codes, dtype=object)
+        overlay_scale = {k: v for k, v in scale.items() if k != 'colorbar'}
+        data = [base, go.Choropleth(locations=[], z=[], hoverinfo='skip', showscale=False,
+                                    marker_line_color='white', marker_line_width=0.5, **overlay_scale)]
+        frames = [
+            go.Frame(name=period, traces=[1],
+                     data=[go.Choropleth(locations=codes[changed[i]].tolist(), z=z[i][changed[i]])])
+            for i, period in enumerate(snapshots.periods)
+        ]
+    else:
+        # Shares move in nearly every country each period, so a full z array is the smaller frame
+        data = [base]
+        frames = [go.Frame(name=period, data=[go.Choropleth(z=z[i])], traces=[0])
+                  for i, period in enumerate(snapshots.periods)]
+
+    fig = go.Figure(data=data, frames=frames)
+
+    steps = [
+        dict(
+            method='animate',
+            label=period,
+            args=[[period], dict(mode='immediate', frame=dict(duration=0, redraw=True), transition=dict(duration=0))]
+        )
+        for period in snapshots.periods
+    ]
+
+    fig.update_layout(
+        margin=dict(l=0, r=0, t=0, b=0),
+        geo=dict(
+            showframe=False,
+            showcoastlines=True,
+            projection_type='natural earth',
+            showland=True,
+            landcolor='rgba(240, 240, 240, 1)',
+            showcountries=True,
+            countrycolor='rgba(200, 200, 200, 0.5)',
+            oceancolor='rgba(230, 250, 255, 1)',
+        ),
+        autosize=True,
+        height=650,
+        updatemenus=[dict(
+            type='buttons',
+            showactive=False,
+            x=0.05,
+            y=0.05,
+            xanchor='right',
+            yanchor='top',
+            buttons=[
+                dict(label='Play', method='animate',
+                     args=[None, dict(frame=dict(duration=600, redraw=True), fromcurrent=True)]),
+                dict(label='Pause', method='animate',
+                     args=[[None], dict(mode='immediate', frame=dict(duration=0, redraw=False))])
+            ]
+        )],
+        sliders=[dict(
+            active=len(snapshots.periods) - 1,
+            x=0.1,
+            len=0.85,
+            y=0.05,
+            yanchor='top',
+            currentvalue=dict(prefix='Period: '),
+            steps=steps
+        )]
+    )
+
+    return fig
+
+
+def add_country_highlight(fig, df, selected_country):
+    selected_row = df[df['country'] == selected_country]
+    if not selected_row.empty:
+        selected_code = selected_row.iloc[0]['country_code']
+        fig.add_trace(
+            go.Choropleth(
+                locations=[selected_code],
+                z=[1],
+                colorscale=[[0, 'rgba(255,255,255,0)'], [1, 'rgba(255,255,255,0.5)']],
+                showscale=False,
+                hoverinfo='skip',
+                marker_line_color='white',
+                marker_line_width=2
+            )
+        )
+    return fig
+
+
+@timed('create_world_map', figure=True)
+def create_world_map(df, color_by='dominant_temperament', selected_country=None, snapshots=None, show_delta=False):
+    if snapshots is not None:
+        return create_animated_world_map(snapshots, color_by, show_delta)
+
     if df is None or df.empty:
         fig = go.Figure()
         fig.update_layout(
@@ -270,20 +611,7 @@ def create_world_map(df, color_by='dominant_temperament', selected_country=None)
         )
 
     if selected_country:
-        selected_row = df[df['country'] == selected_country]
-        if not selected_row.empty:
-            selected_code = selected_row.iloc[0]['country_code']
-            fig.add_trace(
-                go.Choropleth(
-                    locations=[selected_code],
-                    z=[1],
-                    colorscale=[[0, 'rgba(255,255,255,0)'], [1, 'rgba(255,255,255,0.5)']],
-                    showscale=False,
-                    hoverinfo='skip',
-                    marker_line_color='white',
-                    marker_line_width=2
-                )
-            )
+        add_country_highlight(fig, df, selected_country)
 
     fig.update_layout(
         margin=dict(l=0, r=0, t=0, b=0),
@@ -308,6 +636,47 @@ def create_world_map(df, color_by='dominant_temperament', selected_country=None)
     return fig
 
 
+def create_region_map(regions_df, geojson, color_by='dominant_temperament'):
+    if color_by == 'dominant_type':
+        color_map = {t: type_colors.get(t, '#808080') for t in regions_df['dominant_type'].unique()}
+        labels = {'dominant_type': 'Dominant Type'}
+        hover_data = {'dominant_temperament': True, 'region': False}
+    else:
+        color_by = 'dominant_temperament'
+        color_map = temperament_colors
+        labels = {'dominant_temperament': 'Dominant Temperament'}
+        hover_data = {'dominant_type': True, 'region': False}
+
+    fig = px.choropleth(
+        regions_df,
+        geojson=geojson,
+        locations='region',
+        color=color_by,
+        color_discrete_map=color_map,
+        hover_name='region',
+        labels=labels,
+        hover_data=hover_data
+    )
+
+    # px gives every color category its own trace carrying the whole FeatureCollection; send each feature once
+    features = {f['id']: f for f in geojson['features']}
+    for trace in fig.data:
+        trace.geojson = {
+            'type': 'FeatureCollection',
+            'features': [features[r] for r in trace.locations if r in features]
+        }
+
+    fig.update_geos(
+        fitbounds='locations',
+        visible=False,
+        showcountries=True,
+        countrycolor='rgba(200, 200, 200, 0.5)'
+    )
+    fig.update_layout(margin=dict(l=0, r=0, t=0, b=0), height=500)
+    fig.update_traces(marker_line_color='white', marker_line_width=0.5)
+    return fig
+
+
 def create_temperament_chart(data, chart_type='pie'):
     if data is None:
         return go.Figure()
@@ -393,14 +762,18 @@ def create_temperament_chart(data, chart_type='pie'):
 
 
 def show_map_tab():
+    from timeseries import load_snapshots
+
     st.markdown("<div class='dashboard-card'>", unsafe_allow_html=True)
     st.markdown("<div class='card-title'>MBTI World Distribution Map</div>", unsafe_allow_html=True)
 
-    countries_file = 'data/countries.csv'
-    types_file = 'data/types.csv'
+    countries_file = get_source_spec('countries')
+    types_file = get_source_spec('types')
+
+    filters = show_data_filters("map")
 
     with st.spinner("Loading data..."):
-        df, types_info = load_and_process_data(countries_file, types_file)
+        df, types_info, global_stats, bundle = load_dashboard_data(countries_file, types_file, filters)
 
         if df is None or types_info is None:
             st.error("""
@@ -415,15 +788,20 @@ def show_map_tab():
                 return
             return
 
-        global_stats = calculate_global_stats(df)
-
-        if 'df' not in st.session_state:
-            st.session_state.df = df
-        if 'types_info' not in st.session_state:
+        if filters is None:
+            stats = get_cache_stats('session_state.dataset')
+            if bundle is not None and st.session_state.get('dataset') is bundle.dataset:
+                stats.hit()
+            else:
+                stats.miss()
+            st.session_state.dataset = bundle.dataset if bundle is not None else CountryDataset.from_frame(df)
             st.session_state.types_info = types_info
-        if 'global_stats' not in st.session_state:
             st.session_state.global_stats = global_stats
 
+    if df.empty:
+        st.warning("No countries match the selected data filters.")
+        return
+
     col1, col2 = st.columns([3, 1])
 
     with col1:
@@ -447,9 +825,63 @@ def show_map_tab():
                 key="selected_country_highlight"
             )
 
-    map_fig = create_world_map(df, color_by=color_by, selected_country=selected_country if show_selected else None)
+        show_outliers = st.checkbox("Flag Unusual Distributions", value=False, key="show_outliers")
+
+    snapshots = bundle.snapshots if bundle is not None else load_snapshots()
+    time_view = False
+    show_delta = False
+
+    if snapshots is not None and len(snapshots.periods) > 1:
+        time_view = st.checkbox(
+            f"Show changes over time ({snapshots.periods[0]} – {snapshots.periods[-1]})",
+            value=False,
+            key="map_time_view"
+        )
+
+        if time_view:
+            metric_options = {"Same as map view": color_by}
+            metric_options.update({f"{t} share": f'temperament_{t.lower()}' for t in temperament_groups})
+            metric_options.update({f"{t} share": f'type_{t.lower()}' for t in mbti_types})
+            metric_options.update({"Assertive share": 'variant_a', "Turbulent share": 'variant_t'})
+
+            col1, col2 = st.columns([3, 1])
+
+            with col1:
+                metric_label = st.selectbox("Color by:", list(metric_options), key="map_time_metric")
+                color_by = metric_options[metric_label]
+
+            with col2:
+                if not color_by.startswith('dominant_'):
+                    show_delta = st.checkbox("Change vs. previous period", value=False, key="map_time_delta")
+
+    if bundle is not None and not time_view:
+        map_fig = bundle.world_map(color_by)
+        if show_selected and selected_country:
+            add_country_highlight(map_fig, df, selected_country)
+    else:
+        map_fig = create_world_map(
+            df,
+            color_by=color_by,
+            selected_country=selected_country if show_selected else None,
+            snapshots=snapshots if time_view else None,
+            show_delta=show_delta
+        )
+
+    outliers = None
+    if show_outliers:
+        from anomalies import add_outlier_highlight, country_outliers
+
+        outliers = country_outliers(df, bundle=bundle)
+        if outliers is not None and not time_view:
+            add_outlier_highlight(map_fig, outliers)
+
+    plotly_chart(map_fig, 'world_map', width='stretch', config={'displayModeBar': False})
+
+    if show_outliers:
+        from anomalies import show_outlier_table
 
-    st.plotly_chart(map_fig, use_container_width=True, config={'displayModeBar': False})
+        with st.expander("Countries ranked by how unusual their type distribution is", expanded=True):
+            show_outlier_table(outliers)
 
     st.markdown("### Select a country to explore")
     country_select = st.selectbox(
@@ -486,7 +918,7 @@ def show_map_tab():
             st.markdown(f"<div class='card-title'>Temperament Distribution</div>", unsafe_allow_html=True)
 
             temp_chart = create_temperament_chart(country_data)
-            st.plotly_chart(temp_chart, use_container_width=True)
+            plotly_chart(temp_chart, 'temperament_chart', width='stretch')
 
             st.markdown("</div>", unsafe_allow_html=True)
 
@@ -512,6 +944,22 @@ def show_map_tab():
 
             st.markdown("</div>", unsafe_allow_html=True)
 
+        from regions import get_country_regions
+
+        regions_df, geojson, _ = get_country_regions(country_select)
+        if regions_df is not None and geojson is not None:
+            if st.checkbox(f"Show regional breakdown ({len(regions_df)} regions)", value=False, key="map_show_regions"):
+                region_fig = create_region_map(regions_df, geojson, color_by)
+                plotly_chart(region_fig, 'region_map', width='stretch', config={'displayModeBar': False})
+
+        if bundle is not None:
+            similar = bundle.state.similar_countries(country_select, k=5)
+            if similar:
+                st.markdown(
+                    "**Most similar type distributions:** " +
+                    ", ".join(f"{name} ({score:.3f})" for name, score in similar)
+                )
+
     st.markdown("</div>", unsafe_allow_html=True)
 
 
@@ -0,0 +1,89 @@
+import os
+import re
+
+import numpy as np
+import streamlit as st
+
+from cache_registry import observed_cache
+from map_tab import get_temperament, temperament_groups
+
+MODEL_PATH = 'data/NLP/mbti_predictor.npz'
+
+TOKEN_PATTERN = re.compile(r"[a-z][a-z']+")
+URL_PATTERN = re.compile(r'https?://\S+|www\.\S+')
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(URL_PATTERN.sub(' ', text.lower()))
+
+
+class MBTIPredictor:
+    def __init__(self, types, vocab, idf, centroids):
+        self.types = [str(t) for t in types]
+        self.vocab = {str(word): i for i, word in enumerate(vocab)}
+        self.idf = np.asarray(idf, dtype=np.float32)
+        # Stored transposed so a query only touches the rows of its own terms
+        self.centroids_t = np.ascontiguousarray(np.asarray(centroids, dtype=np.float32).T)
+
+    def vectorize(self, text):
+        lookup = self.vocab.get
+        indices = [i for i in map(lookup, tokenize(text)) if i is not None]
+        if not indices:
+            return None, None
+
+        term_ids, counts = np.unique(np.asarray(indices, dtype=np.int64), return_counts=True)
+        weights = (1.0 + np.log(counts.astype(np.float32))) * self.idf[term_ids]
+        norm = np.linalg.norm(weights)
+        if norm == 0:
+            return None, None
+        return term_ids, weights / norm
+
+    def predict(self, text, temperature=0.05):
+        term_ids, weights = self.vectorize(text)
+        if term_ids is None:
+            return None
+
+        scores = weights @ self.centroids_t[term_ids]
+        logits = (scores - scores.max()) / temperature
+        probs = np.exp(logits)
+        probs /= probs.sum()
+
+        type_probs = dict(zip(self.types, probs.astype(float)))
+        temp_probs = {temp: 0.0 for temp in temperament_groups}
+        for mbti_type, p in type_probs.items():
+            temp = get_temperament(mbti_type)
+            if temp:
+                temp_probs[temp] += p
+
+        return {
+            'type': max(type_probs.items(), key=lambda x: x[1])[0],
+            'temperament': max(temp_probs.items(), key=lambda x: x[1])[0],
+            'type_probabilities': type_probs,
+            'temperament_probabilities': temp_probs,
+            'matched_terms': int(len(term_ids))
+        }
+
+
+def save_predictor(path, types, vocab, idf, centroids):
+    np.savez_compressed(
+        path,
+        types=np.asarray(types),
+        vocab=np.asarray(vocab),
+        idf=np.asarray(idf, dtype=np.float32),
+        centroids=np.asarray(centroids, dtype=np.float32)
+    )
+
+
+@observed_cache(st.cache_resource)
+def _load_predictor(path, mtime):
+    with np.load(path, allow_pickle=False) as model:
+        return MBTIPredictor(model['types'], model['vocab'], model['idf'], model['centroids'])
+
+
+def load_predictor(path=MODEL_PATH):
+    # A missing model is not cached, and the mtime key picks up a model retrained while the app runs
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    return _load_predictor(path, mtime)
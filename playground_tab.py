@@ -0,0 +1,306 @@
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import streamlit as st
+
+from cache_registry import get_cache_stats, observed_cache
+from corpus_stream import NO_GROUP, corpus_format, count_corpus, create_corpus_pool, preview_columns
+from instrumentation import timed
+from mbti_predictor import MODEL_PATH, load_predictor
+
+MAX_TEXT_CHARS = 200_000
+GENERATION_TIMEOUT = 20
+WORKER_COUNT = 2
+MAX_PENDING = 4
+CACHE_ENTRIES = 64
+MAX_GROUP_CLOUDS = 16
+
+
+class WordCloudService:
+    def __init__(self, workers=WORKER_COUNT, max_pending=MAX_PENDING, cache_entries=CACHE_ENTRIES):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='wordcloud')
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.cache = OrderedDict()
+        self.cache_entries = cache_entries
+        self.lock = threading.Lock()
+        self.stats = get_cache_stats('wordcloud_png', max_entries=cache_entries)
+
+    def _cached(self, key):
+        with self.lock:
+            png = self.cache.get(key)
+            if png is not None:
+                self.cache.move_to_end(key)
+                self.stats.hit()
+            else:
+                self.stats.miss()
+            return png
+
+    def _store(self, key, png):
+        with self.lock:
+            self.cache[key] = png
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_entries:
+                self.cache.popitem(last=False)
+                self.stats.evict()
+            self.stats.resize(len(self.cache), sum(len(p) for p in self.cache.values()))
+
+    def _run(self, key, source, max_words, colormap, width, background_color):
+        try:
+            png = generate_wordcloud_png(source, max_words, colormap, width, background_color)
+            self._store(key, png)
+            return png
+        finally:
+            self.slots.release()
+
+    @timed('wordcloud_render')
+    def render(self, source, max_words, colormap, width, background_color, timeout=GENERATION_TIMEOUT):
+        key = wordcloud_key(source, max_words, colormap, width, background_color)
+        png = self._cached(key)
+        if png is not None:
+            return png
+
+        if not self.slots.acquire(blocking=False):
+            raise RuntimeError("The word cloud generator is busy. Please try again in a moment.")
+
+        try:
+            future = self.executor.submit(self._run, key, source, max_words, colormap, width, background_color)
+        except Exception:
+            self.slots.release()
+            raise
+
+        # A timed-out job keeps its slot until it finishes, so stuck work still counts against the bound
+        return future.result(timeout=timeout)
+
+
+def wordcloud_key(source, max_words, colormap, width, background_color):
+    if isinstance(source, dict):
+        source = json.dumps(sorted(source.items()))
+    digest = hashlib.sha256(source.encode('utf-8'))
+    digest.update(f"|{max_words}|{colormap}|{width}|{background_color}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+@timed('wordcloud_generate')
+def generate_wordcloud_png(source, max_words, colormap, width, background_color):
+    from wordcloud import WordCloud
+
+    wordcloud = WordCloud(
+        width=width,
+        height=width // 2,
+        background_color=background_color,
+        max_words=max_words,
+        colormap=colormap
+    )
+    if isinstance(source, dict):
+        wordcloud.generate_from_frequencies(source)
+    else:
+        wordcloud.generate(source)
+
+    buffer = io.BytesIO()
+    wordcloud.to_image().save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+@observed_cache(st.cache_resource)
+def get_wordcloud_service():
+    return WordCloudService()
+
+
+@observed_cache(st.cache_resource)
+def get_corpus_pool():
+    return create_corpus_pool()
+
+
+def show_prediction(user_text):
+    predictor = load_predictor()
+    if predictor is None:
+        st.caption(f"Type prediction is unavailable: no predictor model at `{MODEL_PATH}`. Build it from a labelled "
+                   f"corpus (one MBTI type and one text column per row) with "
+                   f"`python train_predictor.py path/to/corpus.csv --type-col type --text-col posts`.")
+        return
+
+    prediction = predictor.predict(user_text)
+
+    st.markdown("### Predicted Personality")
+    if prediction is None:
+        st.info("Not enough recognizable words to predict an MBTI type.")
+        return
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.metric("Most likely type", prediction['type'])
+        st.metric("Most likely temperament", prediction['temperament'])
+
+    with col2:
+        top_types = sorted(prediction['type_probabilities'].items(), key=lambda x: x[1], reverse=True)[:5]
+        for mbti_type, p in top_types:
+            st.progress(p, text=f"{mbti_type}: {p * 100:.1f}%")
+
+    st.caption(f"Based on {prediction['matched_terms']} distinct words found in the model vocabulary.")
+
+
+def show_wordcloud(source, max_words, colormap, width, background_color, file_name="wordcloud.png", key=None):
+    try:
+        with st.spinner("Generating word cloud..."):
+            png = get_wordcloud_service().render(source, max_words, colormap, width, background_color)
+
+        st.image(png)
+
+        st.download_button(
+            label="Download Word Cloud",
+            data=png,
+            file_name=file_name,
+            mime="image/png",
+            key=key
+        )
+
+    except TimeoutError:
+        st.error("Generating the word cloud took too long. Try a shorter text or fewer words.")
+    except Exception as e:
+        st.error(f"An error occurred: {str(e)}")
+        st.write("Please make sure you have entered valid text.")
+
+
+def show_text_mode(max_words, colormap, width, background_color):
+    user_text = st.text_area(
+        "Enter your text here:",
+        height=200,
+        placeholder="Type or paste your text here...",
+        help="The more text you enter, the more interesting your word cloud will be!"
+    )
+
+    if not user_text:
+        st.info("👆 Enter some text above to generate your word cloud!")
+        return
+
+    if len(user_text) > MAX_TEXT_CHARS:
+        st.warning(f"Only the first {MAX_TEXT_CHARS:,} characters are used for the word cloud.")
+        cloud_text = user_text[:MAX_TEXT_CHARS]
+    else:
+        cloud_text = user_text
+
+    show_wordcloud(cloud_text, max_words, colormap, width, background_color)
+
+    show_prediction(cloud_text)
+
+
+def show_corpus_mode(max_words, colormap, width, background_color):
+    uploaded = st.file_uploader(
+        "Upload a corpus:",
+        type=['txt', 'csv', 'jsonl', 'json'],
+        help="Plain text, a CSV file or JSON lines. Large files are processed in chunks."
+    )
+
+    if uploaded is None:
+        st.info("👆 Upload a .txt, .csv or .jsonl file to generate word clouds from it!")
+        return
+
+    fmt = corpus_format(uploaded.name)
+    text_col = None
+    group_col = None
+
+    if fmt in ('csv', 'jsonl'):
+        try:
+            columns = preview_columns(uploaded, fmt)
+        except Exception as e:
+            st.error(f"Could not read the file header: {str(e)}")
+            return
+
+        col1, col2 = st.columns(2)
+
+        with col1:
+            text_col = st.selectbox("Text column", columns)
+
+        with col2:
+            group_options = ["(none)"] + [c for c in columns if c != text_col]
+            group_choice = st.selectbox(
+                "One word cloud per",
+                group_options,
+                help="For example an MBTI type column to compare the vocabulary of each type"
+            )
+            group_col = None if group_choice == "(none)" else group_choice
+
+    corpus_key = (getattr(uploaded, 'file_id', None) or f"{uploaded.name}:{uploaded.size}", text_col, group_col)
+
+    if st.session_state.get('corpus_key') != corpus_key:
+        if not st.button("Count words"):
+            return
+
+        progress_bar = st.progress(0.0, text="Counting words...")
+        try:
+            counts = count_corpus(
+                uploaded, fmt, text_col, group_col,
+                executor=get_corpus_pool(),
+                progress=lambda fraction: progress_bar.progress(fraction, text="Counting words...")
+            )
+        except Exception as e:
+            st.error(f"An error occurred while reading the corpus: {str(e)}")
+            return
+        finally:
+            progress_bar.empty()
+
+        st.session_state.corpus_key = corpus_key
+        st.session_state.corpus_counts = {
+            group: (sum(counter.values()), dict(counter.most_common(500)))
+            for group, counter in counts.items()
+        }
+
+    corpus_counts = st.session_state.corpus_counts
+    groups = sorted(corpus_counts.items(), key=lambda x: x[1][0], reverse=True)
+
+    if not groups:
+        st.warning("No words found in the uploaded corpus.")
+        return
+
+    if len(groups) > MAX_GROUP_CLOUDS:
+        st.caption(f"Showing the {MAX_GROUP_CLOUDS} largest of {len(groups)} groups.")
+        groups = groups[:MAX_GROUP_CLOUDS]
+
+    columns = st.columns(2) if len(groups) > 1 else [st.container()]
+    for i, (group, (total_words, frequencies)) in enumerate(groups):
+        with columns[i % len(columns)]:
+            if group != NO_GROUP or len(groups) > 1:
+                st.markdown(f"#### {group}")
+            st.caption(f"{total_words:,} words counted")
+
+            top_words = dict(sorted(frequencies.items(), key=lambda x: x[1], reverse=True)[:max_words])
+            safe_name = "".join(c if c.isalnum() else "_" for c in group)
+            show_wordcloud(top_words, max_words, colormap, width, background_color,
+                           file_name=f"wordcloud_{safe_name}.png", key=f"download_{i}_{safe_name}")
+
+
+def show_playground_tab():
+    st.markdown("## Word Cloud Playground")
+    st.write("""
+    Create your own word cloud! Enter your text below and see it transformed into a beautiful visualization.
+    """)
+
+    input_mode = st.radio(
+        "Input:",
+        ["Paste text", "Upload corpus"],
+        horizontal=True,
+        key="playground_input_mode"
+    )
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        max_words = st.slider("Maximum number of words", 50, 500, 200)
+        background_color = st.color_picker("Background color", "#FFFFFF")
+
+    with col2:
+        colormap = st.selectbox(
+            "Color scheme",
+            ["viridis", "plasma", "inferno", "magma", "cividis"]
+        )
+        width = st.slider("Width", 400, 1200, 800)
+
+    if input_mode == "Paste text":
+        show_text_mode(max_words, colormap, width, background_color)
+    else:
+        show_corpus_mode(max_words, colormap, width, background_color)
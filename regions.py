@@ -0,0 +1,240 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from cache_registry import observed_cache
+from data_sources import get_source_spec, open_source
+from map_tab import get_country_code, mbti_types, temperament_groups, variant_columns
+
+GEO_DIR = os.environ.get('MBTI_GEO_DIR', 'data/geo')
+MAP_WIDTH_PX = 800
+
+# (simplification tolerance in degrees, decimals kept) per zoom level, coarsest first
+zoom_levels = [(0.05, 2), (0.01, 3), (0.002, 4)]
+
+temperament_names = list(temperament_groups)
+type_temperament_index = np.array([temperament_names.index(t) for t in temperament_names for _ in temperament_groups[t]])
+
+
+def get_geometry_path(country_code, level, geo_dir=GEO_DIR):
+    return os.path.join(geo_dir, country_code, f'z{level}.json')
+
+
+def get_geo_index_path(geo_dir=GEO_DIR):
+    return os.path.join(geo_dir, 'index.json')
+
+
+def _segment_distances(points, start, end):
+    if np.allclose(start, end):
+        return np.hypot(*(points - start).T)
+    direction = end - start
+    offsets = points - start
+    return np.abs(direction[0] * offsets[:, 1] - direction[1] * offsets[:, 0]) / np.hypot(*direction)
+
+
+def simplify_line(points, tolerance):
+    # Iterative Douglas-Peucker; closed rings keep their first and last point
+    keep = np.zeros(len(points), dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        distances = _segment_distances(points[first + 1:last], points[first], points[last])
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            split = first + 1 + index
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return points[keep]
+
+
+def quantize_ring(points, decimals):
+    points = np.round(points, decimals)
+    changed = np.any(np.diff(points, axis=0) != 0, axis=1)
+    return points[np.concatenate([[True], changed])]
+
+
+def simplify_polygon(rings, tolerance, decimals):
+    simplified = []
+    for i, ring in enumerate(rings):
+        points = quantize_ring(simplify_line(np.asarray(ring, dtype=np.float64), tolerance), decimals)
+        if len(points) < 4:
+            if i == 0:
+                return None
+            continue
+        simplified.append(points.tolist())
+    return simplified
+
+
+def simplify_geometry(geometry, tolerance, decimals):
+    polygons = [geometry['coordinates']] if geometry['type'] == 'Polygon' else geometry['coordinates']
+    simplified = [p for p in (simplify_polygon(rings, tolerance, decimals) for rings in polygons) if p]
+    if not simplified:
+        # Keep tiny regions visible at coarse zoom rather than dropping them
+        return simplify_geometry(geometry, tolerance / 10, decimals + 1) if decimals < 6 else None
+    if len(simplified) == 1:
+        return {'type': 'Polygon', 'coordinates': simplified[0]}
+    return {'type': 'MultiPolygon', 'coordinates': simplified}
+
+
+def _geometry_bbox(geometry):
+    polygons = [geometry['coordinates']] if geometry['type'] == 'Polygon' else geometry['coordinates']
+    points = np.concatenate([np.asarray(rings[0], dtype=np.float64) for rings in polygons])
+    return points.min(axis=0), points.max(axis=0)
+
+
+def build_region_geometry(geojson_path, geo_dir=GEO_DIR, country_prop='shapeGroup', id_prop='shapeName'):
+    start = time.perf_counter()
+    with open(geojson_path, 'r', encoding='utf-8') as f:
+        features = json.load(f)['features']
+
+    by_country = {}
+    for feature in features:
+        props = feature.get('properties') or {}
+        if not feature.get('geometry') or feature['geometry']['type'] not in ('Polygon', 'MultiPolygon'):
+            continue
+        country = str(props.get(country_prop, ''))
+        code = country if len(country) == 3 and country.isupper() else get_country_code(country)
+        if code:
+            by_country.setdefault(code, []).append((str(props.get(id_prop)), feature['geometry']))
+
+    index = {}
+    for code, regions in by_country.items():
+        bounds = [_geometry_bbox(geometry) for _, geometry in regions]
+        low = np.min([b[0] for b in bounds], axis=0)
+        high = np.max([b[1] for b in bounds], axis=0)
+        sizes = []
+
+        for level, (tolerance, decimals) in enumerate(zoom_levels):
+            level_features = []
+            for region_id, geometry in regions:
+                simplified = simplify_geometry(geometry, tolerance, decimals)
+                if simplified:
+                    level_features.append({'type': 'Feature', 'id': region_id, 'geometry': simplified})
+
+            path = get_geometry_path(code, level, geo_dir)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'type': 'FeatureCollection', 'features': level_features}, f, separators=(',', ':'))
+            sizes.append(os.path.getsize(path))
+
+        index[code] = {
+            'bbox': [round(float(v), 4) for v in (*low, *high)],
+            'regions': len(regions),
+            'bytes': sizes
+        }
+
+    with open(get_geo_index_path(geo_dir), 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=1)
+
+    source_size = os.path.getsize(geojson_path)
+    print(f"Simplified {len(features)} regions in {len(index)} countries in {time.perf_counter() - start:.1f}s")
+    for code, entry in sorted(index.items()):
+        print(f"  {code}: {entry['regions']} regions, " + ", ".join(f"z{i} {b / 1024:.0f} KB" for i, b in enumerate(entry['bytes'])))
+    print(f"Source {source_size / 1024 / 1024:.1f} MB, written to {geo_dir}")
+    return index
+
+
+def pick_zoom_level(bbox, map_width_px=MAP_WIDTH_PX):
+    # Use the coarsest level whose tolerance stays under about two screen pixels once zoomed to the country
+    extent = max(bbox[2] - bbox[0], bbox[3] - bbox[1])
+    pixel = extent / map_width_px
+    for level, (tolerance, _) in enumerate(zoom_levels):
+        if tolerance <= 2 * pixel:
+            return level
+    return len(zoom_levels) - 1
+
+
+@observed_cache(st.cache_resource)
+def load_geo_index(geo_dir=GEO_DIR):
+    path = get_geo_index_path(geo_dir)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+@observed_cache(st.cache_resource)
+def load_region_geometry(country_code, level, geo_dir=GEO_DIR):
+    path = get_geometry_path(country_code, level, geo_dir)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def process_regions_df(regions_df):
+    if regions_df.empty:
+        return pd.DataFrame()
+
+    values = np.nan_to_num(regions_df.reindex(columns=variant_columns).to_numpy(dtype=np.float64))
+    totals = values.sum(axis=1)
+    valid = totals > 0
+    regions_df, values, totals = regions_df[valid], values[valid], totals[valid]
+
+    shares = values / totals[:, None] * 100
+    types = shares.reshape(len(shares), len(mbti_types), 2).sum(axis=2)
+    temperaments = np.stack([types[:, type_temperament_index == i].sum(axis=1) for i in range(len(temperament_names))], axis=1)
+
+    codes = {c: get_country_code(c) for c in regions_df['Country'].unique()}
+    result = pd.DataFrame({
+        'country': regions_df['Country'].to_numpy(),
+        'country_code': regions_df['Country'].map(codes).to_numpy(),
+        'region': regions_df['Region'].astype(str).to_numpy(),
+        'dominant_type': np.array(mbti_types)[types.argmax(axis=1)],
+        'dominant_temperament': np.array(temperament_names)[temperaments.argmax(axis=1)]
+    })
+    for i, t in enumerate(temperament_names):
+        result[f'temperament_{t.lower()}'] = temperaments[:, i]
+    result['variant_a'] = shares[:, 0::2].sum(axis=1)
+    result['variant_t'] = shares[:, 1::2].sum(axis=1)
+    for i, t in enumerate(mbti_types):
+        result[f'type_{t.lower()}'] = types[:, i]
+
+    return result[result['country_code'].notna()].reset_index(drop=True)
+
+
+@observed_cache()
+def load_region_data(regions_spec):
+    source = open_source(regions_spec)
+    if not source.exists():
+        return pd.DataFrame()
+    return process_regions_df(source.read(columns=['Country', 'Region'] + variant_columns))
+
+
+def get_country_regions(country, regions_spec=None, geo_dir=GEO_DIR):
+    regions_spec = regions_spec or get_source_spec('regions')
+    regions_df = load_region_data(regions_spec)
+    if regions_df.empty:
+        return None, None, None
+
+    country_df = regions_df[regions_df['country'] == country]
+    if country_df.empty:
+        return None, None, None
+
+    entry = load_geo_index(geo_dir).get(country_df['country_code'].iloc[0])
+    if not entry:
+        return None, None, None
+
+    # Only this country's geometry, at the detail its on-screen size needs
+    geojson = load_region_geometry(country_df['country_code'].iloc[0], pick_zoom_level(entry['bbox']), geo_dir)
+    return country_df, geojson, entry['bbox']
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simplify sub-national boundaries into per-country, per-zoom GeoJSON")
+    parser.add_argument('geojson', help="Full-resolution boundary GeoJSON, e.g. a geoBoundaries ADM1 file")
+    parser.add_argument('--output', default=GEO_DIR)
+    parser.add_argument('--country-prop', default='shapeGroup', help="Feature property with the ISO-3 code or country name")
+    parser.add_argument('--id-prop', default='shapeName', help="Feature property matched against the Region column")
+    args = parser.parse_args()
+
+    build_region_geometry(args.geojson, args.output, args.country_prop, args.id_prop)
@@ -1,6 +1,10 @@
+import json
 import os
 import shutil
-import pandas as pd
+import time
+
+from data_sources import get_source_spec
+from validate_data import print_report, report_messages, validate_source
 
 
 def setup_data_directory():
@@ -40,45 +44,57 @@ def setup_data_directory():
     return True
 
 
-def verify_csv_structure():
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    data_dir = os.path.join(script_dir, 'data')
-
-    countries_path = os.path.join(data_dir, 'countries.csv')
-    types_path = os.path.join(data_dir, 'types.csv')
-
-    if not os.path.exists(countries_path) or not os.path.exists(types_path):
-        print("Cannot verify CSV structure: Files not found")
-        return False
-
-    try:
-        countries_df = pd.read_csv(countries_path)
-        if 'Country' not in countries_df.columns:
-            print("Error: 'Country' column missing from countries.csv")
-            return False
-        mbti_cols = [col for col in countries_df.columns if '-' in col]
-        if len(mbti_cols) < 5:
-            print("Warning: countries.csv may not have the expected MBTI type columns")
-            print(f"Found columns: {countries_df.columns.tolist()}")
-    except Exception as e:
-        print(f"Error verifying countries.csv: {str(e)}")
-        return False
-
+def validate_sources(countries_spec, types_spec):
+    return {
+        'countries': validate_source(countries_spec, 'countries'),
+        'types': validate_source(types_spec, 'types')
+    }
+
+
+def run_startup_checks(manifest_path=None):
+    from incremental import CACHE_DIR
+    from show_nlp_data import missing_nlp_assets
+
+    start = time.perf_counter()
+    setup_ok = setup_data_directory()
+    # Reports are cached by file hash, so restarts only re-scan files that changed
+    reports = validate_sources(get_source_spec('countries'), get_source_spec('types'))
+    errors = [m for report in reports.values() for m in report_messages(report, 'error')]
+    warnings = [m for report in reports.values() for m in report_messages(report, 'warning')]
+    if not setup_ok and not errors:
+        errors.append("Data directory setup failed")
+
+    manifest = {
+        'pid': os.getpid(),
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'degraded': bool(errors),
+        'errors': errors,
+        'warnings': warnings,
+        'validation': {
+            name: {'status': report['status'], 'sha1': report['sha1'], 'cached': report.get('cached', False)}
+            for name, report in reports.items()
+        },
+        'missing_nlp_assets': missing_nlp_assets(),
+    }
+    manifest['seconds'] = round(time.perf_counter() - start, 4)
+
+    manifest_path = manifest_path or os.path.join(CACHE_DIR, 'startup_manifest.json')
     try:
-        types_df = pd.read_csv(types_path)
-        required_cols = ['Type', 'Description', 'Nickname']
-        missing_cols = [col for col in required_cols if col not in types_df.columns]
-        if missing_cols:
-            print(f"Warning: Missing columns in types.csv: {', '.join(missing_cols)}")
-            print(f"Found columns: {types_df.columns.tolist()}")
-    except Exception as e:
-        print(f"Error verifying types.csv: {str(e)}")
-        return False
+        os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+    except OSError as e:
+        print(f"Could not write startup manifest: {str(e)}")
 
-    print("CSV structure verification passed")
-    return True
+    status = "DEGRADED" if manifest['degraded'] else "ok"
+    print(f"Startup checks {status} in {manifest['seconds']}s")
+    for message in errors + warnings:
+        print(f"  {message}")
+    return manifest
 
 
 if __name__ == "__main__":
     if setup_data_directory():
-        verify_csv_structure()
+        reports = validate_sources(get_source_spec('countries'), get_source_spec('types'))
+        for report in reports.values():
+            print_report(report)
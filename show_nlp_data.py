@@ -1,6 +1,78 @@
+import os
+
 import streamlit as st
 
-def show_nlp_data():
+from cache_registry import get_cache_stats
+from instrumentation import timer
+
+NLP_IMAGE_WIDTH = 1000
+
+nlp_assets = [
+    'data/NLP/mbti_distribution.html',
+    'data/NLP/Text Length Distribution by MBTI Type.png',
+    'data/NLP/TF-IDF Weighted WordClouds by MBTI Type.png',
+    'data/NLP/2D PCA of Balanced BERT Embeddings Grouped by MBTI Cognitive Types.png',
+    'data/NLP/Cluster Analysis Overview.png',
+    'data/NLP/mbti_sentiment_score_distribution.html'
+]
+
+
+def missing_nlp_assets():
+    return [path for path in nlp_assets if not os.path.exists(path)]
+
+
+def get_image_variant_path(path, width=NLP_IMAGE_WIDTH):
+    from incremental import CACHE_DIR
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(CACHE_DIR, 'nlp', f'{name}_{width}.png')
+
+
+def build_image_variant(path, width=NLP_IMAGE_WIDTH):
+    from PIL import Image
+
+    variant_path = get_image_variant_path(path, width)
+    os.makedirs(os.path.dirname(variant_path), exist_ok=True)
+    with Image.open(path) as image:
+        if image.width > width:
+            image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+        tmp_path = f"{variant_path}.tmp"
+        image.save(tmp_path, format='PNG', optimize=True)
+    os.replace(tmp_path, variant_path)
+    return variant_path
+
+
+def nlp_image(path):
+    # Prefer the downscaled copy from warm_cache.py while it is newer than the source image
+    variant_path = get_image_variant_path(path)
+    stats = get_cache_stats('nlp.image_variants')
+    if os.path.exists(variant_path) and os.path.getmtime(variant_path) >= os.path.getmtime(path):
+        stats.hit()
+        return variant_path
+    stats.miss()
+    return path
+
+
+def show_nlp_html(path, missing_assets=()):
+    if path in missing_assets:
+        st.info(f"{os.path.basename(path)} is not available in this deployment")
+        return
+    with timer('nlp_asset', os.path.basename(path)):
+        st.components.v1.html(
+            f"<div style='width: 900px;'>{open(path, 'r', encoding='utf-8').read()}</div>",
+            height=400,
+            scrolling=True
+        )
+
+
+def show_nlp_image(path, missing_assets=()):
+    if path in missing_assets:
+        st.info(f"{os.path.basename(path)} is not available in this deployment")
+        return
+    with timer('nlp_asset', os.path.basename(path)):
+        st.image(nlp_image(path), width='stretch')
+
+
+def show_nlp_data(missing_assets=()):
     st.title("NLP Analysis of MBTI Personality Types")
 
     col1, col2 = st.columns(2)
@@ -8,41 +80,33 @@ def show_nlp_data():
     with col1:
         st.markdown("<h3>1. MBTI Personality Type Distribution</h3>", unsafe_allow_html=True)
         st.markdown("<hr>", unsafe_allow_html=True)
-        st.components.v1.html(
-            f"<div style='width: 900px;'>{open('data/NLP/mbti_distribution.html', 'r', encoding='utf-8').read()}</div>",
-            height=400,
-            scrolling=True
-        )
+        show_nlp_html("data/NLP/mbti_distribution.html", missing_assets)
 
     with col2:
         st.markdown("<h3>2. Text Length Distribution by MBTI Type</h3>", unsafe_allow_html=True)
         st.markdown("<hr>", unsafe_allow_html=True)
-        st.image("data/NLP/Text Length Distribution by MBTI Type.png", use_column_width=True)
+        show_nlp_image("data/NLP/Text Length Distribution by MBTI Type.png", missing_assets)
 
     col3, col4 = st.columns(2)
 
     with col3:
         st.markdown("<h3>3. TF-IDF Weighted WordClouds by MBTI Type</h3>", unsafe_allow_html=True)
         st.markdown("<hr>", unsafe_allow_html=True)
-        st.image("data/NLP/TF-IDF Weighted WordClouds by MBTI Type.png", use_column_width=True)
+        show_nlp_image("data/NLP/TF-IDF Weighted WordClouds by MBTI Type.png", missing_assets)
 
     with col4:
         st.markdown("<h3>4. 2D PCA of Balanced BERT Embeddings Grouped by MBTI Cognitive Types</h3>", unsafe_allow_html=True)
         st.markdown("<hr>", unsafe_allow_html=True)
-        st.image("data/NLP/2D PCA of Balanced BERT Embeddings Grouped by MBTI Cognitive Types.png", use_column_width=True)
+        show_nlp_image("data/NLP/2D PCA of Balanced BERT Embeddings Grouped by MBTI Cognitive Types.png", missing_assets)
 
     col5, col6 = st.columns(2)
 
     with col5:
         st.markdown("<h3>5. Cluster Analysis Overview</h3>", unsafe_allow_html=True)
         st.markdown("<hr>", unsafe_allow_html=True)
-        st.image("data/NLP/Cluster Analysis Overview.png", use_column_width=True)
+        show_nlp_image("data/NLP/Cluster Analysis Overview.png", missing_assets)
 
     with col6:
         st.markdown("<h3>6. MBTI Sentiment Score Distribution</h3>", unsafe_allow_html=True)
         st.markdown("<hr>", unsafe_allow_html=True)
-        st.components.v1.html(
-            f"<div style='width: 900px;'>{open('data/NLP/mbti_sentiment_score_distribution.html', 'r', encoding='utf-8').read()}</div>",
-            height=400,
-            scrolling=True
-        )
+        show_nlp_html("data/NLP/mbti_sentiment_score_distribution.html", missing_assets)
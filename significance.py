@@ -0,0 +1,217 @@
+import hashlib
+import math
+import os
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from cache_registry import observed_cache
+from instrumentation import timed
+from map_tab import mbti_types, temperament_groups
+
+SIGNIFICANCE_METHOD = os.environ.get('MBTI_SIGNIFICANCE_METHOD', 'bootstrap')
+BOOTSTRAP_RESAMPLES = int(os.environ.get('MBTI_BOOTSTRAP_RESAMPLES', '5000'))
+# Opt-in only: countries without a country_counts.csv entry are tested as if this many people answered.
+# Unset, they get their raw differences but no intervals or significance flags, since n is unknown.
+ASSUMED_SAMPLE_SIZE = int(os.environ.get('MBTI_ASSUMED_SAMPLE_SIZE') or 0) or None
+SIGNIFICANCE_ALPHA = 0.05
+P_VALUE_CORRECTION = 'holm'
+
+trait_letters = {'Extraversion': (0, 'E'), 'Intuition': (1, 'N'), 'Thinking': (2, 'T'), 'Judging': (3, 'J')}
+
+erfc = np.vectorize(math.erfc, otypes=[np.float64])
+
+
+def category_matrix(feature_type):
+    # Every comparison is a linear roll-up of the 16 type shares: types x categories
+    if feature_type == 'temperament':
+        labels = list(temperament_groups)
+        matrix = np.array([[float(t in temperament_groups[g]) for g in labels] for t in mbti_types])
+    elif feature_type == 'personality_traits':
+        labels = list(trait_letters)
+        matrix = np.array([[float(t[i] == letter) for i, letter in trait_letters.values()] for t in mbti_types])
+    else:
+        labels = list(mbti_types)
+        matrix = np.eye(len(mbti_types))
+    return labels, matrix
+
+
+def comparison_inputs(df, countries, global_stats):
+    rows = df[df['country'].isin(countries)].drop_duplicates('country')
+    type_cols = [f'type_{t.lower()}' for t in mbti_types]
+    shares = np.nan_to_num(rows.reindex(columns=type_cols).to_numpy(dtype=np.float64))
+    totals = shares.sum(axis=1, keepdims=True)
+    shares = np.divide(shares, totals, out=np.zeros_like(shares), where=totals > 0)
+
+    if 'sample_size' in rows.columns:
+        sizes = rows['sample_size'].to_numpy(dtype=np.float64)
+    else:
+        sizes = np.full(len(rows), np.nan)
+    assumed = ~(sizes > 0)
+    if ASSUMED_SAMPLE_SIZE:
+        sizes = np.where(assumed, ASSUMED_SAMPLE_SIZE, sizes)
+    else:
+        assumed = np.zeros(len(sizes), dtype=bool)
+    sizes = np.nan_to_num(np.where(sizes > 0, sizes, 0)).astype(np.int64)
+
+    reference = np.array([global_stats['types'].get(t, 0.0) for t in mbti_types], dtype=np.float64)
+    reference = reference / reference.sum() if reference.sum() > 0 else reference
+    return rows['country'].tolist(), shares, sizes, assumed, reference
+
+
+def comparison_version(df, countries, global_stats):
+    # Filtered data (year, minimum n) has no dataset version, so the selected rows themselves are the key
+    countries, shares, sizes, _, reference = comparison_inputs(df, countries, global_stats)
+    digest = hashlib.sha1(repr(countries).encode('utf-8'))
+    for array in (shares, sizes, reference):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def bootstrap_differences(shares, sizes, reference, matrix, resamples, rng):
+    # One multinomial draw per (resample, country): resamples x countries x types, no Python loop
+    counts = rng.multinomial(sizes, shares, size=(resamples, len(sizes)))
+    boot_shares = counts / sizes[None, :, None]
+    return (boot_shares @ matrix - reference @ matrix) * 100
+
+
+def bootstrap_tests(shares, sizes, reference, matrix, resamples, alpha, rng):
+    differences = (shares @ matrix - reference @ matrix) * 100
+    boot = bootstrap_differences(shares, sizes, reference, matrix, resamples, rng)
+    low, high = np.percentile(boot, [alpha / 2 * 100, (1 - alpha / 2) * 100], axis=0)
+    # Two-sided p-value from how often the resampled difference lands on the other side of zero
+    below = (boot <= 0).sum(axis=0)
+    above = (boot >= 0).sum(axis=0)
+    p_values = np.minimum(1.0, 2 * (np.minimum(below, above) + 1) / (resamples + 1))
+    return differences, low, high, p_values
+
+
+def analytic_tests(shares, sizes, reference, matrix, alpha):
+    grouped = shares @ matrix
+    differences = (grouped - reference @ matrix) * 100
+    se = np.sqrt(grouped * (1 - grouped) / sizes[:, None]) * 100
+    z_crit = NormalDist().inv_cdf(1 - alpha / 2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z = np.where(se > 0, differences / se, np.where(differences == 0, 0.0, np.inf))
+    p_values = erfc(np.abs(z) / math.sqrt(2))
+    return differences, differences - z_crit * se, differences + z_crit * se, p_values
+
+
+def adjust_p_values(p_values, correction=P_VALUE_CORRECTION):
+    flat = np.asarray(p_values, dtype=np.float64).ravel()
+    m = len(flat)
+    if m == 0 or correction == 'none':
+        return np.asarray(p_values, dtype=np.float64)
+
+    order = np.argsort(flat)
+    ranked = flat[order]
+    if correction == 'holm':
+        adjusted = np.maximum.accumulate(np.minimum(1.0, ranked * (m - np.arange(m))))
+    elif correction == 'fdr_bh':
+        adjusted = np.minimum.accumulate((ranked * m / np.arange(1, m + 1))[::-1])[::-1]
+        adjusted = np.minimum(adjusted, 1.0)
+    else:
+        raise ValueError(f"Unknown p-value correction: {correction}")
+
+    result = np.empty(m)
+    result[order] = adjusted
+    return result.reshape(np.shape(p_values))
+
+
+@timed('compare_to_global')
+def compare_to_global(df, countries, global_stats, feature_type='temperament', method=SIGNIFICANCE_METHOD,
+                      resamples=BOOTSTRAP_RESAMPLES, alpha=SIGNIFICANCE_ALPHA, correction=P_VALUE_CORRECTION, seed=0):
+    names, shares, sizes, assumed, reference = comparison_inputs(df, countries, global_stats)
+    labels, matrix = category_matrix(feature_type)
+    if not names:
+        return pd.DataFrame()
+    if method not in ('bootstrap', 'analytic'):
+        raise ValueError(f"Unknown significance method: {method}")
+
+    grouped = shares @ matrix * 100
+    differences = grouped - reference @ matrix * 100
+    # Without a respondent count there is no sampling error to test against; those rows keep only the difference
+    tested = sizes > 0
+    shape = (len(names), len(labels))
+    low, high, p_values, adjusted = (np.full(shape, np.nan) for _ in range(4))
+    if tested.any():
+        if method == 'bootstrap':
+            rng = np.random.default_rng(seed)
+            _, low[tested], high[tested], p_values[tested] = bootstrap_tests(
+                shares[tested], sizes[tested], reference, matrix, resamples, alpha, rng)
+        else:
+            _, low[tested], high[tested], p_values[tested] = analytic_tests(
+                shares[tested], sizes[tested], reference, matrix, alpha)
+        # Every tested country x category cell is one test, so the correction runs over the whole grid
+        adjusted[tested] = adjust_p_values(p_values[tested], correction)
+    return pd.DataFrame({
+        'country': np.repeat(names, len(labels)),
+        'category': np.tile(labels, len(names)),
+        'share': grouped.ravel(),
+        'global': np.tile(reference @ matrix * 100, len(names)),
+        'difference': differences.ravel(),
+        'ci_low': low.ravel(),
+        'ci_high': high.ravel(),
+        'p_value': p_values.ravel(),
+        'p_adjusted': adjusted.ravel(),
+        'significant': adjusted.ravel() < alpha,
+        'tested': np.repeat(tested, len(labels)),
+        'sample_size': np.repeat(np.where(tested, sizes, np.nan), len(labels)),
+        'assumed_sample_size': np.repeat(assumed, len(labels))
+    })
+
+
+@observed_cache(max_entries=64)
+def _cached_comparison(version, countries, feature_type, method, resamples, reference, _df, _global_stats):
+    seed = int(hashlib.sha1(f"{version}:{countries}:{feature_type}".encode('utf-8')).hexdigest()[:8], 16)
+    return compare_to_global(_df, list(countries), _global_stats, feature_type, method, resamples, seed=seed)
+
+
+def country_significance(df, countries, feature_type, global_stats, version=None, reference="Global Average"):
+    countries = tuple(sorted(c for c in countries if not c.startswith("Global Average")))
+    if df is None or not countries or not global_stats:
+        return None
+    # The frame and global stats are left out of the cache key; the dataset version and reference name stand in
+    version = version or comparison_version(df, countries, global_stats)
+    return _cached_comparison(version, countries, feature_type, SIGNIFICANCE_METHOD, BOOTSTRAP_RESAMPLES, reference,
+                              df, global_stats)
+
+
+def show_significance_table(significance, reference="Global Average"):
+    if significance is None or significance.empty:
+        return
+
+    with st.expander(f"Differences from the {reference}", expanded=False):
+        tested = significance['tested']
+        table = pd.DataFrame({
+            'Country': significance['country'],
+            'Category': significance['category'],
+            'Share (%)': significance['share'].round(1),
+            'Global (%)': significance['global'].round(1),
+            'Difference (pts)': significance['difference'].round(2)
+        })
+        if tested.any():
+            table[f'{1 - SIGNIFICANCE_ALPHA:.0%} CI'] = [
+                f"[{lo:+.2f}, {hi:+.2f}]" if t else "" for lo, hi, t in
+                zip(significance['ci_low'], significance['ci_high'], tested)
+            ]
+            table['p (adjusted)'] = [f"{p:.4f}" if t else "" for p, t in zip(significance['p_adjusted'], tested)]
+            table['Significant'] = significance['significant'].map(lambda s: "✓" if s else "")
+        st.dataframe(table, hide_index=True, width='stretch')
+
+        if tested.any():
+            method = (f"{BOOTSTRAP_RESAMPLES:,} multinomial bootstrap resamples" if SIGNIFICANCE_METHOD == 'bootstrap'
+                      else "normal approximation")
+            st.caption(f"{method}, {P_VALUE_CORRECTION.title()}-corrected across all {int(tested.sum())} tests at "
+                       f"α = {SIGNIFICANCE_ALPHA}. The {reference} is treated as a fixed reference.")
+        untested = sorted(significance.loc[~tested, 'country'].unique())
+        if untested:
+            st.caption(f"No respondent counts for {', '.join(untested)}, so these are raw differences without "
+                       f"confidence intervals or significance. Add `data/country_counts.csv` (written by `ingest.py`) "
+                       f"to test them.")
+        assumed = sorted(significance.loc[significance['assumed_sample_size'], 'country'].unique())
+        if assumed:
+            st.caption(f"No sample size on record for {', '.join(assumed)}; "
+                       f"tested as if {ASSUMED_SAMPLE_SIZE:,} people answered (MBTI_ASSUMED_SAMPLE_SIZE).")
@@ -0,0 +1,122 @@
+const config = {displayModeBar: false, responsive: true};
+const cache = {};
+
+async function getJSON(path) {
+  if (!(path in cache)) cache[path] = fetch(path).then(r => r.json());
+  return cache[path];
+}
+
+async function plotFigure(elementId, path) {
+  const fig = await getJSON(path);
+  Plotly.react(elementId, fig.data, fig.layout, config);
+}
+
+function showView(name) {
+  document.querySelectorAll('nav button').forEach(b => b.classList.toggle('active', b.dataset.view === name));
+  document.querySelectorAll('.view').forEach(v => v.classList.toggle('active', v.id === 'view-' + name));
+  window.dispatchEvent(new Event('resize'));
+}
+
+function radioValue(name) {
+  return document.querySelector(`input[name="${name}"]:checked`).value;
+}
+
+async function showCountry(country) {
+  const [data, types] = [await getJSON('data/countries.json'), await getJSON('data/types.json')];
+  const row = data.countries.find(c => c.country === country);
+  if (!row) return;
+  const info = types[row.dominant_type] || {};
+  document.getElementById('country-type').innerHTML =
+    `<h2 style="text-align:center;color:${data.type_colors[row.dominant_type] || '#808080'}">${row.dominant_type}</h2>` +
+    (info.nickname ? `<p style="text-align:center"><i>${info.nickname}</i></p><p>${info.description}</p>` : '');
+  document.getElementById('country-variants').innerHTML =
+    `<div style="font-size:1.8rem;color:${data.variant_colors.A}">Assertive: ${row.variant_a.toFixed(1)}%</div>` +
+    `<div style="font-size:1.8rem;color:${data.variant_colors.T}">Turbulent: ${row.variant_t.toFixed(1)}%</div>`;
+  plotFigure('country-pie', `figures/countries/${row.slug}.json`);
+}
+
+// The comparison figures hold every country and are drawn by analysis_tab.create_country_comparison;
+// a selection only keeps the traces, or the heatmap cells, that belong to the chosen countries
+function selectCountries(fig, selected, countryNames) {
+  const keep = new Set(selected);
+  const data = [];
+  let shownRows = 0;
+  let allRows = 0;
+  for (const trace of fig.data) {
+    if (keep.has(trace.name)) {
+      data.push(trace);
+    } else if (Array.isArray(trace.y) && typeof trace.y[0] === 'string') {
+      const rows = trace.y.map(y => keep.has(y));
+      const cells = {...trace};
+      for (const [key, value] of Object.entries(trace)) {
+        if (Array.isArray(value) && value.length === rows.length) cells[key] = value.filter((_, i) => rows[i]);
+      }
+      const countries = values => new Set(values.filter(y => countryNames.has(y))).size;
+      allRows += countries(trace.y);
+      shownRows += countries(cells.y);
+      if (cells.y.length) data.push(cells);
+    }
+  }
+  const layout = {...fig.layout};
+  if (layout.meta && layout.meta.row_height) layout.height -= (allRows - shownRows) * layout.meta.row_height;
+  return {data, layout};
+}
+
+async function updateComparison() {
+  const data = await getJSON('data/countries.json');
+  const selected = Array.from(document.getElementById('compare-countries').selectedOptions).map(o => o.value);
+  const featureType = document.getElementById('compare-type').value;
+  const full = await getJSON(`figures/comparison_${featureType}.json`);
+  const fig = selectCountries(full, selected, new Set(data.countries.map(c => c.country)));
+  Plotly.react('comparison-chart', fig.data, fig.layout, config);
+  document.getElementById('temperament-notes').innerHTML = featureType === 'temperament'
+    ? Object.entries(data.temperament_descriptions).map(([t, d]) =>
+        `<p style="padding-left:10px;border-left:4px solid ${data.temperament_colors[t]}">${d.replace(/\*\*(.+?)\*\*/g, '<b>$1</b>')}</p>`).join('')
+    : '';
+}
+
+function updateAnalysis() {
+  const view = radioValue('analysis');
+  for (const name of ['comparison', 'correlation', 'regional']) {
+    document.getElementById('analysis-' + name).hidden = name !== view;
+  }
+  if (view === 'comparison') updateComparison();
+  if (view === 'correlation') plotFigure('correlation-chart', `figures/${radioValue('correlation')}.json`);
+  if (view === 'regional') plotFigure('regional-chart', 'figures/regional_analysis.json');
+}
+
+async function init() {
+  const data = await getJSON('data/countries.json');
+  const names = data.countries.map(c => c.country).sort();
+
+  const countrySelect = document.getElementById('country-select');
+  countrySelect.innerHTML = names.map(n => `<option>${n}</option>`).join('');
+  countrySelect.addEventListener('change', () => showCountry(countrySelect.value));
+
+  const compare = document.getElementById('compare-countries');
+  compare.innerHTML = ['Global Average'].concat(names).map(n =>
+    `<option ${['United States', 'Japan', 'Global Average'].includes(n) ? 'selected' : ''}>${n}</option>`).join('');
+  compare.addEventListener('change', updateComparison);
+  document.getElementById('compare-type').addEventListener('change', updateComparison);
+
+  document.querySelectorAll('nav button').forEach(b => b.addEventListener('click', () => showView(b.dataset.view)));
+  document.querySelectorAll('input[name="map-mode"]').forEach(i => i.addEventListener('change', () =>
+    plotFigure('world-map', `figures/world_map_${radioValue('map-mode')}.json`)));
+  document.querySelectorAll('input[name="analysis"], input[name="correlation"]').forEach(i =>
+    i.addEventListener('change', updateAnalysis));
+
+  await plotFigure('world-map', `figures/world_map_${radioValue('map-mode')}.json`);
+  document.getElementById('world-map').on('plotly_click', e => {
+    const country = e.points[0].hovertext;
+    if (country) { countrySelect.value = country; showCountry(country); }
+  });
+  showCountry(countrySelect.value);
+  updateAnalysis();
+
+  document.getElementById('nlp-grid').innerHTML = data.nlp.map(a =>
+    `<div><h3>${a.title}</h3><hr>` + (a.path.endsWith('.html')
+      ? `<iframe src="${encodeURI(a.path)}" height="400" loading="lazy"></iframe>`
+      : `<img src="${encodeURI(a.path)}" alt="${a.title}" loading="lazy">`) + '</div>').join('');
+}
+
+init();
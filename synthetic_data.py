@@ -0,0 +1,119 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from incremental import CACHE_DIR
+from map_tab import get_country_code, mbti_types, variant_colors, variant_columns
+
+BASE_COUNTRIES_PATH = 'data/countries.csv'
+SYNTHETIC_DIR = os.path.join(CACHE_DIR, 'benchmarks', 'data')
+RESPONDENT_CHUNK_ROWS = 500_000
+# Lower concentration means synthetic regions stray further from their base country
+DIRICHLET_CONCENTRATION = 400
+
+
+def load_base_countries(base_path=BASE_COUNTRIES_PATH):
+    base = pd.read_csv(base_path)
+    base = base[['Country'] + variant_columns].dropna()
+    codes = {c: get_country_code(c) for c in base['Country']}
+    return base[base['Country'].map(codes).notna()].reset_index(drop=True), codes
+
+
+def generate_countries(n_regions, seed=0, base_path=BASE_COUNTRIES_PATH):
+    rng = np.random.default_rng(seed)
+    base, codes = load_base_countries(base_path)
+    values = base[variant_columns].to_numpy(dtype=np.float64)
+    values = values / values.sum(axis=1, keepdims=True)
+
+    if n_regions <= len(base):
+        picks = np.arange(n_regions)
+        names = base['Country'].iloc[picks].tolist()
+    else:
+        # Every real country first, then numbered regions sampled from them
+        picks = np.concatenate([np.arange(len(base)), rng.integers(0, len(base), n_regions - len(base))])
+        names = base['Country'].tolist() + [
+            f"{base['Country'].iloc[p]} {i:06d}" for i, p in enumerate(picks[len(base):], start=1)
+        ]
+
+    shares = np.vstack([rng.dirichlet(values[p] * DIRICHLET_CONCENTRATION + 1e-3) for p in picks])
+    shares[:len(base)] = values[picks[:len(base)]]
+    df = pd.DataFrame(shares.round(6), columns=variant_columns)
+    df.insert(0, 'Country', names)
+
+    # Numbered regions resolve to their base country, so the code lookup never has to fuzzy-search them
+    region_codes = {name: codes[base['Country'].iloc[p]] for name, p in zip(names, picks)}
+    return df, region_codes
+
+
+def write_countries(output_dir, n_regions, seed=0, base_path=BASE_COUNTRIES_PATH):
+    df, codes = generate_countries(n_regions, seed, base_path)
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f'countries_{n_regions}.csv')
+    df.to_csv(path, index=False)
+    with open(os.path.join(output_dir, f'country_codes_{n_regions}.json'), 'w', encoding='utf-8') as f:
+        json.dump(codes, f)
+    return path
+
+
+def load_synthetic_codes(countries_path):
+    n_regions = os.path.splitext(os.path.basename(countries_path))[0].split('_')[-1]
+    path = os.path.join(os.path.dirname(countries_path), f'country_codes_{n_regions}.json')
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_respondents(output_dir, n_rows, seed=0, base_path=BASE_COUNTRIES_PATH, chunk_rows=RESPONDENT_CHUNK_ROWS):
+    rng = np.random.default_rng(seed)
+    base, _ = load_base_countries(base_path)
+    countries = base['Country'].to_numpy()
+    probabilities = base[variant_columns].to_numpy(dtype=np.float64)
+    probabilities = probabilities / probabilities.sum(axis=1, keepdims=True)
+    cumulative = probabilities.cumsum(axis=1)
+
+    type_names = np.repeat(np.array(mbti_types), len(variant_colors))
+    variant_names = np.tile(np.array(list(variant_colors)), len(mbti_types))
+
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f'respondents_{n_rows}.csv')
+    tmp_path = f"{path}.tmp"
+    written = 0
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        f.write('country,type,variant\n')
+        while written < n_rows:
+            rows = min(chunk_rows, n_rows - written)
+            country_idx = rng.integers(0, len(countries), rows)
+            # Inverse-CDF sampling of each respondent's type-variant from their country's distribution
+            draws = rng.random(rows)[:, None]
+            keys = np.minimum((draws > cumulative[country_idx]).sum(axis=1), len(variant_columns) - 1)
+            pd.DataFrame({
+                'country': countries[country_idx],
+                'type': type_names[keys],
+                'variant': variant_names[keys]
+            }).to_csv(f, header=False, index=False)
+            written += rows
+    os.replace(tmp_path, path)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic countries.csv-shaped and respondent-level data")
+    parser.add_argument('--output', default=SYNTHETIC_DIR)
+    parser.add_argument('--regions', type=int, nargs='*', default=[158, 5000, 100_000])
+    parser.add_argument('--respondents', type=int, nargs='*', default=[1_000_000])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    for n in args.regions:
+        start = time.perf_counter()
+        path = write_countries(args.output, n, args.seed)
+        print(f"{path}: {n} regions in {time.perf_counter() - start:.1f}s")
+    for n in args.respondents:
+        start = time.perf_counter()
+        path = write_respondents(args.output, n, args.seed)
+        print(f"{path}: {n} respondents, {os.path.getsize(path) / 1024 / 1024:.0f} MB in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+COUNTRIES_PATH = os.path.join(ROOT, 'data', 'countries.csv')
+TYPES_PATH = os.path.join(ROOT, 'data', 'types.csv')
+
+
+@pytest.fixture(scope='session')
+def shipped_df():
+    from map_tab import load_and_process_data
+
+    df, _ = load_and_process_data(COUNTRIES_PATH, TYPES_PATH)
+    return df
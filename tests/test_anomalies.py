@@ -0,0 +1,65 @@
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+
+from anomalies import detect_outliers
+from conftest import COUNTRIES_PATH, ROOT, TYPES_PATH
+from map_tab import mbti_types
+
+type_cols = [f'type_{t.lower()}' for t in mbti_types]
+
+
+def multinomial_table(rng, shares, countries, respondents):
+    counts = rng.multinomial(respondents, shares, size=countries)
+    df = pd.DataFrame(counts / respondents * 100, columns=type_cols)
+    df.insert(0, 'country', [f'Country {i}' for i in range(countries)])
+    return df
+
+
+def test_clean_multinomial_data_flags_about_alpha(shipped_df):
+    rng = np.random.default_rng(0)
+    shares = shipped_df[type_cols].mean().to_numpy()
+    shares = shares / shares.sum()
+    alpha = 0.05
+
+    tables, countries = 40, 156
+    below, flagged = 0, 0
+    for _ in range(tables):
+        outliers = detect_outliers(multinomial_table(rng, shares, countries, 2000), alpha=alpha)
+        below += int((outliers['p_value'] < alpha).sum())
+        flagged += int(outliers['outlier'].sum())
+
+    # Uncorrected, about alpha * n countries per table fall below alpha
+    assert 0.75 * alpha * countries <= below / tables <= 1.25 * alpha * countries
+    # The Bonferroni cut-off keeps false flags to a small fraction of a country per table; the log-ratios of
+    # multinomial counts are a little skewed, so the far tail runs somewhat above alpha
+    assert flagged / tables <= 5 * alpha
+
+
+def test_shipped_data_has_no_outliers(shipped_df):
+    outliers = detect_outliers(shipped_df)
+    assert len(outliers) == len(shipped_df)
+    assert not outliers['outlier'].any()
+    assert outliers['p_value'].min() > 1e-6
+
+
+def test_fail_on_outliers_passes_on_shipped_data():
+    result = subprocess.run(
+        [sys.executable, 'anomalies.py', COUNTRIES_PATH, '--types', TYPES_PATH, '--fail-on-outliers'],
+        cwd=ROOT, capture_output=True, text=True, timeout=300
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert f"0 of {156} countries flagged" in result.stdout
+
+
+def test_missing_type_column_is_flagged(shipped_df):
+    df = shipped_df.copy()
+    row = df.index[df['country'] == 'Germany'][0]
+    df.loc[row, 'type_infj'] = 0.0
+
+    outliers = detect_outliers(df)
+    assert outliers.iloc[0]['country'] == 'Germany'
+    assert outliers.iloc[0]['outlier']
+    assert outliers['outlier'].sum() == 1
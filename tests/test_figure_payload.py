@@ -0,0 +1,85 @@
+import json
+
+import numpy as np
+import plotly.graph_objects as go
+import plotly.io as pio
+import pytest
+
+from figure_payload import decode_typed_array, display_decimals, minimize_spec, template_fields
+
+
+def arrays(trace):
+    found = {}
+    for key, value in trace.items():
+        if isinstance(value, dict) and 'bdata' in value:
+            found[key] = decode_typed_array(value)
+        elif isinstance(value, (list, tuple)):
+            found[key] = np.asarray(value)
+    return found
+
+
+def assert_round_trip(fig):
+    original = fig.to_dict()
+    minimized = go.Figure(minimize_spec(fig.to_dict()))
+    restored = minimized.to_dict()
+
+    assert len(restored['data']) == len(original['data'])
+    for before, after in zip(original['data'], restored['data']):
+        fields = template_fields(before)
+        after_arrays = arrays(after)
+        for key, values in arrays(before).items():
+            if key not in after_arrays:
+                # Only hover data that no template shows may be dropped
+                assert key in ('customdata', 'hovertext', 'text')
+                continue
+            restored_values = after_arrays[key]
+            assert restored_values.shape == values.shape, key
+            if values.dtype.kind not in 'iuf':
+                np.testing.assert_array_equal(restored_values, values)
+                continue
+            # Equal at the precision the figure displays them with
+            decimals = display_decimals(values.astype(np.float64), fields.get(key))
+            tolerance = 0.5 * 10.0 ** -decimals + np.abs(values) * 2.0 ** -23
+            gaps = np.isnan(values.astype(np.float64))
+            np.testing.assert_array_equal(np.isnan(restored_values.astype(np.float64)), gaps)
+            assert (np.abs(restored_values - values)[~gaps] <= tolerance[~gaps]).all(), key
+
+    assert len(pio.to_json(minimized, validate=False)) <= len(pio.to_json(fig, validate=False))
+    return restored
+
+
+def test_world_map_round_trip(shipped_df):
+    from map_tab import create_world_map
+
+    for color_by in ('dominant_temperament', 'dominant_type'):
+        assert_round_trip(create_world_map(shipped_df, color_by=color_by))
+
+
+def test_comparison_round_trip(shipped_df):
+    from analysis_tab import create_country_comparison
+
+    countries = ['United States', 'Japan', 'Brazil']
+    for feature_type in ('temperament', 'type_distribution', 'personality_traits'):
+        assert_round_trip(create_country_comparison(shipped_df, countries, feature_type, averages={}))
+
+
+def test_formatted_values_keep_their_display_precision():
+    z = np.random.default_rng(0).uniform(0, 100, (4, 5))
+    fig = go.Figure(go.Heatmap(z=z, texttemplate='%{z:.1f}%'))
+    restored = assert_round_trip(fig)
+    z_restored = decode_typed_array(restored['data'][0]['z'])
+    assert [[f'{v:.1f}' for v in row] for row in z_restored] == [[f'{v:.1f}' for v in row] for row in z]
+
+
+def test_whole_numbers_become_narrow_integers():
+    fig = go.Figure(go.Bar(x=['a', 'b', 'c'], y=[1.0, 2.0, 300.0]))
+    minimized = minimize_spec(fig.to_dict())
+    spec = json.loads(pio.to_json(go.Figure(minimized), validate=False))
+    assert spec['data'][0]['y']['dtype'] == 'i2'
+    np.testing.assert_array_equal(decode_typed_array(spec['data'][0]['y']), [1, 2, 300])
+
+
+@pytest.mark.parametrize('values', [[0.123456789, 1.5], [np.nan, 2.0, 3.0]])
+def test_unformatted_values_keep_significant_digits(values):
+    fig = go.Figure(go.Scatter(x=[0, 1, 2][:len(values)], y=values))
+    assert_round_trip(fig)
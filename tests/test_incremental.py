@@ -0,0 +1,85 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import COUNTRIES_PATH
+from incremental import IncrementalStore, ProcessedState
+from map_tab import variant_columns
+
+
+@pytest.fixture(scope='module')
+def raw_countries():
+    return pd.read_csv(COUNTRIES_PATH)
+
+
+def edited(raw):
+    raw = raw.copy()
+    rng = np.random.default_rng(0)
+    for country in ['Japan', 'Brazil', 'Kenya']:
+        row = raw['Country'] == country
+        values = raw.loc[row, variant_columns].to_numpy(dtype=np.float64)
+        values = values * rng.uniform(0.5, 1.5, values.shape)
+        raw.loc[row, variant_columns] = values / values.sum()
+    return raw[~raw['Country'].isin(['Germany', 'Chile'])].reset_index(drop=True)
+
+
+def assert_same_state(patched, rebuilt):
+    pd.testing.assert_frame_equal(patched.df, rebuilt.df)
+    np.testing.assert_allclose(patched.sums, rebuilt.sums, rtol=1e-9)
+    np.testing.assert_array_equal(patched.counts, rebuilt.counts)
+    np.testing.assert_allclose(patched.cross, rebuilt.cross, rtol=1e-9)
+    np.testing.assert_allclose(patched.similarity, rebuilt.similarity, atol=1e-12)
+    assert patched.version == rebuilt.version
+
+
+def test_update_matches_full_rebuild(raw_countries):
+    old = raw_countries[raw_countries['Country'] != 'France']
+    new = edited(raw_countries)
+
+    patched = ProcessedState.build(old).update(new)
+    rebuilt = ProcessedState.build(new)
+
+    assert patched.last_update == {'mode': 'incremental', 'changed': 4, 'removed': 2}
+    assert_same_state(patched, rebuilt)
+    for label, stats in rebuilt.global_stats.items():
+        for key, value in stats.items():
+            assert patched.global_stats[label][key] == pytest.approx(value, rel=1e-9)
+    cols = ['temperament_nf', 'temperament_nt', 'temperament_sp', 'temperament_sj']
+    pd.testing.assert_frame_equal(patched.correlation_matrix(cols), rebuilt.correlation_matrix(cols), rtol=1e-9)
+    assert patched.similar_countries('Japan') == pytest.approx(rebuilt.similar_countries('Japan'))
+
+
+def test_unchanged_source_keeps_state(raw_countries):
+    state = ProcessedState.build(raw_countries)
+    assert state.update(raw_countries) is state
+
+
+def write_counts(path, countries, n):
+    pd.DataFrame({'Country': countries, 'n': n}).to_csv(path, index=False)
+
+
+def test_counts_file_change_refreshes_sample_sizes(raw_countries, tmp_path):
+    data_dir = tmp_path / 'data'
+    data_dir.mkdir()
+    countries_path = str(data_dir / 'countries.csv')
+    counts_path = data_dir / 'country_counts.csv'
+    shutil.copy(COUNTRIES_PATH, countries_path)
+    cache_dir = str(tmp_path / 'cache')
+
+    write_counts(counts_path, raw_countries['Country'], 100)
+    first = IncrementalStore(countries_path, cache_dir=cache_dir).refresh()
+    assert (first.df['sample_size'] == 100).all()
+
+    write_counts(counts_path, raw_countries['Country'], 999)
+    stat = os.stat(counts_path)
+    os.utime(counts_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    second = IncrementalStore(countries_path, cache_dir=cache_dir).refresh()
+    assert (second.df['sample_size'] == 999).all()
+    assert second.version != first.version
+
+    os.remove(counts_path)
+    third = IncrementalStore(countries_path, cache_dir=cache_dir).refresh()
+    assert 'sample_size' not in third.df.columns
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from map_tab import mbti_types
+from significance import adjust_p_values, bootstrap_tests, category_matrix, compare_to_global
+
+
+def test_holm_adjustment():
+    p_values = np.array([0.01, 0.04, 0.03, 0.005])
+    np.testing.assert_allclose(adjust_p_values(p_values, 'holm'), [0.03, 0.06, 0.06, 0.02])
+
+
+def test_benjamini_hochberg_adjustment():
+    p_values = np.array([0.01, 0.04, 0.03, 0.005])
+    np.testing.assert_allclose(adjust_p_values(p_values, 'fdr_bh'), [0.02, 0.04, 0.04, 0.02])
+
+
+def test_adjustment_keeps_shape_and_caps_at_one():
+    p_values = np.array([[0.5, 0.9], [0.2, 0.01]])
+    adjusted = adjust_p_values(p_values, 'holm')
+    assert adjusted.shape == p_values.shape
+    assert adjusted.max() == 1.0
+    assert (adjusted >= p_values).all()
+    np.testing.assert_array_equal(adjust_p_values(p_values, 'none'), p_values)
+    with pytest.raises(ValueError):
+        adjust_p_values(p_values, 'bonferroni-ish')
+
+
+def test_bootstrap_intervals_cover_the_true_difference():
+    rng = np.random.default_rng(0)
+    reference = np.linspace(1, 3, len(mbti_types))
+    reference = reference / reference.sum()
+    sizes = np.full(300, 800)
+    shares = rng.multinomial(sizes, reference) / sizes[:, None]
+    _, matrix = category_matrix('temperament')
+
+    differences, low, high, p_values = bootstrap_tests(shares, sizes, reference, matrix, 2000, 0.05, rng)
+
+    # Every country is drawn from the reference itself, so the true difference is zero everywhere
+    covered = (low <= 0) & (high >= 0)
+    assert 0.92 <= covered.mean() <= 0.98
+    assert 0.02 <= (p_values < 0.05).mean() <= 0.08
+    assert ((low <= differences) & (differences <= high)).all()
+
+
+def test_bootstrap_detects_a_real_difference():
+    rng = np.random.default_rng(1)
+    reference = np.full(len(mbti_types), 1 / len(mbti_types))
+    shifted = reference.copy()
+    shifted[:4] *= 1.5
+    shifted = shifted / shifted.sum()
+    _, matrix = category_matrix('temperament')
+
+    _, low, _, p_values = bootstrap_tests(shifted[None, :], np.array([5000]), reference, matrix, 2000, 0.05, rng)
+    assert low[0, 0] > 0
+    assert p_values[0, 0] < 0.001
+
+
+def test_rows_without_counts_are_not_tested():
+    type_cols = [f'type_{t.lower()}' for t in mbti_types]
+    shares = np.full((2, len(mbti_types)), 100 / len(mbti_types))
+    df = pd.DataFrame(shares, columns=type_cols)
+    df.insert(0, 'country', ['Counted', 'Uncounted'])
+    df['sample_size'] = pd.array([1000, None], dtype='Int64')
+    global_stats = {'types': {t: 100 / len(mbti_types) for t in mbti_types}}
+
+    result = compare_to_global(df, ['Counted', 'Uncounted'], global_stats, resamples=500)
+    counted, uncounted = result[result['country'] == 'Counted'], result[result['country'] == 'Uncounted']
+    assert counted['tested'].all() and counted['p_value'].notna().all()
+    assert not uncounted['tested'].any()
+    assert uncounted['p_value'].isna().all() and not uncounted['significant'].any()
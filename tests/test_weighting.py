@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from weighting import weighted_means
+
+
+def test_global_weighted_mean_skips_missing_values():
+    values = np.array([[10.0, 1.0], [20.0, np.nan], [40.0, 3.0]])
+    weights = np.array([1.0, 2.0, 1.0])
+
+    means = weighted_means(values, weights)
+    np.testing.assert_allclose(means, [[(10 + 40 + 40) / 4, (1 + 3) / 2]])
+
+
+def test_group_means_match_a_loop():
+    rng = np.random.default_rng(0)
+    values = rng.uniform(0, 100, (30, 4))
+    values[rng.random(values.shape) < 0.1] = np.nan
+    weights = rng.uniform(0, 5, 30)
+    groups = (rng.random((3, 30)) < 0.5).astype(np.float64)
+
+    means = weighted_means(values, weights, groups)
+    for g, members in enumerate(groups.astype(bool)):
+        for col in range(values.shape[1]):
+            present = members & ~np.isnan(values[:, col])
+            expected = np.average(values[present, col], weights=weights[present])
+            assert means[g, col] == pytest.approx(expected)
+
+
+def test_groups_without_weight_get_zero():
+    values = np.array([[1.0], [2.0]])
+    weights = np.array([0.0, 0.0])
+    groups = np.array([[1.0, 1.0]])
+    np.testing.assert_array_equal(weighted_means(values, weights, groups), [[0.0]])
@@ -0,0 +1,149 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import streamlit as st
+
+from cache_registry import observed_cache
+from data_sources import FORMAT_EXTENSIONS, open_source
+from map_tab import get_country_code, mbti_types, temperament_groups, variant_colors, variant_columns
+
+SNAPSHOTS_PATH = 'data/snapshots.npy'
+
+temperament_names = list(temperament_groups)
+variant_names = list(variant_colors)
+type_temperament_index = np.array(
+    [temperament_names.index(t) for t in temperament_names for _ in temperament_groups[t]]
+)
+
+
+def get_index_path(cube_path):
+    return os.path.splitext(cube_path)[0] + '.json'
+
+
+class SnapshotCube:
+    def __init__(self, periods, countries, country_codes, values):
+        self.periods = list(periods)
+        self.countries = list(countries)
+        self.country_codes = list(country_codes)
+        self.values = values
+        self._metrics = {}
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def _shares(self):
+        if 'shares' not in self._metrics:
+            totals = np.nansum(self.values, axis=2, keepdims=True)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                shares = np.where(totals > 0, self.values / totals * 100, np.nan).astype(np.float32)
+            self._metrics['shares'] = shares
+        return self._metrics['shares']
+
+    def type_shares(self):
+        if 'types' not in self._metrics:
+            # variant_columns is ordered type-major, so A/T pairs are adjacent
+            shares = self._shares()
+            self._metrics['types'] = shares.reshape(shares.shape[0], shares.shape[1], len(mbti_types), 2).sum(axis=3)
+        return self._metrics['types']
+
+    def temperament_shares(self):
+        if 'temperaments' not in self._metrics:
+            types = self.type_shares()
+            temps = np.zeros(types.shape[:2] + (len(temperament_names),), dtype=np.float32)
+            for i in range(len(temperament_names)):
+                temps[:, :, i] = types[:, :, type_temperament_index == i].sum(axis=2)
+            self._metrics['temperaments'] = temps
+        return self._metrics['temperaments']
+
+    def variant_shares(self):
+        if 'variants' not in self._metrics:
+            shares = self._shares()
+            self._metrics['variants'] = shares.reshape(shares.shape[0], shares.shape[1], len(mbti_types), 2).sum(axis=2)
+        return self._metrics['variants']
+
+    def metric(self, name):
+        if name == 'dominant_type':
+            types = self.type_shares()
+            return np.where(np.isnan(types[:, :, 0]), np.nan, np.argmax(np.nan_to_num(types, nan=-1), axis=2))
+        if name == 'dominant_temperament':
+            temps = self.temperament_shares()
+            return np.where(np.isnan(temps[:, :, 0]), np.nan, np.argmax(np.nan_to_num(temps, nan=-1), axis=2))
+        if name.startswith('type_'):
+            return self.type_shares()[:, :, mbti_types.index(name[5:].upper())]
+        if name.startswith('temperament_'):
+            return self.temperament_shares()[:, :, temperament_names.index(name[12:].upper())]
+        if name.startswith('variant_'):
+            return self.variant_shares()[:, :, variant_names.index(name[8:].upper())]
+        raise ValueError(f"Unknown snapshot metric: {name}")
+
+    def deltas(self, name):
+        values = self.metric(name)
+        deltas = np.full(values.shape, np.nan, dtype=np.float32)
+        deltas[1:] = np.diff(values, axis=0)
+        return deltas
+
+
+def build_snapshot_cube(snapshot_dir, output_path=SNAPSHOTS_PATH):
+    files = sorted(
+        f for f in os.listdir(snapshot_dir)
+        if os.path.splitext(f)[1].lower() in FORMAT_EXTENSIONS
+    )
+    if not files:
+        raise ValueError(f"No snapshot files found in {snapshot_dir}")
+
+    frames = {}
+    for f in files:
+        period = os.path.splitext(f)[0]
+        df = open_source(os.path.join(snapshot_dir, f)).read(columns=['Country'] + variant_columns)
+        frames[period] = df.set_index('Country').reindex(columns=variant_columns)
+
+    countries = sorted(set().union(*(df.index for df in frames.values())))
+    codes = {c: get_country_code(c) for c in countries}
+    countries = [c for c in countries if codes[c]]
+
+    periods = list(frames)
+    values = np.full((len(periods), len(countries), len(variant_columns)), np.nan, dtype=np.float32)
+    for i, period in enumerate(periods):
+        values[i] = frames[period].reindex(countries).to_numpy(dtype=np.float32)
+
+    np.save(output_path, values)
+    with open(get_index_path(output_path), 'w', encoding='utf-8') as f:
+        json.dump({
+            'periods': periods,
+            'countries': countries,
+            'country_codes': [codes[c] for c in countries],
+            'columns': variant_columns
+        }, f)
+
+    print(f"Built snapshot cube {values.shape} from {len(files)} files")
+    print(f"Written to {output_path}")
+    return values.shape
+
+
+@observed_cache(st.cache_resource)
+def load_snapshots(path=SNAPSHOTS_PATH):
+    return read_snapshots(path)
+
+
+def read_snapshots(path=SNAPSHOTS_PATH):
+    index_path = get_index_path(path)
+    if not os.path.exists(path) or not os.path.exists(index_path):
+        return None
+
+    with open(index_path, 'r', encoding='utf-8') as f:
+        index = json.load(f)
+
+    values = np.load(path, mmap_mode='r')
+    return SnapshotCube(index['periods'], index['countries'], index['country_codes'], values)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the time-series snapshot cube from one countries file per period")
+    parser.add_argument('snapshot_dir', help="Directory with one countries.csv-shaped file per period, e.g. 2015Q1.csv")
+    parser.add_argument('--output', default=SNAPSHOTS_PATH)
+    args = parser.parse_args()
+
+    build_snapshot_cube(args.snapshot_dir, args.output)
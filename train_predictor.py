@@ -0,0 +1,74 @@
+import argparse
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from map_tab import mbti_types
+from mbti_predictor import MODEL_PATH, save_predictor, tokenize
+
+
+def iter_documents(corpus_path, type_col, text_col, chunksize):
+    for chunk in pd.read_csv(corpus_path, usecols=[type_col, text_col], chunksize=chunksize):
+        for mbti_type, text in zip(chunk[type_col], chunk[text_col]):
+            if pd.isna(mbti_type) or pd.isna(text):
+                continue
+            mbti_type = str(mbti_type).strip().upper()[:4]
+            if mbti_type in mbti_types:
+                yield mbti_type, str(text)
+
+
+def train(corpus_path, output_path=MODEL_PATH, type_col='type', text_col='posts',
+          max_features=20000, min_df=3, chunksize=1000):
+    doc_freq = Counter()
+    n_docs = 0
+    for _, text in iter_documents(corpus_path, type_col, text_col, chunksize):
+        doc_freq.update(set(tokenize(text)))
+        n_docs += 1
+
+    if n_docs == 0:
+        raise ValueError(f"No labelled documents found in {corpus_path}")
+
+    vocab = [word for word, df in doc_freq.most_common(max_features) if df >= min_df]
+    vocab.sort()
+    index = {word: i for i, word in enumerate(vocab)}
+    df_values = np.array([doc_freq[word] for word in vocab], dtype=np.float64)
+    idf = np.log((1 + n_docs) / (1 + df_values)) + 1
+    del doc_freq
+
+    centroids = np.zeros((len(mbti_types), len(vocab)), dtype=np.float64)
+    type_index = {t: i for i, t in enumerate(mbti_types)}
+    type_counts = Counter()
+
+    for mbti_type, text in iter_documents(corpus_path, type_col, text_col, chunksize):
+        term_ids = [index[w] for w in tokenize(text) if w in index]
+        if not term_ids:
+            continue
+        ids, counts = np.unique(term_ids, return_counts=True)
+        weights = (1 + np.log(counts)) * idf[ids]
+        centroids[type_index[mbti_type], ids] += weights / np.linalg.norm(weights)
+        type_counts[mbti_type] += 1
+
+    norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    centroids /= norms
+
+    save_predictor(output_path, mbti_types, vocab, idf, centroids)
+
+    print(f"Trained on {n_docs} documents, vocabulary size {len(vocab)}")
+    for mbti_type in mbti_types:
+        print(f"  {mbti_type}: {type_counts[mbti_type]} documents")
+    print(f"Model written to {output_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the Playground MBTI type predictor from a labelled corpus")
+    parser.add_argument('corpus', help="CSV file with one MBTI type and one text column per row")
+    parser.add_argument('--output', default=MODEL_PATH)
+    parser.add_argument('--type-col', default='type')
+    parser.add_argument('--text-col', default='posts')
+    parser.add_argument('--max-features', type=int, default=20000)
+    parser.add_argument('--min-df', type=int, default=3)
+    args = parser.parse_args()
+
+    train(args.corpus, args.output, args.type_col, args.text_col, args.max_features, args.min_df)
@@ -0,0 +1,294 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_sources import CSVSource, open_source
+from incremental import CACHE_DIR
+from map_tab import get_country_code, mbti_types, variant_columns
+
+VALIDATOR_VERSION = 1
+VALIDATION_DIR = os.path.join(CACHE_DIR, 'validation')
+CHUNK_ROWS = 100_000
+HASH_BLOCK = 1 << 20
+SUM_TOLERANCE = 0.03
+MAX_EXAMPLES = 5
+
+type_flag_pairs = [('E', 'I'), ('N', 'S'), ('T', 'F'), ('J', 'P')]
+types_required_columns = ['Type', 'Description', 'Nickname']
+
+severity_levels = ['pass', 'warning', 'error']
+
+
+def file_sha1(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def get_report_path(sha1, kind, options=None, validation_dir=VALIDATION_DIR):
+    key = hashlib.sha1(json.dumps([VALIDATOR_VERSION, options or {}], sort_keys=True).encode('utf-8')).hexdigest()[:8]
+    return os.path.join(validation_dir, f'{kind}_{sha1}_{key}.json')
+
+
+def iter_source_chunks(source, columns, chunk_rows=CHUNK_ROWS, dtype=None):
+    if isinstance(source, CSVSource):
+        wanted = set(columns)
+        yield from pd.read_csv(source.path, usecols=lambda c: c in wanted, dtype=dtype, chunksize=chunk_rows)
+    else:
+        # Columnar and SQLite sources already project columns, so one read stays small
+        yield source.read(columns=columns)
+
+
+class Check:
+    def __init__(self, name, severity, message):
+        self.name = name
+        self.severity = severity
+        self.message = message
+        self.count = 0
+        self.examples = []
+
+    def add(self, values):
+        values = list(values)
+        self.count += len(values)
+        room = MAX_EXAMPLES - len(self.examples)
+        if room > 0:
+            self.examples.extend(str(v) for v in values[:room])
+
+    def to_dict(self):
+        return {
+            'status': self.severity if self.count else 'pass',
+            'message': self.message,
+            'count': self.count,
+            'examples': self.examples
+        }
+
+
+def _report(path, kind, sha1, rows, checks, start):
+    checks = {check.name: check.to_dict() for check in checks}
+    statuses = [c['status'] for c in checks.values()]
+    return {
+        'path': path,
+        'kind': kind,
+        'sha1': sha1,
+        'validator_version': VALIDATOR_VERSION,
+        'rows': int(rows),
+        'status': max(statuses, key=severity_levels.index) if statuses else 'pass',
+        'ok': 'error' not in statuses,
+        'checks': checks,
+        'seconds': round(time.perf_counter() - start, 4)
+    }
+
+
+def _check_unique_resolvable(names, seen, duplicates, unresolved):
+    names = names.astype(str).str.strip()
+    duplicates.add(names[names.duplicated() | names.isin(seen)].unique())
+    unique_names = set(names.unique()) - seen
+    unresolved.add(sorted(n for n in unique_names if not get_country_code(n)))
+    seen.update(unique_names)
+
+
+def validate_countries(source, chunk_rows=CHUNK_ROWS):
+    columns = source.column_names()
+    missing_country = Check('country_column', 'error', "'Country' column is missing")
+    missing_columns = Check('variant_columns', 'error', "Expected type-variant columns are missing")
+    missing_country.add(['Country'] if 'Country' not in columns else [])
+    missing_columns.add([c for c in variant_columns if c not in columns])
+    if missing_country.count or missing_columns.count:
+        return 0, [missing_country, missing_columns]
+
+    non_numeric = Check('numeric_values', 'error', "Values that are not numbers")
+    out_of_range = Check('value_range', 'error', "Rows with values outside [0, 1]")
+    missing_values = Check('missing_values', 'warning', "Rows with missing values")
+    row_sums = Check('row_sums', 'warning', f"Rows whose values do not sum to 1 within {SUM_TOLERANCE}")
+    duplicates = Check('unique_countries', 'error', "Country names that appear more than once")
+    unresolved = Check('resolvable_countries', 'warning', "Country names without an ISO code; they are left off the map")
+    empty = Check('rows', 'error', "The file has no rows")
+
+    rows = 0
+    seen = set()
+    for chunk in iter_source_chunks(source, ['Country'] + variant_columns, chunk_rows):
+        rows += len(chunk)
+        countries = chunk['Country'].astype(str).to_numpy()
+        raw = chunk[variant_columns]
+        numeric = raw.apply(pd.to_numeric, errors='coerce')
+        bad_numbers = numeric.isna().to_numpy() & raw.notna().to_numpy()
+        values = numeric.to_numpy(dtype=np.float64)
+
+        non_numeric.add(countries[bad_numbers.any(axis=1)])
+        with np.errstate(invalid='ignore'):
+            out_of_range.add(countries[((values < 0) | (values > 1)).any(axis=1)])
+            row_sums.add(countries[np.abs(np.nansum(values, axis=1) - 1) > SUM_TOLERANCE])
+        missing_values.add(countries[(np.isnan(values) & ~bad_numbers).any(axis=1)])
+
+        _check_unique_resolvable(chunk['Country'].dropna(), seen, duplicates, unresolved)
+
+    empty.add(['no rows'] if rows == 0 else [])
+    return rows, [empty, non_numeric, out_of_range, missing_values, row_sums, duplicates, unresolved]
+
+
+def validate_types(source, chunk_rows=CHUNK_ROWS):
+    columns = source.column_names()
+    flag_columns = [c for pair in type_flag_pairs for c in pair]
+
+    missing_type = Check('type_column', 'error', "'Type' column is missing")
+    missing_columns = Check('columns', 'warning', "Expected columns are missing")
+    missing_type.add(['Type'] if 'Type' not in columns else [])
+    missing_columns.add([c for c in types_required_columns + flag_columns if c not in columns and c != 'Type'])
+    if missing_type.count:
+        return 0, [missing_type, missing_columns]
+
+    unknown = Check('known_types', 'error', "Values in 'Type' that are not one of the 16 MBTI types")
+    duplicates = Check('unique_types', 'error', "Types that appear more than once")
+    missing_types = Check('all_types', 'warning', "MBTI types without a row")
+    flags = Check('type_flags', 'error', "Types whose E/I, N/S, T/F, J/P flags do not match their letters")
+
+    rows = 0
+    seen = set()
+    present_flags = [pair for pair in type_flag_pairs if pair[0] in columns and pair[1] in columns]
+    for chunk in iter_source_chunks(source, ['Type'] + flag_columns, chunk_rows):
+        rows += len(chunk)
+        types = chunk['Type'].astype(str).str.strip().str.upper()
+        unknown.add(types[~types.isin(mbti_types)])
+        duplicates.add(types[types.duplicated() | types.isin(seen)].unique())
+        seen.update(types)
+
+        inconsistent = np.zeros(len(chunk), dtype=bool)
+        for position, (letter, opposite) in enumerate(type_flag_pairs):
+            if (letter, opposite) not in present_flags:
+                continue
+            expected = (types.str[position] == letter).to_numpy().astype(np.int64)
+            first = pd.to_numeric(chunk[letter], errors='coerce').to_numpy()
+            second = pd.to_numeric(chunk[opposite], errors='coerce').to_numpy()
+            inconsistent |= (first != expected) | (second != 1 - expected)
+        flags.add(types[inconsistent & types.isin(mbti_types).to_numpy()])
+
+    missing_types.add([t for t in mbti_types if t not in seen])
+    return rows, [missing_type, missing_columns, unknown, duplicates, missing_types, flags]
+
+
+def validate_respondents(source, country_col='country', type_col='type', variant_col=None, chunk_rows=CHUNK_ROWS):
+    from ingest import normalize_variant_keys
+
+    columns = source.column_names()
+    needed = [country_col, type_col] + ([variant_col] if variant_col else [])
+    missing_columns = Check('columns', 'error', "Respondent columns are missing")
+    missing_columns.add([c for c in needed if c not in columns])
+    if missing_columns.count:
+        return 0, [missing_columns]
+
+    invalid = Check('known_types', 'warning', "Row numbers whose type/variant is not one of the 32 type-variant keys")
+    no_country = Check('country_values', 'warning', "Row numbers without a country")
+    unresolved = Check('resolvable_countries', 'warning', "Country names without an ISO code")
+
+    rows = 0
+    seen = set()
+    for chunk in iter_source_chunks(source, needed, chunk_rows, dtype=str):
+        chunk = chunk.reset_index(drop=True)
+        keys = normalize_variant_keys(chunk.fillna(''), type_col, variant_col)
+        invalid.add(rows + np.flatnonzero(~keys.isin(variant_columns).to_numpy()))
+
+        countries = chunk[country_col].dropna().astype(str).str.strip()
+        no_country.add(rows + np.flatnonzero(chunk[country_col].fillna('').astype(str).str.strip().eq('').to_numpy()))
+        rows += len(chunk)
+
+        # Respondent files repeat countries on every row, so only new names are resolved
+        new_names = set(countries.unique()) - seen
+        unresolved.add(sorted(n for n in new_names if n and not get_country_code(n)))
+        seen.update(new_names)
+
+    return rows, [invalid, no_country, unresolved]
+
+
+validators = {
+    'countries': validate_countries,
+    'types': validate_types,
+    'respondents': validate_respondents
+}
+
+
+def validate_source(spec, kind, use_cache=True, validation_dir=VALIDATION_DIR, **options):
+    start = time.perf_counter()
+    source = open_source(spec)
+    if not source.exists():
+        missing = Check('file', 'error', "File not found")
+        missing.add([source.path])
+        return _report(source.path, kind, None, 0, [missing], start)
+
+    sha1 = file_sha1(source.path)
+    report_path = get_report_path(sha1, kind, options, validation_dir)
+    if use_cache and os.path.exists(report_path):
+        with open(report_path, 'r', encoding='utf-8') as f:
+            report = json.load(f)
+        report['cached'] = True
+        return report
+
+    try:
+        rows, checks = validators[kind](source, **options)
+    except Exception as e:
+        unreadable = Check('readable', 'error', f"Cannot read file: {str(e)}")
+        unreadable.add([source.path])
+        rows, checks = 0, [unreadable]
+
+    report = _report(source.path, kind, sha1, rows, checks, start)
+    try:
+        os.makedirs(validation_dir, exist_ok=True)
+        tmp_path = f"{report_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        os.replace(tmp_path, report_path)
+    except OSError as e:
+        print(f"Could not cache validation report: {str(e)}")
+    report['cached'] = False
+    return report
+
+
+def report_messages(report, severity):
+    messages = []
+    for check in report['checks'].values():
+        if check['status'] == severity:
+            examples = f": {', '.join(check['examples'])}" if check['examples'] else ""
+            messages.append(f"{os.path.basename(report['path'])}: {check['message']} ({check['count']}){examples}")
+    return messages
+
+
+def print_report(report):
+    cached = " (cached)" if report.get('cached') else ""
+    print(f"{report['path']} [{report['kind']}] {report['rows']} rows: {report['status'].upper()}{cached}")
+    for name, check in report['checks'].items():
+        line = f"  {check['status']:<7} {name}"
+        if check['count']:
+            line += f" - {check['message']} ({check['count']})"
+            if check['examples']:
+                line += f": {', '.join(check['examples'])}"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Validate MBTI data files in bounded memory")
+    parser.add_argument('path')
+    parser.add_argument('--kind', choices=validators, default='countries')
+    parser.add_argument('--country-col', default='country', help="Respondent files only")
+    parser.add_argument('--type-col', default='type', help="Respondent files only")
+    parser.add_argument('--variant-col', default=None, help="Respondent files only")
+    parser.add_argument('--no-cache', action='store_true')
+    parser.add_argument('--json', action='store_true', help="Print the machine-readable report")
+    args = parser.parse_args()
+
+    options = {}
+    if args.kind == 'respondents':
+        options = {'country_col': args.country_col, 'type_col': args.type_col, 'variant_col': args.variant_col}
+
+    report = validate_source(args.path, args.kind, use_cache=not args.no_cache, **options)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    sys.exit(0 if report['ok'] else 1)
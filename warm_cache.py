@@ -0,0 +1,93 @@
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from data_refresh import FIGURE_DIR, get_figure_path, map_modes
+from data_sources import get_source_spec, open_source
+from incremental import CACHE_DIR, IncrementalStore
+from map_tab import create_world_map, get_country_code, get_country_codes_path
+from show_nlp_data import build_image_variant
+
+NLP_DIR = 'data/NLP'
+WARM_WORKERS = min(8, os.cpu_count() or 1)
+
+
+def _write_atomic(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def warm_country_codes(countries_spec):
+    countries = open_source(countries_spec).read(columns=['Country'])['Country'].dropna().unique()
+    codes = {country: get_country_code(country) for country in countries}
+    _write_atomic(get_country_codes_path(), json.dumps(codes, sort_keys=True))
+    return f"{len(codes)} country codes"
+
+
+def warm_world_map(state, color_by):
+    fig = create_world_map(state.df, color_by=color_by)
+    _write_atomic(get_figure_path(state.version, color_by), fig.to_json())
+    return f"{color_by} map"
+
+
+def remove_stale_figures(version):
+    current = {get_figure_path(version, color_by) for color_by in map_modes}
+    removed = 0
+    for path in glob.glob(os.path.join(FIGURE_DIR, 'world_map_*.json')):
+        if path not in current:
+            os.remove(path)
+            removed += 1
+    return removed
+
+
+def warm_cache(countries_spec=None, types_spec=None, nlp_dir=NLP_DIR, workers=WARM_WORKERS):
+    countries_spec = countries_spec or get_source_spec('countries')
+    types_spec = types_spec or get_source_spec('types')
+
+    for name, spec in [('countries', countries_spec), ('types', types_spec)]:
+        if not open_source(spec).exists():
+            raise FileNotFoundError(f"Missing {name} data: {open_source(spec).path}")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Images and country codes are independent; the processed state needs the codes first
+        image_futures = [
+            executor.submit(build_image_variant, path)
+            for path in sorted(glob.glob(os.path.join(nlp_dir, '*.png')))
+        ]
+        print(executor.submit(warm_country_codes, countries_spec).result())
+
+        # Global stats, correlations and similarity are derived from the persisted sums, cross-products and matrix
+        state = IncrementalStore(countries_spec).refresh()
+        print(f"Processed state version {state.version} for {len(state.dataset)} countries")
+
+        figure_futures = [executor.submit(warm_world_map, state, color_by) for color_by in map_modes]
+        for future in figure_futures:
+            print(future.result())
+
+        for future in image_futures:
+            print(f"NLP image variant {future.result()}")
+
+    removed = remove_stale_figures(state.version)
+    if removed:
+        print(f"Removed {removed} stale figures")
+
+    print(f"Cache warmed in {CACHE_DIR} in {time.perf_counter() - start:.1f}s")
+    return state.version
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute processed data, figures and image variants before serving")
+    parser.add_argument('--countries', default=None, help="Countries source, defaults to the configured data source")
+    parser.add_argument('--types', default=None, help="Types source, defaults to the configured data source")
+    parser.add_argument('--nlp-dir', default=NLP_DIR)
+    parser.add_argument('--workers', type=int, default=WARM_WORKERS)
+    args = parser.parse_args()
+
+    warm_cache(args.countries, args.types, args.nlp_dir, args.workers)
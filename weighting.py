@@ -0,0 +1,109 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from cache_registry import observed_cache
+from incremental import stat_cols
+from instrumentation import timed
+from map_tab import mbti_types, temperament_groups
+
+POPULATION_PATH = 'data/population.csv'
+
+weighting_labels = {
+    'unweighted': "Unweighted",
+    'population': "Population-weighted",
+    'sample_size': "Respondent-weighted"
+}
+
+
+def average_label(weighting):
+    return "Global Average" if weighting == 'unweighted' else f"Global Average ({weighting_labels[weighting].lower()})"
+
+
+def available_weightings(df):
+    schemes = ['unweighted', 'population']
+    if df is not None and 'sample_size' in df.columns and df['sample_size'].notna().any():
+        schemes.append('sample_size')
+    return schemes
+
+
+@observed_cache()
+def load_population(path=POPULATION_PATH):
+    population = pd.read_csv(path, usecols=['Country', 'ISO3', 'Population'])
+    by_code = population.set_index('ISO3')['Population']
+    by_name = population.set_index('Country')['Population']
+    return by_code.to_dict(), by_name.to_dict()
+
+
+def country_weights(df, weighting='unweighted', population_path=POPULATION_PATH):
+    if weighting == 'unweighted':
+        return np.ones(len(df))
+    if weighting == 'population':
+        by_code, by_name = load_population(population_path)
+        weights = df['country_code'].map(by_code).fillna(df['country'].map(by_name))
+    elif weighting == 'sample_size':
+        weights = df['sample_size'] if 'sample_size' in df.columns else pd.Series(np.nan, index=df.index)
+    else:
+        raise ValueError(f"Unknown weighting: {weighting}")
+    # Countries without a weight drop out rather than silently counting as one
+    return np.nan_to_num(weights.to_numpy(dtype=np.float64), nan=0.0)
+
+
+def weighted_means(values, weights, groups=None):
+    # groups is a (groups x countries) 0/1 membership matrix; None means one global group
+    mask = ~np.isnan(values)
+    filled = np.where(mask, values, 0.0)
+    group_weights = weights[None, :] if groups is None else groups * weights[None, :]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = (group_weights @ filled) / (group_weights @ mask)
+    return np.nan_to_num(means, nan=0.0)
+
+
+def stats_from_means(means, df_columns, coverage=None):
+    by_col = dict(zip(stat_cols, means.tolist()))
+    stats = {
+        'temperaments': {t: by_col[f'temperament_{t.lower()}'] for t in temperament_groups},
+        'types': {t: by_col[f'type_{t.lower()}'] for t in mbti_types if f'type_{t.lower()}' in df_columns},
+        'variants': {'A': by_col['variant_a'], 'T': by_col['variant_t']}
+    }
+    if coverage is not None:
+        stats['coverage'] = coverage
+    return stats
+
+
+def dataset_version(df):
+    digest = hashlib.sha1(repr(df['country'].tolist()).encode('utf-8'))
+    digest.update(np.ascontiguousarray(df.reindex(columns=stat_cols).to_numpy(dtype=np.float64)).tobytes())
+    if 'sample_size' in df.columns:
+        digest.update(np.ascontiguousarray(df['sample_size'].to_numpy(dtype=np.float64)).tobytes())
+    return digest.hexdigest()[:16]
+
+
+@timed('weighted_global_stats')
+@observed_cache(max_entries=16)
+def _weighted_global_stats(version, weighting, _df):
+    weights = country_weights(_df, weighting)
+    means = weighted_means(_df.reindex(columns=stat_cols).to_numpy(dtype=np.float64), weights)[0]
+    coverage = {
+        'countries': int((weights > 0).sum()),
+        'of': len(_df),
+        'total_weight': float(weights.sum())
+    }
+    return stats_from_means(means, _df.columns, coverage)
+
+
+def weighted_global_stats(df, weighting='unweighted', version=None):
+    if df is None or df.empty:
+        return None
+    # Keyed on the dataset version so reruns skip hashing the whole frame
+    return _weighted_global_stats(version or dataset_version(df), weighting, df)
+
+
+def global_averages(df, global_stats, weightings, version=None):
+    averages = {}
+    for weighting in weightings:
+        stats = global_stats if weighting == 'unweighted' else weighted_global_stats(df, weighting, version)
+        if stats is not None:
+            averages[average_label(weighting)] = stats
+    return averages